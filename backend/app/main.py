@@ -1,13 +1,52 @@
 import sys
 import os
+from contextlib import asynccontextmanager
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
 from app.routes import router as api_router
-from app.socket_events import websocket_endpoint
+from app.socket_events import websocket_endpoint, manager
+from app.services.n8n import n8n_service
+from app.services.database import db_service
+from app.services.profiling import ProfilingMiddleware, profile_store
+from app.services.log import RequestContextMiddleware, log_pipeline
+from app.services.metrics import REGISTRY
+from app.services.sweeper import create_session_sweeper
+from app.services.jobs import chat_jobs
+from app.services.faq import faq_service
 
-app = FastAPI()
+# Ends idle sessions and closes stale sockets in the background
+session_sweeper = create_session_sweeper(db_service, manager)
+session_sweeper.register_metrics(REGISTRY)
+chat_jobs.register_metrics(REGISTRY)
+faq_service.register_metrics(REGISTRY)
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """
+    Application lifespan hook.
+    Opens shared resources on startup and releases them on shutdown.
+    """
+    log_pipeline.start()
+    await n8n_service.startup()
+    await db_service.startup()
+    await faq_service.startup()
+    await manager.start()
+    session_sweeper.start()
+    chat_jobs.start()
+    try:
+        yield
+    finally:
+        await chat_jobs.stop()
+        await session_sweeper.stop()
+        await manager.stop()
+        await faq_service.shutdown()
+        await n8n_service.shutdown()
+        await db_service.shutdown()
+        log_pipeline.stop()
+
+app = FastAPI(lifespan=lifespan)
+log_pipeline.register_metrics(REGISTRY)
 
-<<<<<<< HEAD
 # Configure CORS - Allow all origins in development
 origins = [
     "http://192.168.101.63:3000",
@@ -23,17 +62,20 @@ app.add_middleware(
     allow_headers=["*"],
     expose_headers=["*"],
     max_age=3600,
-=======
-# Allow all origins for development
+)
+
+# Opt-in request profiling, see app/services/profiling.py
 app.add_middleware(
-    CORSMiddleware,
-    allow_origins=["*"],
-    allow_credentials=True,
-    allow_methods=["*"],
-    allow_headers=["*"],
->>>>>>> c1f9070ccb7a29111fee9de0911e64545c5cae06
+    ProfilingMiddleware,
+    store=profile_store,
+    sample_rate=float(os.getenv('PROFILE_SAMPLE_RATE', '0')),
+    interval=float(os.getenv('PROFILE_INTERVAL', '0.005')),
+    max_concurrent=int(os.getenv('PROFILE_MAX_CONCURRENT', '2')),
 )
 
+# Request IDs for log correlation; added last so it wraps everything else
+app.add_middleware(RequestContextMiddleware)
+
 # Include API routes
 app.include_router(api_router)
 
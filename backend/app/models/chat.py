@@ -14,9 +14,12 @@ class ChatMessageRequest(BaseModel):
     Attributes:
         sessionId (str): Unique identifier for the chat session
         message (str): The message content from the user
+    
+    Both are optional here so the routes can answer a missing field
+    with a 400, as they always have, rather than a validation 422.
     """
-    sessionId: str = Field(..., description="Unique identifier for the chat session")
-    message: str = Field(..., description="The message content from the user")
+    sessionId: Optional[str] = Field(None, description="Unique identifier for the chat session")
+    message: Optional[str] = Field(None, description="The message content from the user")
 
 class ChatMessage(BaseModel):
     """
@@ -47,3 +50,18 @@ class ChatSession(BaseModel):
     user_id: str
     started_at: datetime
     ended_at: Optional[datetime] = None
+
+class ChatSessionSummary(ChatSession):
+    """
+    Chat session with aggregates for session lists.
+    
+    Attributes:
+        message_count (int): Number of stored messages in the session
+        last_message (Optional[str]): Snippet of the most recent message
+        last_sender (Optional[str]): Sender of the most recent message
+        last_activity (Optional[datetime]): Time of the most recent message, or the session start
+    """
+    message_count: int = 0
+    last_message: Optional[str] = None
+    last_sender: Optional[str] = None
+    last_activity: Optional[datetime] = None
@@ -1,25 +1,12 @@
-<<<<<<< HEAD
 
 """
 API routes module for chat application.
-Defines all HTTP @router.get('/chat/sessions')
-async def get_chat_sessions(user_id: Optional[str] = None):
-    if not user_id:
-        raise HTTPException(status_code=400, detail="Missing user_id parameter")
-    try:
-        sessions = db_service.get_user_sessions(user_id)
-        print(f"Retrieved {len(sessions) if sessions else 0} sessions for user {user_id}")
-        return {"sessions": [session.dict() for session in sessions]}
-    except Exception as e:
-        print(f"Error getting sessions: {str(e)}")
-        import traceback
-        print(f"Error traceback: {traceback.format_exc()}")
-        raise HTTPException(status_code=500, detail=f"Error getting sessions: {str(e)}")nts and WebSocket handlers.
+Defines all HTTP endpoints and WebSocket handlers.
 """
 
 import os
-from fastapi import APIRouter, HTTPException
-from fastapi.responses import JSONResponse
+from fastapi import APIRouter, HTTPException, Header, Query
+from fastapi.responses import JSONResponse, StreamingResponse, Response, PlainTextResponse
 from typing import Optional, List, Dict, Any
 from datetime import datetime, timezone
 
@@ -27,6 +14,19 @@ from fastapi import Depends
 from .models.chat import ChatMessageRequest, ChatMessage, ChatSession
 from .services.database import DatabaseService, db_service
 from .services.n8n import N8NService, n8n_service
+from .services.chat import run_chat_turn, ChatTurnError
+from .services.admission import AdmissionRejected
+from .services.streaming import stream_chat_turn, format_sse
+from .services.pagination import encode_cursor, decode_cursor, is_backward
+from .services.metrics import REGISTRY, CHAT_STAGE_SECONDS, StageTimer
+from .services.profiling import profile_store
+from .services.serialization import FastJSONResponse, stream_json_object
+from .services.export import export_records, ndjson_chunks, gzip_chunks, parse_timestamp
+from .services.log import get_logger, bind_context, log_pipeline
+from .services.jobs import chat_jobs, public_job, FINAL_STATES
+from .services.faq import faq_service
+
+logger = get_logger(__name__)
 
 # Initialize router
 router = APIRouter()
@@ -37,6 +37,19 @@ def get_db_service():
 def get_n8n_service():
     return n8n_service
 
+def require_admin(x_admin_token: Optional[str] = Header(None)):
+    """
+    Guard admin endpoints with the ADMIN_TOKEN environment variable.
+
+    Admin endpoints expose every user's transcripts, so they stay closed
+    until a token is configured.
+    """
+    admin_token = os.getenv("ADMIN_TOKEN")
+    if not admin_token:
+        raise HTTPException(status_code=403, detail="Admin endpoints are disabled; set ADMIN_TOKEN")
+    if x_admin_token != admin_token:
+        raise HTTPException(status_code=403, detail="Invalid admin token")
+
 # Get webhook URL based on environment mode
 N8N_WEBHOOK_MODE = os.getenv("N8N_WEBHOOK_MODE", "production")
 N8N_WEBHOOK_URL = (
@@ -44,137 +57,344 @@ N8N_WEBHOOK_URL = (
     else "http://n8n:5678/webhook/returning-user"
 )
 
-# API Endpoints start here
+MAX_PAGE_SIZE = 500
 
-# --- API Endpoints ---
-@router.post('/chat/message')
-async def chat_message(data: ChatMessageRequest):
+# Return history rows as stored instead of round-tripping them through ChatMessage
+HISTORY_TRUSTED_ROWS = os.getenv("HISTORY_TRUSTED_ROWS", "false").lower() == "true"
+# Histories with more messages than this are streamed as chunked JSON
+HISTORY_STREAM_THRESHOLD = int(os.getenv("HISTORY_STREAM_THRESHOLD", "2000"))
+HISTORY_STREAM_CHUNK = int(os.getenv("HISTORY_STREAM_CHUNK", "500"))
+EXPORT_PAGE_SIZE = int(os.getenv("EXPORT_PAGE_SIZE", "500"))
+# Longest long-poll on GET /chat/jobs/{id}, in seconds
+JOB_MAX_WAIT = float(os.getenv("JOB_MAX_WAIT", "30"))
+
+def parse_page_args(before: Optional[str], after: Optional[str]):
     """
-    Handle incoming chat messages and process responses.
+    Decode before/after cursors from query parameters.
     """
-    session_id = data.sessionId
-    message = data.message
-    if not session_id or not message:
-        raise HTTPException(status_code=400, detail="Missing sessionId or message")
-
+    if before and after:
+        raise HTTPException(status_code=400, detail="Use either before or after, not both")
     try:
-        # Ensure session exists and save user message
-        db_service.get_or_create_session(session_id)
-        db_service.save_message(session_id, 'user', message)
-=======
+        return (decode_cursor(before) if before else None, decode_cursor(after) if after else None)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
 
-"""
-API routes module for chat application.
-Defines all HTTP endpoints and WebSocket handlers.
-"""
-
-import os
-from fastapi import APIRouter, HTTPException
-from fastapi.responses import JSONResponse
-from typing import Optional, List, Dict, Any
-from datetime import datetime, timezone
-
-from fastapi import Depends
-from .models.chat import ChatMessageRequest, ChatMessage, ChatSession
-from .services.database import DatabaseService, db_service
-from .services.n8n import N8NService, n8n_service
-
-# Initialize router
-router = APIRouter()
-
-def get_db_service():
-    return db_service
+def build_page(items: list, limit: Optional[int], backwards: bool, sort_key: str, id_key: str) -> Dict[str, Any]:
+    """
+    Trim an over-fetched page to its limit and describe it with cursors.
 
-def get_n8n_service():
-    return n8n_service
+    Pages are fetched with one extra row; its presence means more rows
+    exist beyond the page in the direction of travel.
+    """
+    has_more = limit is not None and len(items) > limit
+    if has_more:
+        items = items[-limit:] if backwards else items[:limit]
+    cursors = {}
+    if items:
+        cursors = {
+            "before": encode_cursor(items[0][sort_key], items[0].get(id_key)),
+            "after": encode_cursor(items[-1][sort_key], items[-1].get(id_key)),
+        }
+    return {"has_more": has_more, "cursors": cursors, "items": items}
 
-# Get webhook URL based on environment mode
-N8N_WEBHOOK_MODE = os.getenv("N8N_WEBHOOK_MODE", "production")
-N8N_WEBHOOK_URL = (
-    "http://n8n:5678/webhook-test/returning-user" if N8N_WEBHOOK_MODE == "test"
-    else "http://n8n:5678/webhook/returning-user"
-)
+def busy_exception(e: AdmissionRejected) -> HTTPException:
+    """
+    Build the fast-fail response for a call rejected by admission control.
+    """
+    return HTTPException(
+        status_code=e.status_code,
+        detail="Service is busy, please retry shortly.",
+        headers={"Retry-After": str(e.retry_after)}
+    )
 
 # API Endpoints start here
 
 # --- API Endpoints ---
 @router.post('/chat/message')
-async def chat_message(data: ChatMessageRequest):
+async def chat_message(
+    data: ChatMessageRequest,
+    async_mode: bool = Query(False, alias="async"),
+    prefer: Optional[str] = Header(None),
+    idempotency_key: Optional[str] = Header(None)
+):
     """
     Handle incoming chat messages and process responses.
+
+    With ``?async=true`` or ``Prefer: respond-async`` the turn runs as a
+    background job instead: the response is ``202`` with the job, whose
+    result is pushed to the session's WebSockets and can be long-polled at
+    ``GET /chat/jobs/{id}``. Resending the same ``Idempotency-Key`` returns
+    the existing job rather than running the turn again.
     """
     session_id = data.sessionId
     message = data.message
     if not session_id or not message:
         raise HTTPException(status_code=400, detail="Missing sessionId or message")
+    bind_context(session_id=session_id)
+
+    if async_mode or (prefer and "respond-async" in prefer.lower()):
+        try:
+            job, _ = await chat_jobs.submit(session_id, message, idempotency_key)
+        except AdmissionRejected as e:
+            raise busy_exception(e)
+        return FastJSONResponse(
+            public_job(job),
+            status_code=202,
+            headers={"Location": f"/chat/jobs/{job['id']}", "Preference-Applied": "respond-async"}
+        )
 
+    stages = StageTimer(CHAT_STAGE_SECONDS)
     try:
-        # Ensure session exists and save user message
-        await db_service.get_or_create_session(session_id)
-        await db_service.save_message(session_id, 'user', message)
->>>>>>> c1f9070ccb7a29111fee9de0911e64545c5cae06
-
-        # Forward message to n8n and handle response
-        response_json = await n8n_service.send_message(session_id, message)
-        bot_message = n8n_service.extract_bot_message(response_json)
-        
-        if bot_message and isinstance(bot_message, str):
-<<<<<<< HEAD
-            db_service.save_message(session_id, 'bot', bot_message)
-=======
-            await db_service.save_message(session_id, 'bot', bot_message)
->>>>>>> c1f9070ccb7a29111fee9de0911e64545c5cae06
-            response_json["response"] = bot_message.replace('\n', ' ')
-        
-        return JSONResponse(content=response_json)
-    except Exception as e:
-        print(f"Error contacting n8n: {e}")
-        await db_service.save_message(session_id, 'bot', 'Sorry, something went wrong.')
-        raise HTTPException(status_code=500, detail="Sorry, something went wrong.")
+        response_json = await run_chat_turn(db_service, n8n_service, session_id, message, stages)
+        stages.enter('serialize')
+        response = JSONResponse(content=response_json)
+        stages.finish()
+        response.headers["Server-Timing"] = stages.server_timing()
+        return response
+    except AdmissionRejected as e:
+        raise busy_exception(e)
+    except ChatTurnError as e:
+        raise HTTPException(status_code=500, detail=str(e), headers={"Server-Timing": stages.server_timing()})
+
+@router.post('/chat/message/stream')
+async def chat_message_stream(data: ChatMessageRequest):
+    """
+    Handle an incoming chat message and stream the bot response as Server-Sent Events.
+
+    FAQ hits are streamed without n8n admission; when n8n is busy the
+    stream carries a single ``error`` event with ``retryAfter``.
+    """
+    session_id = data.sessionId
+    message = data.message
+    if not session_id or not message:
+        raise HTTPException(status_code=400, detail="Missing sessionId or message")
+    bind_context(session_id=session_id)
+
+    async def event_stream():
+        async for event in stream_chat_turn(db_service, n8n_service, session_id, message):
+            yield format_sse(event)
+
+    return StreamingResponse(
+        event_stream(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+@router.get('/chat/jobs/{job_id}')
+async def get_chat_job(job_id: str, wait: float = Query(0, ge=0)):
+    """
+    Get a chat job, waiting up to ``wait`` seconds for it to finish.
+
+    Clients that lost their connection call this again with the same job
+    ID to keep waiting; the turn is never run twice.
+    """
+    job = await chat_jobs.wait(job_id, min(wait, JOB_MAX_WAIT))
+    if job is None:
+        raise HTTPException(status_code=404, detail="Job not found")
+    headers = {} if job["status"] in FINAL_STATES else {"Retry-After": "1"}
+    return FastJSONResponse(public_job(job), headers=headers)
 
 @router.get('/chat/sessions')
-async def get_chat_sessions(user_id: Optional[str] = None):
+async def get_chat_sessions(
+    user_id: Optional[str] = None,
+    limit: Optional[int] = Query(None, ge=1, le=MAX_PAGE_SIZE),
+    before: Optional[str] = None,
+    after: Optional[str] = None,
+    since: Optional[str] = None,
+    summary: bool = False
+):
+    """
+    List a user's sessions. With ``summary=true`` each session also carries
+    its message count, last message snippet and last activity time, read
+    in the same query.
+    """
     if not user_id:
         raise HTTPException(status_code=400, detail="Missing user_id parameter")
-<<<<<<< HEAD
-    sessions = db_service.get_user_sessions(user_id)
-=======
-    sessions = await db_service.get_user_sessions(user_id)
->>>>>>> c1f9070ccb7a29111fee9de0911e64545c5cae06
-    return {"sessions": sessions}
+    before_cursor, after_cursor = parse_page_args(before, after)
+    stages = StageTimer(CHAT_STAGE_SECONDS)
+    try:
+        stages.enter('sessions_query')
+        get_sessions = db_service.get_user_session_summaries if summary else db_service.get_user_sessions
+        sessions = await get_sessions(
+            user_id,
+            limit=limit + 1 if limit else None,
+            before=before_cursor,
+            after=after_cursor,
+            since=since
+        )
+        logger.debug('sessions_fetched', user_id=user_id, count=len(sessions))
+        stages.enter('sessions_serialize')
+        backwards = is_backward(limit, before_cursor, after_cursor, since)
+        page = build_page([session.dict() for session in sessions], limit, backwards, 'started_at', 'session_id')
+        response = FastJSONResponse(
+            {"sessions": page["items"], "has_more": page["has_more"], "cursors": page["cursors"]}
+        )
+        stages.finish()
+        response.headers["Server-Timing"] = stages.server_timing()
+        return response
+    except Exception as e:
+        logger.exception('get_sessions_failed', user_id=user_id)
+        raise HTTPException(status_code=500, detail=f"Error getting sessions: {str(e)}")
 
 @router.get('/chat/messages/{session_id}')
-async def get_chat_messages(session_id: str):
-<<<<<<< HEAD
-    print(f"Received request for messages with session_id: {session_id}")
+async def get_chat_messages(
+    session_id: str,
+    limit: Optional[int] = Query(None, ge=1, le=MAX_PAGE_SIZE),
+    before: Optional[str] = None,
+    after: Optional[str] = None,
+    since: Optional[str] = None
+):
+    bind_context(session_id=session_id)
+    before_cursor, after_cursor = parse_page_args(before, after)
+    stages = StageTimer(CHAT_STAGE_SECONDS)
     try:
-        print("Attempting to fetch messages from database...")
-        messages = db_service.get_session_messages(session_id)
-        print(f"Successfully retrieved {len(messages)} messages")
-        return {"messages": [msg.dict() for msg in messages]}
+        stages.enter('history_query')
+        page_args = dict(limit=limit + 1 if limit else None, before=before_cursor, after=after_cursor, since=since)
+        if HISTORY_TRUSTED_ROWS:
+            messages = await db_service.get_session_message_rows(session_id, **page_args)
+        else:
+            messages = [msg.dict() for msg in await db_service.get_session_messages(session_id, **page_args)]
+        logger.debug('messages_fetched', count=len(messages))
+        stages.enter('history_serialize')
+        backwards = is_backward(limit, before_cursor, after_cursor, since)
+        page = build_page(messages, limit, backwards, 'timestamp', 'message_id')
+        head = {"has_more": page["has_more"], "cursors": page["cursors"]}
+        if len(page["items"]) > HISTORY_STREAM_THRESHOLD:
+            response = StreamingResponse(
+                stream_json_object(head, "messages", page["items"], HISTORY_STREAM_CHUNK),
+                media_type="application/json"
+            )
+        else:
+            response = FastJSONResponse({"messages": page["items"], **head})
+        stages.finish()
+        response.headers["Server-Timing"] = stages.server_timing()
+        return response
     except Exception as e:
-        print(f"Error fetching messages: {str(e)}")
-        print(f"Error type: {type(e)}")
-        import traceback
-        print(f"Traceback: {traceback.format_exc()}")
+        logger.exception('get_messages_failed')
         raise HTTPException(status_code=500, detail=f"Error fetching messages: {str(e)}")
 
-@router.post('/chat/session/{session_id}/end')
-async def end_chat_session(session_id: str):
-    success = db_service.end_session(session_id)
-=======
-    messages = await db_service.get_chat_messages(session_id)
-    return {"messages": messages}
-
 @router.post('/chat/session/{session_id}/end')
 async def end_chat_session(session_id: str):
     success = await db_service.end_session(session_id)
->>>>>>> c1f9070ccb7a29111fee9de0911e64545c5cae06
     if success:
         return {"message": "Session ended successfully"}
     else:
         raise HTTPException(status_code=404, detail="Session not found")
 
+@router.get('/admin/cache', dependencies=[Depends(require_admin)])
+async def get_response_cache_stats():
+    """
+    Report answer cache statistics.
+    """
+    return {"enabled": n8n_service.cache_enabled, **n8n_service.response_cache.stats()}
+
+@router.delete('/admin/cache', dependencies=[Depends(require_admin)])
+async def flush_response_cache(question: Optional[str] = None):
+    """
+    Flush the answer cache, or a single question when one is given.
+    """
+    if question:
+        removed = n8n_service.invalidate_cached_response(question)
+        return {"message": "Cache entry removed" if removed else "Cache entry not found", "removed": int(removed)}
+    removed = len(n8n_service.response_cache)
+    n8n_service.clear_cache()
+    return {"message": "Cache flushed", "removed": removed}
+
+@router.get('/admin/stats', dependencies=[Depends(require_admin)])
+async def get_service_stats():
+    """
+    Report storage, answer cache and n8n resilience statistics.
+    """
+    return {
+        "database": db_service.stats(),
+        "response_cache": n8n_service.response_cache.stats(),
+        "n8n_admission": n8n_service.admission.stats(),
+        "n8n_circuit": n8n_service.circuit.stats(),
+        "n8n_retry": n8n_service.retry_policy.stats(),
+        "logging": log_pipeline.stats(),
+        "chat_jobs": chat_jobs.stats(),
+        "faq": faq_service.stats(),
+    }
+
+@router.post('/admin/faq/reload', dependencies=[Depends(require_admin)])
+async def reload_faq():
+    """
+    Rebuild the FAQ index from FAQ_PATH and swap it in without interrupting traffic.
+    """
+    try:
+        questions = await faq_service.reload()
+    except (OSError, ValueError) as e:
+        raise HTTPException(status_code=400, detail=f"FAQ reload failed: {e}")
+    return {"message": "FAQ reloaded", "questions": questions, "version": faq_service.version}
+
+@router.get('/admin/faq/search', dependencies=[Depends(require_admin)])
+async def search_faq(q: str, k: int = Query(3, ge=1, le=20)):
+    """
+    Show the closest FAQ answers for a question, for tuning FAQ_THRESHOLD.
+    """
+    return {"threshold": faq_service.threshold, "matches": await faq_service.search(q, k)}
+
+@router.get('/admin/export', dependencies=[Depends(require_admin)])
+async def export_sessions(
+    user_id: Optional[str] = None,
+    started_from: Optional[str] = Query(None, alias="from"),
+    started_to: Optional[str] = Query(None, alias="to"),
+    state: Optional[str] = Query(None, pattern="^(ended|active)$"),
+    include_messages: bool = True,
+    gzip: bool = False
+):
+    """
+    Stream sessions and their transcripts as NDJSON, optionally gzipped.
+
+    Rows are read page by page and written as they are encoded, so memory
+    use does not depend on the size of the export.
+    """
+    try:
+        started_from, started_to = parse_timestamp(started_from), parse_timestamp(started_to)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=f"Invalid date: {e}")
+    chunks = ndjson_chunks(export_records(
+        db_service, user_id, started_from, started_to, state, include_messages, EXPORT_PAGE_SIZE
+    ))
+    if gzip:
+        return StreamingResponse(
+            gzip_chunks(chunks),
+            media_type="application/gzip",
+            headers={"Content-Disposition": 'attachment; filename="chat-export.ndjson.gz"'}
+        )
+    return StreamingResponse(
+        chunks,
+        media_type="application/x-ndjson",
+        headers={"Content-Disposition": 'attachment; filename="chat-export.ndjson"'}
+    )
+
+@router.get('/admin/profiles', dependencies=[Depends(require_admin)])
+async def list_profiles():
+    """
+    List stored request profiles, newest first.
+    """
+    return {"profiles": profile_store.list()}
+
+@router.get('/admin/profiles/{profile_id}', dependencies=[Depends(require_admin)])
+async def download_profile(profile_id: str):
+    """
+    Download a request profile as collapsed stacks, ready for flame graph tools.
+    """
+    folded = profile_store.get(profile_id)
+    if folded is None:
+        raise HTTPException(status_code=404, detail="Profile not found")
+    return PlainTextResponse(
+        folded,
+        headers={"Content-Disposition": f'attachment; filename="{profile_id}.folded"'}
+    )
+
+@router.get('/metrics')
+async def metrics():
+    """
+    Expose metrics in the Prometheus text format.
+    """
+    return Response(content=REGISTRY.render(), media_type="text/plain; version=0.0.4; charset=utf-8")
+
 @router.get('/health')
 async def health_check():
     return {"status": "healthy", "timestamp": datetime.now(timezone.utc).isoformat()}
\ No newline at end of file
@@ -0,0 +1,147 @@
+"""
+Admission control module for chat application.
+Bounds concurrent upstream calls and sheds load early when saturated.
+"""
+
+import asyncio
+import time
+from collections import deque
+from contextlib import asynccontextmanager
+from typing import Any, AsyncIterator, Deque, Dict
+
+class AdmissionRejected(Exception):
+    """
+    Raised when a call is not admitted.
+
+    Attributes:
+        reason (str): 'queue_full' or 'queue_timeout'
+        status_code (int): HTTP status to answer with
+        retry_after (int): Seconds the client should wait before retrying
+    """
+
+    def __init__(self, reason: str, status_code: int, retry_after: int):
+        super().__init__(f"Service busy ({reason}), retry after {retry_after}s")
+        self.reason = reason
+        self.status_code = status_code
+        self.retry_after = retry_after
+
+class AdmissionController:
+    """
+    Admission controller with a bounded FIFO wait queue.
+
+    At most ``max_in_flight`` calls run at once. Further callers wait in a
+    queue of at most ``max_queue`` entries for up to ``queue_timeout``
+    seconds; callers beyond the queue, or that wait too long, are rejected
+    straight away with AdmissionRejected.
+    """
+
+    def __init__(self, max_in_flight: int = 8, max_queue: int = 32, queue_timeout: float = 10.0,
+                 retry_after: int = 5, status_code: int = 503):
+        """
+        Initialize the controller.
+
+        Args:
+            max_in_flight (int): Maximum concurrent admitted calls
+            max_queue (int): Maximum callers waiting for a slot
+            queue_timeout (float): Maximum seconds a caller may wait
+            retry_after (int): Retry-After hint for rejected callers, in seconds
+            status_code (int): HTTP status for rejections (503 or 429)
+        """
+        self.max_in_flight = max_in_flight
+        self.max_queue = max_queue
+        self.queue_timeout = queue_timeout
+        self.retry_after = retry_after
+        self.status_code = status_code
+        self.in_flight = 0
+        self._waiters: Deque[asyncio.Future] = deque()
+        self.admitted = 0
+        self.rejected_queue_full = 0
+        self.rejected_timeout = 0
+        self.total_wait_seconds = 0.0
+        self.max_wait_seconds = 0.0
+
+    @property
+    def queue_depth(self) -> int:
+        """Number of callers currently waiting for a slot."""
+        return sum(1 for waiter in self._waiters if not waiter.done())
+
+    def saturated(self) -> bool:
+        """
+        Whether a new caller would be rejected right now.
+
+        Returns:
+            bool: True when every slot and queue position is taken
+        """
+        return self.in_flight >= self.max_in_flight and self.queue_depth >= self.max_queue
+
+    async def acquire(self) -> None:
+        """
+        Wait for a slot.
+
+        Raises:
+            AdmissionRejected: If the queue is full or the wait exceeds queue_timeout
+        """
+        if self.in_flight < self.max_in_flight and not self.queue_depth:
+            self.in_flight += 1
+            self.admitted += 1
+            return
+        if self.queue_depth >= self.max_queue:
+            self.rejected_queue_full += 1
+            raise AdmissionRejected('queue_full', self.status_code, self.retry_after)
+        waiter = asyncio.get_running_loop().create_future()
+        self._waiters.append(waiter)
+        queued_at = time.perf_counter()
+        try:
+            await asyncio.wait_for(waiter, timeout=self.queue_timeout)
+        except asyncio.TimeoutError:
+            self.rejected_timeout += 1
+            raise AdmissionRejected('queue_timeout', self.status_code, self.retry_after)
+        except asyncio.CancelledError:
+            if waiter.done() and not waiter.cancelled():
+                # The slot was handed over just as we were cancelled
+                self.release()
+            raise
+        finally:
+            waited = time.perf_counter() - queued_at
+            self.total_wait_seconds += waited
+            self.max_wait_seconds = max(self.max_wait_seconds, waited)
+        # The releasing caller transferred its slot to us
+        self.admitted += 1
+
+    def release(self) -> None:
+        """Release a slot, handing it to the oldest waiter if any."""
+        while self._waiters:
+            waiter = self._waiters.popleft()
+            if not waiter.done():
+                waiter.set_result(None)
+                return
+        self.in_flight -= 1
+
+    @asynccontextmanager
+    async def slot(self) -> AsyncIterator[None]:
+        """Hold a slot for the duration of the block."""
+        await self.acquire()
+        try:
+            yield
+        finally:
+            self.release()
+
+    def stats(self) -> Dict[str, Any]:
+        """
+        Snapshot of admission counters.
+
+        Returns:
+            Dict[str, Any]: In-flight and queue gauges, admit/reject counts and wait times
+        """
+        waited = self.admitted + self.rejected_timeout
+        return {
+            'in_flight': self.in_flight,
+            'max_in_flight': self.max_in_flight,
+            'queue_depth': self.queue_depth,
+            'max_queue': self.max_queue,
+            'admitted': self.admitted,
+            'rejected_queue_full': self.rejected_queue_full,
+            'rejected_timeout': self.rejected_timeout,
+            'avg_wait_ms': (self.total_wait_seconds / waited * 1000) if waited else 0.0,
+            'max_wait_ms': self.max_wait_seconds * 1000,
+        }
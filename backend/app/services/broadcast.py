@@ -0,0 +1,213 @@
+"""
+Broadcast bus module for chat application.
+Carries WebSocket broadcasts between backend processes.
+"""
+
+import asyncio
+import json
+import os
+import uuid
+from typing import Any, Awaitable, Callable, Dict, List, Optional
+
+from .log import get_logger
+
+logger = get_logger(__name__)
+
+# Called with (session_id, message) for broadcasts published by other nodes
+DeliverFn = Callable[[str, Dict[str, Any]], Awaitable[None]]
+
+class BroadcastBus:
+    """
+    Base class for broadcast buses.
+
+    Each node delivers its own broadcasts locally and publishes them once
+    on the bus; ``deliver`` is called only for broadcasts from other nodes,
+    which then fan out to their own local sockets.
+    """
+
+    def __init__(self):
+        """Initialize the bus with a unique node identifier."""
+        self.node_id = uuid.uuid4().hex
+        self.published = 0
+        self.received = 0
+        self.reconnects = 0
+
+    async def start(self, deliver: DeliverFn) -> None:
+        """
+        Start receiving broadcasts from other nodes.
+
+        Args:
+            deliver (DeliverFn): Coroutine called for each remote broadcast
+        """
+        raise NotImplementedError
+
+    async def publish(self, session_id: str, message: Dict[str, Any]) -> None:
+        """
+        Publish a broadcast to the other nodes.
+
+        Args:
+            session_id (str): Target session identifier
+            message (Dict[str, Any]): Message to broadcast
+        """
+        raise NotImplementedError
+
+    async def stop(self) -> None:
+        """Stop receiving and release resources."""
+
+class InMemoryBroadcastBus(BroadcastBus):
+    """
+    Broadcast bus for a single process.
+
+    Nodes attached to the same hub instance exchange broadcasts directly;
+    with a single node publishing is a no-op.
+    """
+
+    def __init__(self, hub: Optional[List["InMemoryBroadcastBus"]] = None):
+        """
+        Initialize the bus.
+
+        Args:
+            hub (Optional[List]): Shared list of nodes, for several managers in one process
+        """
+        super().__init__()
+        self.hub = hub if hub is not None else []
+        self._deliver: Optional[DeliverFn] = None
+
+    async def start(self, deliver: DeliverFn) -> None:
+        self._deliver = deliver
+        if self not in self.hub:
+            self.hub.append(self)
+
+    async def publish(self, session_id: str, message: Dict[str, Any]) -> None:
+        self.published += 1
+        for node in self.hub:
+            if node is not self and node._deliver is not None:
+                node.received += 1
+                await node._deliver(session_id, message)
+
+    async def stop(self) -> None:
+        if self in self.hub:
+            self.hub.remove(self)
+        self._deliver = None
+
+class RedisBroadcastBus(BroadcastBus):
+    """
+    Broadcast bus over Redis-compatible pub/sub.
+
+    Every node subscribes to one channel; each broadcast is published once
+    with its origin node so nodes ignore their own messages. When the
+    subscription drops, the listener resubscribes with exponential backoff;
+    broadcasts published meanwhile are missed, as pub/sub does not queue.
+    Requires the optional ``redis`` package.
+    """
+
+    def __init__(self, url: str, channel: str = 'chat:broadcast', client: Any = None,
+                 retry_backoff: float = 0.5, max_backoff: float = 30.0):
+        """
+        Initialize the bus.
+
+        Args:
+            url (str): Redis connection URL
+            channel (str): Pub/sub channel shared by all nodes
+            client (Any): Pre-built redis.asyncio client, mainly for tests
+            retry_backoff (float): Seconds before the first resubscribe, doubled per failure
+            max_backoff (float): Longest wait between resubscribe attempts
+        """
+        super().__init__()
+        self.url = url
+        self.channel = channel
+        self.retry_backoff = retry_backoff
+        self.max_backoff = max_backoff
+        self._client = client
+        self._pubsub = None
+        self._task: Optional[asyncio.Task] = None
+
+    async def start(self, deliver: DeliverFn) -> None:
+        if self._client is None:
+            try:
+                import redis.asyncio as redis
+            except ImportError as e:
+                raise RuntimeError("BROADCAST_BACKEND=redis requires the 'redis' package") from e
+            self._client = redis.from_url(self.url)
+        self._pubsub = self._client.pubsub()
+        await self._pubsub.subscribe(self.channel)
+        self._task = asyncio.get_running_loop().create_task(self._listen(deliver))
+
+    async def _listen(self, deliver: DeliverFn) -> None:
+        """Relay broadcasts from other nodes until stopped, resubscribing when the connection drops."""
+        failures = 0
+        while True:
+            try:
+                if self._pubsub is None:
+                    self._pubsub = self._client.pubsub()
+                    await self._pubsub.subscribe(self.channel)
+                    logger.info('broadcast_resubscribed', channel=self.channel, attempts=failures)
+                async for item in self._pubsub.listen():
+                    failures = 0
+                    if item.get('type') != 'message':
+                        continue
+                    try:
+                        envelope = json.loads(item['data'])
+                        if envelope.get('origin') == self.node_id:
+                            continue
+                        self.received += 1
+                        await deliver(envelope['session_id'], envelope['message'])
+                    except Exception:
+                        logger.exception('broadcast_delivery_failed')
+                raise ConnectionError("pub/sub stream ended")
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                failures += 1
+                self.reconnects += 1
+                delay = min(self.max_backoff, self.retry_backoff * 2 ** (failures - 1))
+                logger.warning('broadcast_subscription_lost', channel=self.channel, error=repr(e), retry_in=delay)
+                await self._discard_pubsub()
+                await asyncio.sleep(delay)
+
+    async def _discard_pubsub(self) -> None:
+        """Close a broken subscription, ignoring errors from the dead connection."""
+        pubsub, self._pubsub = self._pubsub, None
+        if pubsub is not None:
+            try:
+                await pubsub.close()
+            except Exception:
+                pass
+
+    async def publish(self, session_id: str, message: Dict[str, Any]) -> None:
+        envelope = {'origin': self.node_id, 'session_id': session_id, 'message': message}
+        try:
+            await self._client.publish(self.channel, json.dumps(envelope, default=str))
+            self.published += 1
+        except Exception as e:
+            logger.warning('broadcast_publish_failed', session_id=session_id, error=repr(e))
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except (asyncio.CancelledError, Exception):
+                pass
+            self._task = None
+        if self._pubsub is not None:
+            await self._pubsub.unsubscribe(self.channel)
+            await self._pubsub.close()
+            self._pubsub = None
+        if self._client is not None:
+            await self._client.close()
+            self._client = None
+
+def create_broadcast_bus() -> BroadcastBus:
+    """
+    Create the broadcast bus selected by BROADCAST_BACKEND.
+
+    Returns:
+        BroadcastBus: Redis bus for 'redis', otherwise the in-memory bus
+    """
+    if os.getenv('BROADCAST_BACKEND', 'memory').lower() == 'redis':
+        return RedisBroadcastBus(
+            os.getenv('REDIS_URL', 'redis://localhost:6379/0'),
+            channel=os.getenv('BROADCAST_CHANNEL', 'chat:broadcast')
+        )
+    return InMemoryBroadcastBus()
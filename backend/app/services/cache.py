@@ -0,0 +1,146 @@
+"""
+Cache module for chat application.
+Provides small bounded in-process caches shared by the services.
+"""
+
+import time
+from collections import OrderedDict
+from threading import Lock
+from typing import Any, Dict, Hashable, Optional
+
+class LRUCache:
+    """
+    Bounded least-recently-used cache.
+
+    Lookups refresh an entry's recency; inserting beyond ``maxsize``
+    entries or ``max_bytes`` of declared entry sizes evicts the least
+    recently used entries. Entries older than ``ttl`` seconds are treated
+    as misses. Operations are guarded by a lock so the cache can also be
+    touched from executor threads.
+    """
+
+    def __init__(self, maxsize: int = 10000, ttl: Optional[float] = None, max_bytes: Optional[int] = None):
+        """
+        Initialize the cache.
+
+        Args:
+            maxsize (int): Maximum number of entries to keep
+            ttl (Optional[float]): Seconds an entry stays valid, None for no expiry
+            max_bytes (Optional[int]): Memory budget across entry sizes, None for no budget
+        """
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.max_bytes = max_bytes
+        # key -> (value, expires_at, size)
+        self._data: "OrderedDict[Hashable, tuple]" = OrderedDict()
+        self._lock = Lock()
+        self.total_bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, key: Hashable, default: Any = None) -> Any:
+        """
+        Get a value and mark it as recently used.
+
+        Args:
+            key (Hashable): Cache key
+            default (Any): Value returned on a miss
+
+        Returns:
+            Any: Cached value or default
+        """
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is not None:
+                value, expires_at, _ = entry
+                if expires_at is None or expires_at > time.monotonic():
+                    self._data.move_to_end(key)
+                    self.hits += 1
+                    return value
+                self._remove(key)
+            self.misses += 1
+            return default
+
+    def set(self, key: Hashable, value: Any = True, size: int = 0) -> None:
+        """
+        Store a value, evicting the oldest entries when over budget.
+
+        Args:
+            key (Hashable): Cache key
+            value (Any): Value to store
+            size (int): Approximate size of the entry in bytes
+        """
+        with self._lock:
+            if key in self._data:
+                self._remove(key)
+            if self.max_bytes is not None and size > self.max_bytes:
+                return
+            expires_at = time.monotonic() + self.ttl if self.ttl else None
+            self._data[key] = (value, expires_at, size)
+            self.total_bytes += size
+            while len(self._data) > self.maxsize or (
+                self.max_bytes is not None and self.total_bytes > self.max_bytes
+            ):
+                oldest = next(iter(self._data))
+                self._remove(oldest)
+                self.evictions += 1
+
+    def discard(self, key: Hashable) -> bool:
+        """
+        Remove an entry if present.
+
+        Args:
+            key (Hashable): Cache key
+
+        Returns:
+            bool: True if an entry was removed
+        """
+        with self._lock:
+            if key not in self._data:
+                return False
+            self._remove(key)
+            return True
+
+    def clear(self) -> None:
+        """Remove every entry."""
+        with self._lock:
+            self._data.clear()
+            self.total_bytes = 0
+
+    def _remove(self, key: Hashable) -> None:
+        """Drop an entry and its size accounting. Caller holds the lock."""
+        _, _, size = self._data.pop(key)
+        self.total_bytes -= size
+
+    def stats(self) -> Dict[str, Any]:
+        """
+        Snapshot of cache counters.
+
+        Returns:
+            Dict[str, Any]: Entry count, size and hit/miss/eviction counts
+        """
+        return {
+            'entries': len(self._data),
+            'bytes': self.total_bytes,
+            'max_entries': self.maxsize,
+            'max_bytes': self.max_bytes,
+            'ttl': self.ttl,
+            'hits': self.hits,
+            'misses': self.misses,
+            'evictions': self.evictions,
+        }
+
+    def __contains__(self, key: Hashable) -> bool:
+        # Same expiry rule as get, without touching recency or hit counters
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None:
+                return False
+            if entry[1] is None or entry[1] > time.monotonic():
+                return True
+            self._remove(key)
+            return False
+
+    def __len__(self) -> int:
+        return len(self._data)
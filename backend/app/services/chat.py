@@ -0,0 +1,99 @@
+"""
+Chat turn module for chat application.
+Runs the persist -> n8n -> persist pipeline shared by the HTTP and WebSocket transports.
+"""
+
+from typing import Any, Dict, Optional
+
+from .database import DatabaseService
+from .n8n import N8NService
+from .admission import AdmissionRejected
+from .faq import faq_service
+from .metrics import CHAT_STAGE_SECONDS, CHAT_TURN_ERRORS, StageTimer
+from .log import get_logger
+
+logger = get_logger(__name__)
+
+ERROR_MESSAGE = 'Sorry, something went wrong.'
+
+class ChatTurnError(Exception):
+    """Raised when a chat turn fails after the apology has been stored."""
+
+class TurnRejected(AdmissionRejected):
+    """Raised when n8n admission rejects a turn before anything was stored, so it can be retried as is."""
+
+async def save_apology(db: DatabaseService, session_id: str) -> None:
+    """Store the apology as the bot turn; a failure here is logged so the original error still surfaces."""
+    try:
+        await db.save_message(session_id, 'bot', ERROR_MESSAGE)
+    except Exception as e:
+        logger.warning('chat_apology_save_failed', error=repr(e))
+
+async def run_chat_turn(
+    db: DatabaseService,
+    n8n: N8NService,
+    session_id: str,
+    message: str,
+    stages: Optional[StageTimer] = None
+) -> Dict[str, Any]:
+    """
+    Run one chat turn.
+
+    Answers from the FAQ or else n8n and stores both turns. Raises
+    TurnRejected before storing anything when n8n is saturated, and
+    ChatTurnError after storing an apology on any other failure.
+
+    Args:
+        db (DatabaseService): Storage service
+        n8n (N8NService): n8n service
+        session_id (str): Session identifier
+        message (str): Message from the user
+        stages (Optional[StageTimer]): Timer to record stages on, so the caller can report them
+
+    Returns:
+        Dict[str, Any]: n8n response, with ``response`` set to the bot reply when one was found
+
+    Raises:
+        TurnRejected: If n8n is saturated or its circuit is open and nothing was stored
+        AdmissionRejected: If n8n turned busy after the user message was stored
+        ChatTurnError: If storing or contacting n8n fails
+    """
+    stages = stages or StageTimer(CHAT_STAGE_SECONDS)
+    stages.enter('faq')
+    faq_answer = await faq_service.answer(message)
+    if faq_answer is None:
+        try:
+            n8n.check_admission(message)
+        except AdmissionRejected as e:
+            raise TurnRejected(e.reason, e.status_code, e.retry_after) from e
+    try:
+        # Ensure session exists and save user message
+        stages.enter('session_lookup')
+        await db.get_or_create_session(session_id)
+        stages.enter('save_user')
+        await db.save_message(session_id, 'user', message)
+
+        # Forward message to n8n unless the FAQ answered it
+        if faq_answer is not None:
+            response_json = faq_answer
+            bot_message = faq_answer['response']
+        else:
+            stages.enter('n8n')
+            response_json = await n8n.send_message(session_id, message)
+            bot_message = n8n.extract_bot_message(response_json)
+
+        if bot_message and isinstance(bot_message, str):
+            stages.enter('save_bot')
+            await db.save_message(session_id, 'bot', bot_message)
+            response_json["response"] = bot_message.replace('\n', ' ')
+
+        stages.finish()
+        return response_json
+    except Exception as e:
+        CHAT_TURN_ERRORS.labels(stages.current).inc()
+        logger.warning('chat_turn_failed', stage=stages.current, error=repr(e))
+        stages.finish()
+        if isinstance(e, AdmissionRejected):
+            raise
+        await save_apology(db, session_id)
+        raise ChatTurnError(ERROR_MESSAGE) from e
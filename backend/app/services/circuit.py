@@ -0,0 +1,146 @@
+"""
+Circuit breaker module for chat application.
+Stops calling an upstream that keeps failing and probes it again after a cool-down.
+"""
+
+import math
+import time
+from typing import Any, Dict, Optional
+
+from .admission import AdmissionRejected
+
+CLOSED = 'closed'
+OPEN = 'open'
+HALF_OPEN = 'half_open'
+
+class CircuitOpen(AdmissionRejected):
+    """Raised instead of calling an upstream whose circuit is open."""
+
+    def __init__(self, status_code: int, retry_after: int):
+        super().__init__('circuit_open', status_code, retry_after)
+
+class CircuitBreaker:
+    """
+    Three-state circuit breaker.
+
+    While closed, calls go through and consecutive failures are counted;
+    ``failure_threshold`` failures in a row open the circuit. While open,
+    calls fail immediately with CircuitOpen. After ``recovery_timeout``
+    seconds the circuit turns half-open and lets up to
+    ``half_open_max_calls`` probe calls through: a successful probe closes
+    the circuit, a failed one opens it again for another cool-down.
+
+    Callers bracket each upstream call with ``before_call()`` and then
+    ``record_success()`` or ``record_failure()``.
+    """
+
+    def __init__(self, failure_threshold: int = 5, recovery_timeout: float = 30.0,
+                 half_open_max_calls: int = 1, status_code: int = 503):
+        """
+        Initialize the breaker in the closed state.
+
+        Args:
+            failure_threshold (int): Consecutive failures that open the circuit
+            recovery_timeout (float): Seconds to stay open before probing
+            half_open_max_calls (int): Concurrent probe calls allowed while half-open
+            status_code (int): HTTP status for calls rejected while open
+        """
+        self.failure_threshold = failure_threshold
+        self.recovery_timeout = recovery_timeout
+        self.half_open_max_calls = half_open_max_calls
+        self.status_code = status_code
+        self._state = CLOSED
+        self._opened_at: Optional[float] = None
+        self.consecutive_failures = 0
+        self.probes_in_flight = 0
+        self.times_opened = 0
+        self.short_circuited = 0
+        self.successes = 0
+        self.failures = 0
+
+    @property
+    def state(self) -> str:
+        """Current state, turning open into half-open once the cool-down has passed."""
+        if self._state == OPEN and time.monotonic() - self._opened_at >= self.recovery_timeout:
+            self._state = HALF_OPEN
+            self.probes_in_flight = 0
+        return self._state
+
+    def retry_after(self) -> int:
+        """
+        Seconds until the circuit will accept a probe call.
+
+        Returns:
+            int: Whole seconds, at least 1
+        """
+        if self._opened_at is None:
+            return 1
+        remaining = self.recovery_timeout - (time.monotonic() - self._opened_at)
+        return max(1, math.ceil(remaining))
+
+    def allows_calls(self) -> bool:
+        """
+        Whether a call would be let through right now, without claiming a probe.
+
+        Returns:
+            bool: False while open or while every half-open probe is taken
+        """
+        state = self.state
+        if state == OPEN:
+            return False
+        return state == CLOSED or self.probes_in_flight < self.half_open_max_calls
+
+    def before_call(self) -> None:
+        """
+        Claim permission for one upstream call.
+
+        Raises:
+            CircuitOpen: If the circuit is open or no probe slot is free
+        """
+        if not self.allows_calls():
+            self.short_circuited += 1
+            raise CircuitOpen(self.status_code, self.retry_after())
+        if self._state == HALF_OPEN:
+            self.probes_in_flight += 1
+
+    def record_success(self) -> None:
+        """Record a successful call, closing the circuit after a good probe."""
+        self.successes += 1
+        self.consecutive_failures = 0
+        if self._state == HALF_OPEN:
+            self._state = CLOSED
+            self._opened_at = None
+            self.probes_in_flight = 0
+
+    def record_failure(self) -> None:
+        """Record a failed call, opening the circuit when the threshold is reached."""
+        self.failures += 1
+        self.consecutive_failures += 1
+        if self._state == HALF_OPEN or self.consecutive_failures >= self.failure_threshold:
+            if self._state != OPEN:
+                self.times_opened += 1
+            self._state = OPEN
+            self._opened_at = time.monotonic()
+            self.probes_in_flight = 0
+
+    def release_probe(self) -> None:
+        """Give back a probe slot for a call that ended without a verdict."""
+        if self._state == HALF_OPEN and self.probes_in_flight:
+            self.probes_in_flight -= 1
+
+    def stats(self) -> Dict[str, Any]:
+        """
+        Snapshot of breaker state and counters.
+
+        Returns:
+            Dict[str, Any]: State, failure streak and call outcome counts
+        """
+        return {
+            'state': self.state,
+            'consecutive_failures': self.consecutive_failures,
+            'failure_threshold': self.failure_threshold,
+            'times_opened': self.times_opened,
+            'short_circuited': self.short_circuited,
+            'successes': self.successes,
+            'failures': self.failures,
+        }
@@ -0,0 +1,79 @@
+"""
+Request coalescing module for chat application.
+Lets concurrent callers with the same key share one in-flight upstream call.
+"""
+
+import asyncio
+import copy
+from typing import Any, Awaitable, Callable, Dict, Hashable
+
+class SingleFlight:
+    """
+    Single-flight call deduplication.
+
+    The first caller for a key starts the call as a task; callers arriving
+    while it is in flight wait on the same task. Every caller gets its own
+    copy of the result, or the same exception. A caller being cancelled
+    only cancels the shared call when no other caller is still waiting.
+    """
+
+    def __init__(self):
+        """Initialize with no calls in flight."""
+        self._calls: Dict[Hashable, asyncio.Task] = {}
+        self._waiters: Dict[Hashable, int] = {}
+        self.started = 0
+        self.coalesced = 0
+
+    async def do(self, key: Hashable, fn: Callable[[], Awaitable[Any]]) -> Any:
+        """
+        Run fn once per key among concurrent callers.
+
+        Args:
+            key (Hashable): Deduplication key
+            fn (Callable): Zero-argument coroutine function performing the call
+
+        Returns:
+            Any: A copy of fn's result
+
+        Raises:
+            Exception: Whatever fn raises
+        """
+        task = self._calls.get(key)
+        if task is None:
+            task = asyncio.get_running_loop().create_task(fn())
+            self._calls[key] = task
+            self._waiters[key] = 0
+            task.add_done_callback(lambda _: self._forget(key, task))
+            self.started += 1
+        else:
+            self.coalesced += 1
+        self._waiters[key] += 1
+        try:
+            result = await asyncio.shield(task)
+        except asyncio.CancelledError:
+            if not task.done() and self._release(key, task) == 0:
+                task.cancel()
+            raise
+        self._release(key, task)
+        return copy.deepcopy(result)
+
+    def _release(self, key: Hashable, task: asyncio.Task) -> int:
+        """Drop one waiter for a call and return how many remain."""
+        if self._calls.get(key) is not task:
+            return 0
+        self._waiters[key] -= 1
+        return self._waiters[key]
+
+    def _forget(self, key: Hashable, task: asyncio.Task) -> None:
+        """Remove a finished call so later callers start a fresh one."""
+        if self._calls.get(key) is task:
+            del self._calls[key]
+            del self._waiters[key]
+        if not task.cancelled():
+            # Mark the exception as retrieved when every waiter has gone
+            task.exception()
+
+    @property
+    def in_flight(self) -> int:
+        """Number of distinct calls currently running."""
+        return len(self._calls)
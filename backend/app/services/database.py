@@ -4,15 +4,34 @@ Handles all interactions with Supabase database.
 """
 
 from datetime import datetime, timezone
-from typing import List, Optional
+from typing import AsyncIterator, List, Optional
 from supabase import Client, create_client
+from postgrest.types import ReturnMethod
+import asyncio
 import os
-from ..models.chat import ChatMessage, ChatSession
+from ..models.chat import ChatMessage, ChatSession, ChatSessionSummary
+from .executor import BoundedExecutor
+from .cache import LRUCache
+from .write_behind import WriteBehindBuffer
+from .pagination import Cursor, is_backward, keyset_filter
+from .serialization import project
+from .metrics import REGISTRY, MetricsRegistry
+from .log import get_logger
+
+logger = get_logger(__name__)
+
+# View that adds per-session message aggregates to chat_sessions
+SESSION_SUMMARY_VIEW = os.getenv('DB_SESSION_SUMMARY_VIEW', 'chat_session_summaries')
+# Vector store read by the n8n company_knowledge tool and written by ingestion
+DOCUMENTS_TABLE = os.getenv('DB_DOCUMENTS_TABLE', 'documents')
 
 class DatabaseService:
     """
     Service class for handling all database operations.
     Manages chat sessions and messages using Supabase.
+
+    The Supabase client is synchronous, so every query runs on a bounded
+    thread pool and the public methods are awaitable from route handlers.
     """
     
     def __init__(self, url: str, key: str):
@@ -24,32 +43,263 @@ class DatabaseService:
             key (str): Supabase API key
         """
         self.client: Client = create_client(url, key)
+        max_workers = int(os.getenv('DB_MAX_WORKERS', '10'))
+        self.executor = BoundedExecutor(
+            max_workers=max_workers,
+            max_concurrency=int(os.getenv('DB_MAX_CONCURRENCY', str(max_workers))),
+            name='supabase'
+        )
+        # Session IDs already known to exist, so repeat turns skip the database
+        self.known_sessions = LRUCache(maxsize=int(os.getenv('DB_SESSION_CACHE_SIZE', '10000')))
+        # Optional write-behind mode: messages are queued and bulk-inserted in the background
+        self.write_behind: Optional[WriteBehindBuffer] = None
+        if os.getenv('DB_WRITE_BEHIND', 'false').lower() == 'true':
+            self.write_behind = WriteBehindBuffer(
+                self._insert_messages,
+                batch_size=int(os.getenv('DB_WRITE_BEHIND_BATCH_SIZE', '50')),
+                flush_interval=float(os.getenv('DB_WRITE_BEHIND_INTERVAL', '0.5')),
+                max_pending=int(os.getenv('DB_WRITE_BEHIND_MAX_PENDING', '10000')),
+                max_retries=int(os.getenv('DB_WRITE_BEHIND_MAX_RETRIES', '3')),
+                retry_backoff=float(os.getenv('DB_WRITE_BEHIND_RETRY_BACKOFF', '0.1')),
+                max_requeues=int(os.getenv('DB_WRITE_BEHIND_MAX_REQUEUES', '5'))
+            )
+
+    def stats(self) -> dict:
+        """
+        Get storage executor metrics.
+
+        Returns:
+            dict: Executor counters and timings, plus write-behind counters when enabled
+        """
+        stats = self.executor.stats()
+        if self.write_behind:
+            stats['write_behind'] = self.write_behind.stats()
+        return stats
 
-<<<<<<< HEAD
-    def get_user_sessions(self, user_id: str) -> List[ChatSession]:
+    def register_metrics(self, registry: MetricsRegistry) -> None:
         """
-        Get all chat sessions for a given user.
+        Expose storage executor, session cache and write-behind counters as metrics.
+
+        Args:
+            registry (MetricsRegistry): Registry to add the metrics to
+        """
+        registry.callback('gauge', 'db_in_flight_queries', 'Supabase queries currently running',
+                          lambda: self.executor.in_flight)
+        registry.callback('gauge', 'db_waiting_queries', 'Supabase queries waiting for a worker',
+                          lambda: self.executor.waiting)
+        registry.callback('counter', 'db_queries_total', 'Supabase queries by outcome',
+                          lambda: {('ok',): self.executor.completed, ('error',): self.executor.failed}, ('outcome',))
+        registry.callback('counter', 'db_session_cache_hits_total', 'Session lookups answered from memory',
+                          lambda: self.known_sessions.hits)
+        registry.callback('counter', 'db_session_cache_misses_total', 'Session lookups that went to the database',
+                          lambda: self.known_sessions.misses)
+        if self.write_behind:
+            registry.callback('gauge', 'db_write_behind_pending', 'Message rows waiting to be written',
+                              lambda: self.write_behind.pending_count)
+            registry.callback('counter', 'db_write_behind_dropped_total', 'Message rows dropped by the write-behind buffer',
+                              lambda: self.write_behind.dropped_rows)
+
+    async def startup(self) -> None:
+        """Start background workers. Called from the application lifespan."""
+        if self.write_behind:
+            self.write_behind.start()
+
+    async def shutdown(self) -> None:
+        """Flush buffered writes and release the storage thread pool."""
+        if self.write_behind:
+            await self.write_behind.stop()
+        # Joining the pool's threads blocks, so do it off the event loop
+        await asyncio.get_running_loop().run_in_executor(None, self.executor.shutdown, True)
+
+    async def get_user_sessions(
+        self,
+        user_id: str,
+        limit: Optional[int] = None,
+        before: Optional[Cursor] = None,
+        after: Optional[Cursor] = None,
+        since: Optional[str] = None
+    ) -> List[ChatSession]:
+        """
+        Get chat sessions for a given user, oldest first.
+
+        Without paging arguments every session is returned. See
+        _paginate for how limit and the cursors select a page.
 
         Args:
             user_id (str): The user's identifier
+            limit (Optional[int]): Maximum number of sessions to return
+            before (Optional[Cursor]): Only sessions before this (started_at, session_id) position
+            after (Optional[Cursor]): Only sessions after this (started_at, session_id) position
+            since (Optional[str]): Only sessions started after this ISO timestamp
 
         Returns:
             List[ChatSession]: List of chat sessions
         """
+        rows = await self._select_user_sessions('chat_sessions', user_id, limit, before, after, since)
+        return [ChatSession(**session) for session in rows]
+
+    async def get_user_session_summaries(
+        self,
+        user_id: str,
+        limit: Optional[int] = None,
+        before: Optional[Cursor] = None,
+        after: Optional[Cursor] = None,
+        since: Optional[str] = None
+    ) -> List[ChatSessionSummary]:
+        """
+        Get a user's sessions with message count, last message and last activity.
+
+        Reads the chat_session_summaries view (sql/chat_session_summaries.sql),
+        which aggregates every session on the page in the same query, so
+        the cost is one round trip however many sessions the user has.
+        Messages still in the write-behind buffer are not counted yet.
+
+        Args:
+            user_id (str): User identifier
+            limit, before, after, since: As for get_user_sessions
+
+        Returns:
+            List[ChatSessionSummary]: Sessions with their aggregates, oldest first
+        """
+        rows = await self._select_user_sessions(SESSION_SUMMARY_VIEW, user_id, limit, before, after, since)
+        return [ChatSessionSummary(**session) for session in rows]
+
+    async def _select_user_sessions(self, table: str, user_id: str, limit, before, after, since) -> List[dict]:
+        """Read one page of a user's session rows from ``table`` in ascending order."""
         try:
-            resp = self.client.table('chat_sessions').select('*').eq('user_id', user_id).order('started_at').execute()
-            return [ChatSession(**session) for session in (resp.data or [])]
-        except Exception as e:
-            print(f"Error getting user sessions: {str(e)}")
-            import traceback
-            print(f"Error traceback: {traceback.format_exc()}")
+            def query():
+                q = self.client.table(table).select('*').eq('user_id', user_id)
+                return self._paginate(q, 'started_at', 'session_id', limit, before, after, since).execute()
+            resp = await self.executor.run(query)
+            rows = resp.data or []
+            if is_backward(limit, before, after, since):
+                rows.reverse()
+            return rows
+        except Exception:
+            logger.exception('sessions_query_failed', user_id=user_id, table=table)
             raise
 
-=======
->>>>>>> c1f9070ccb7a29111fee9de0911e64545c5cae06
-    def get_or_create_session(self, session_id: str) -> None:
+    def _paginate(self, query, column: str, tiebreak: str, limit, before, after, since):
+        """
+        Apply keyset pagination to a query.
+
+        ``after`` and ``since`` read forward from a position; ``before``
+        reads backwards from one. ``limit`` alone returns the newest rows.
+        Rows are read newest-first in the backward cases, so callers
+        reverse them to keep results in ascending order.
+
+        Args:
+            query: PostgREST query builder
+            column (str): Sort column
+            tiebreak (str): Unique tiebreak column
+            limit (Optional[int]): Maximum rows
+            before (Optional[Cursor]): Upper bound position
+            after (Optional[Cursor]): Lower bound position
+            since (Optional[str]): Lower bound on the sort column
+
+        Returns:
+            The query with filters, ordering and limit applied
+        """
+        if limit is None and before is None and after is None and since is None:
+            return query.order(column)
+        if after is not None:
+            query.params = query.params.add('or', keyset_filter(column, tiebreak, after, 'gt'))
+        if before is not None:
+            query.params = query.params.add('or', keyset_filter(column, tiebreak, before, 'lt'))
+        if since is not None:
+            query = query.gt(column, since)
+        desc = is_backward(limit, before, after, since)
+        query = query.order(column, desc=desc).order(tiebreak, desc=desc)
+        if limit is not None:
+            query = query.limit(limit)
+        return query
+
+    @staticmethod
+    def _forward_page(query, column: str, tiebreak: str, cursor: Optional[Cursor], page_size: int):
+        """Select the next ``page_size`` rows after ``cursor`` in ascending order."""
+        if cursor is not None:
+            query.params = query.params.add('or', keyset_filter(column, tiebreak, cursor, 'gt'))
+        return query.order(column).order(tiebreak).limit(page_size)
+
+    async def iter_sessions(
+        self,
+        user_id: Optional[str] = None,
+        started_from: Optional[str] = None,
+        started_to: Optional[str] = None,
+        state: Optional[str] = None,
+        page_size: int = 500
+    ) -> AsyncIterator[dict]:
+        """
+        Iterate over matching sessions, oldest first, one page at a time.
+
+        Pages are read by keyset on (started_at, session_id), so each query
+        costs the same however deep the export is and at most one page is
+        held in memory.
+
+        Args:
+            user_id (Optional[str]): Only this user's sessions
+            started_from (Optional[str]): Only sessions started at or after this ISO timestamp
+            started_to (Optional[str]): Only sessions started before this ISO timestamp
+            state (Optional[str]): ``ended`` or ``active`` to filter on ended_at
+            page_size (int): Rows per query
+
+        Yields:
+            dict: Session rows as stored
+        """
+        cursor: Optional[Cursor] = None
+        while True:
+            def query(cursor=cursor):
+                q = self.client.table('chat_sessions').select('*')
+                if user_id:
+                    q = q.eq('user_id', user_id)
+                if started_from:
+                    q = q.gte('started_at', started_from)
+                if started_to:
+                    q = q.lt('started_at', started_to)
+                if state == 'ended':
+                    q = q.not_.is_('ended_at', 'null')
+                elif state == 'active':
+                    q = q.is_('ended_at', 'null')
+                return self._forward_page(q, 'started_at', 'session_id', cursor, page_size).execute()
+            rows = (await self.executor.run(query)).data or []
+            for row in rows:
+                yield row
+            if len(rows) < page_size:
+                return
+            cursor = (str(rows[-1]['started_at']), rows[-1]['session_id'])
+
+    async def iter_session_messages(self, session_id: str, page_size: int = 1000) -> AsyncIterator[dict]:
         """
-        Retrieve existing session or create new one.
+        Iterate over a session's stored messages, oldest first, one page at a time.
+
+        Messages still waiting in the write-behind buffer are not included.
+
+        Args:
+            session_id (str): Session identifier
+            page_size (int): Rows per query
+
+        Yields:
+            dict: Message rows as stored
+        """
+        cursor: Optional[Cursor] = None
+        while True:
+            def query(cursor=cursor):
+                q = self.client.table('chat_messages').select('*').eq('session_id', session_id)
+                return self._forward_page(q, 'timestamp', 'message_id', cursor, page_size).execute()
+            rows = (await self.executor.run(query)).data or []
+            for row in rows:
+                yield row
+            if len(rows) < page_size:
+                return
+            cursor = (str(rows[-1]['timestamp']), rows[-1].get('message_id'))
+
+    async def get_or_create_session(self, session_id: str) -> None:
+        """
+        Ensure a session row exists, creating it if needed.
+
+        Sessions already seen by this process are served from an in-memory
+        LRU without touching the database; otherwise a single idempotent
+        upsert (insert, ignoring duplicates) is issued.
         
         Args:
             session_id (str): Unique session identifier
@@ -57,18 +307,24 @@ class DatabaseService:
         Returns:
             None
         """
-        session_resp = self.client.table('chat_sessions').select('*').eq('session_id', session_id).execute()
-        if not session_resp.data:
-            self.client.table('chat_sessions').insert({
-                'session_id': session_id,
-                'user_id': f"user_{session_id[:8]}",
-                'started_at': datetime.now(timezone.utc).isoformat(),
-                'ended_at': None
-            }).execute()
+        if self.known_sessions.get(session_id):
+            return
+        row = {
+            'session_id': session_id,
+            'user_id': f"user_{session_id[:8]}",
+            'started_at': datetime.now(timezone.utc).isoformat(),
+            'ended_at': None
+        }
+        await self.executor.run(
+            lambda: self.client.table('chat_sessions').upsert(row, on_conflict='session_id', ignore_duplicates=True).execute()
+        )
+        self.known_sessions.set(session_id)
 
-    def save_message(self, session_id: str, sender: str, message: str) -> None:
+    async def save_message(self, session_id: str, sender: str, message: str) -> None:
         """
         Save a new message to the database.
+
+        In write-behind mode the row is queued and inserted later in a batch.
         
         Args:
             session_id (str): Session identifier
@@ -78,41 +334,116 @@ class DatabaseService:
         Returns:
             None
         """
-        self.client.table('chat_messages').insert({
+        row = {
             'session_id': session_id,
             'sender': sender,
             'message': message,
             'timestamp': datetime.now(timezone.utc).isoformat()
-        }).execute()
+        }
+        if self.write_behind:
+            await self.write_behind.put(row)
+            return
+        await self._insert_messages([row])
 
-    def get_session_messages(self, session_id: str) -> List[ChatMessage]:
+    async def _insert_messages(self, rows: List[dict]) -> None:
         """
-        Retrieve all messages for a given session.
+        Insert one or more message rows in a single request.
+
+        Args:
+            rows (List[dict]): Message rows to insert
+        """
+        payload = rows[0] if len(rows) == 1 else rows
+        await self.executor.run(lambda: self.client.table('chat_messages').insert(payload).execute())
+
+    async def get_session_messages(
+        self,
+        session_id: str,
+        limit: Optional[int] = None,
+        before: Optional[Cursor] = None,
+        after: Optional[Cursor] = None,
+        since: Optional[str] = None
+    ) -> List[ChatMessage]:
+        """
+        Retrieve messages for a given session, oldest first.
+
+        Without paging arguments the whole history is returned. See
+        _paginate for how limit and the cursors select a page.
         
         Args:
             session_id (str): Session identifier
+            limit (Optional[int]): Maximum number of messages to return
+            before (Optional[Cursor]): Only messages before this (timestamp, message_id) position
+            after (Optional[Cursor]): Only messages after this (timestamp, message_id) position
+            since (Optional[str]): Only messages newer than this ISO timestamp
             
         Returns:
             List[ChatMessage]: List of chat messages
         """
-<<<<<<< HEAD
+        rows = await self.get_session_message_rows(session_id, limit, before, after, since)
+        return [ChatMessage(**msg) for msg in rows]
+
+    async def get_session_message_rows(
+        self,
+        session_id: str,
+        limit: Optional[int] = None,
+        before: Optional[Cursor] = None,
+        after: Optional[Cursor] = None,
+        since: Optional[str] = None
+    ) -> List[dict]:
+        """
+        Retrieve messages for a given session as plain rows, oldest first.
+
+        Same selection as get_session_messages, but rows skip the model
+        round trip: they are trusted as stored and only projected to the
+        ChatMessage fields, with timestamps left as the ISO strings
+        PostgREST returns.
+
+        Returns:
+            List[dict]: Message rows
+        """
         try:
-            print(f"Querying Supabase for messages with session_id: {session_id}")
-            resp = self.client.table('chat_messages').select('*').eq('session_id', session_id).order('timestamp').execute()
-            print(f"Supabase response: {resp}")
-            print(f"Response data: {resp.data}")
-            return [ChatMessage(**msg) for msg in (resp.data or [])]
-        except Exception as e:
-            print(f"Database error: {str(e)}")
-            import traceback
-            print(f"Database error traceback: {traceback.format_exc()}")
+            def query():
+                q = self.client.table('chat_messages').select('*').eq('session_id', session_id)
+                return self._paginate(q, 'timestamp', 'message_id', limit, before, after, since).execute()
+            resp = await self.executor.run(query)
+            rows = resp.data or []
+            logger.debug('history_fetched', session_id=session_id, rows=len(rows))
+            if is_backward(limit, before, after, since):
+                rows.reverse()
+            if self.write_behind and before is None:
+                # Unflushed rows are always the newest, so they only belong on the latest page
+                pending = self.write_behind.pending_for(session_id)
+                lower = since or (after[0] if after else None)
+                if lower is not None:
+                    pending = [r for r in pending if r['timestamp'] > lower]
+                rows = self._merge_pending(rows, pending)
+            return project(rows, ChatMessage.__fields__)
+        except Exception:
+            logger.exception('history_query_failed', session_id=session_id)
             raise
-=======
-        resp = self.client.table('chat_messages').select('*').eq('session_id', session_id).order('timestamp').execute()
-        return [ChatMessage(**msg) for msg in (resp.data or [])]
->>>>>>> c1f9070ccb7a29111fee9de0911e64545c5cae06
 
-    def end_session(self, session_id: str) -> bool:
+    @staticmethod
+    def _merge_pending(rows: List[dict], pending: List[dict]) -> List[dict]:
+        """
+        Overlay unflushed write-behind rows on rows read from the database.
+
+        A row may be written while the read is in flight, so rows already
+        returned by the database are skipped.
+
+        Args:
+            rows (List[dict]): Rows returned by the database
+            pending (List[dict]): Rows still waiting to be written
+
+        Returns:
+            List[dict]: Combined rows ordered by timestamp
+        """
+        if not pending:
+            return rows
+        seen = {(r.get('sender'), r.get('message'), str(r.get('timestamp'))) for r in rows}
+        extra = [r for r in pending if (r['sender'], r['message'], r['timestamp']) not in seen]
+        return sorted(rows + extra, key=lambda r: str(r.get('timestamp')))
+
+    async def end_session(self, session_id: str) -> bool:
         """
         Mark a session as ended.
         
@@ -122,17 +453,128 @@ class DatabaseService:
         Returns:
             bool: True if session was successfully ended
         """
-        resp = self.client.table('chat_sessions').update({
-            'ended_at': datetime.now(timezone.utc).isoformat()
-        }).eq('session_id', session_id).execute()
+        ended_at = datetime.now(timezone.utc).isoformat()
+        resp = await self.executor.run(
+            lambda: self.client.table('chat_sessions').update({'ended_at': ended_at}).eq('session_id', session_id).execute()
+        )
+        self.known_sessions.discard(session_id)
         return bool(resp.data)
-<<<<<<< HEAD
-        return bool(resp.data)
-=======
->>>>>>> c1f9070ccb7a29111fee9de0911e64545c5cae06
+
+    async def find_idle_sessions(
+        self,
+        idle_before: str,
+        limit: int,
+        after: Optional[Cursor] = None
+    ) -> List[dict]:
+        """
+        Find open sessions with no activity since ``idle_before``, least recently active first.
+
+        Reads the session summary view, so a session's activity is its last
+        stored message, or its start when it has none.
+
+        Args:
+            idle_before (str): ISO timestamp; sessions last active before it are idle
+            limit (int): Maximum rows
+            after (Optional[Cursor]): Continue after this (last_activity, session_id) position
+
+        Returns:
+            List[dict]: Rows with session_id and last_activity
+        """
+        def query():
+            q = (self.client.table(SESSION_SUMMARY_VIEW).select('session_id,last_activity')
+                 .is_('ended_at', 'null').lt('last_activity', idle_before))
+            return self._forward_page(q, 'last_activity', 'session_id', after, limit).execute()
+        resp = await self.executor.run(query)
+        return resp.data or []
+
+    async def end_sessions(self, session_ids: List[str]) -> List[str]:
+        """
+        End several sessions with one update.
+
+        Sessions that were already ended are left untouched. Ended sessions
+        are evicted from the known-session cache.
+
+        Args:
+            session_ids (List[str]): Sessions to end
+
+        Returns:
+            List[str]: Sessions this call ended
+        """
+        if not session_ids:
+            return []
+        ended_at = datetime.now(timezone.utc).isoformat()
+        resp = await self.executor.run(
+            lambda: self.client.table('chat_sessions').update({'ended_at': ended_at})
+            .in_('session_id', session_ids).is_('ended_at', 'null').execute()
+        )
+        for session_id in session_ids:
+            self.known_sessions.discard(session_id)
+        return [row['session_id'] for row in resp.data or []]
+
+    async def iter_document_hashes(self, source: str, page_size: int = 1000) -> AsyncIterator[str]:
+        """
+        Iterate over the content hashes of a source's stored chunks.
+
+        Only the hash column is read, in keyset pages on the unique hash,
+        so embeddings and content never leave the database.
+
+        Args:
+            source (str): Ingestion source name
+            page_size (int): Rows per query
+
+        Yields:
+            str: Content hashes, in ascending order
+        """
+        last: Optional[str] = None
+        while True:
+            def query(last=last):
+                q = self.client.table(DOCUMENTS_TABLE).select('content_hash').eq('source', source)
+                if last is not None:
+                    q = q.gt('content_hash', last)
+                return q.order('content_hash').limit(page_size).execute()
+            rows = (await self.executor.run(query)).data or []
+            for row in rows:
+                yield row['content_hash']
+            if len(rows) < page_size:
+                return
+            last = rows[-1]['content_hash']
+
+    async def upsert_documents(self, rows: List[dict]) -> None:
+        """
+        Insert chunks into the vector store in one request.
+
+        Rows whose content hash is already stored are skipped, so a
+        repeated or concurrent run never writes a chunk twice.
+
+        Args:
+            rows (List[dict]): Rows with content, metadata, embedding, source and content_hash
+        """
+        if not rows:
+            return
+        await self.executor.run(
+            lambda: self.client.table(DOCUMENTS_TABLE)
+            .upsert(rows, on_conflict='content_hash', ignore_duplicates=True, returning=ReturnMethod.minimal)
+            .execute()
+        )
+
+    async def delete_documents(self, source: str, hashes: List[str]) -> None:
+        """
+        Delete a source's chunks by content hash in one request.
+
+        Args:
+            source (str): Ingestion source name
+            hashes (List[str]): Content hashes to delete
+        """
+        if not hashes:
+            return
+        await self.executor.run(
+            lambda: self.client.table(DOCUMENTS_TABLE).delete(returning=ReturnMethod.minimal)
+            .eq('source', source).in_('content_hash', hashes).execute()
+        )
 
 # Initialize database service with environment variables
 db_service = DatabaseService(
     url=os.getenv('SUPABASE_URL'),
     key=os.getenv('SUPABASE_KEY')
 )
+db_service.register_metrics(REGISTRY)
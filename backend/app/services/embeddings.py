@@ -0,0 +1,211 @@
+"""
+Embeddings module for chat application.
+Turns text into unit-length vectors for the FAQ index and knowledge-base ingestion.
+"""
+
+import asyncio
+import hashlib
+import os
+import re
+from typing import List, Optional, Sequence
+
+import httpx
+import numpy as np
+
+_WORD = re.compile(r"\w+")
+
+def normalize_rows(matrix: np.ndarray) -> np.ndarray:
+    """
+    Scale each row to unit length, so dot products are cosine similarities.
+
+    Args:
+        matrix (np.ndarray): Vectors, one per row
+
+    Returns:
+        np.ndarray: float32 matrix; all-zero rows are left as zeros
+    """
+    matrix = np.asarray(matrix, dtype=np.float32)
+    norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+    return matrix / np.where(norms == 0, 1, norms)
+
+class Embedder:
+    """
+    Base class for embedders.
+
+    ``embed`` returns one unit-length float32 row per text. Embedders
+    differ in cost and quality but must be used consistently: vectors from
+    different embedders are not comparable.
+    """
+
+    # Identifies the embedder and model, so stored vectors can be matched to it
+    name = 'embedder'
+    dimension = 0
+    # True when embedding is CPU work done in-process rather than awaited I/O
+    blocking = False
+
+    async def embed(self, texts: Sequence[str]) -> np.ndarray:
+        """
+        Embed a batch of texts.
+
+        Args:
+            texts (Sequence[str]): Texts to embed
+
+        Returns:
+            np.ndarray: ``len(texts) x dimension`` float32 matrix of unit vectors
+        """
+        raise NotImplementedError
+
+    async def embed_off_loop(self, texts: Sequence[str]) -> np.ndarray:
+        """
+        Embed a batch without holding the event loop for CPU-bound embedders.
+
+        Args:
+            texts (Sequence[str]): Texts to embed
+
+        Returns:
+            np.ndarray: Same as ``embed``
+        """
+        if self.blocking:
+            return await asyncio.get_running_loop().run_in_executor(None, self.embed_sync, texts)
+        return await self.embed(texts)
+
+    def embed_sync(self, texts: Sequence[str]) -> np.ndarray:
+        """Embed a batch synchronously; only blocking embedders implement this."""
+        raise NotImplementedError
+
+    async def close(self) -> None:
+        """Release resources."""
+
+class HashingEmbedder(Embedder):
+    """
+    Deterministic local embedder.
+
+    Words, word pairs and character trigrams are hashed into
+    ``dimension`` signed buckets. It has no notion of synonyms, but
+    reworded questions that share most of their words score high, it needs
+    no network or model files, and the same text always gets the same
+    vector on every machine, which makes it suitable for tests and for
+    matching repetitive questions in microseconds.
+    """
+
+    blocking = True
+
+    def __init__(self, dimension: int = 512):
+        """
+        Initialize the embedder.
+
+        Args:
+            dimension (int): Number of hash buckets
+        """
+        self.dimension = dimension
+        self.name = f"hashing-{dimension}"
+
+    @staticmethod
+    def features(text: str) -> List[str]:
+        """Words, adjacent word pairs and padded character trigrams of a text."""
+        words = _WORD.findall(text.lower())
+        features = words + [f"{a} {b}" for a, b in zip(words, words[1:])]
+        for word in words:
+            padded = f"#{word}#"
+            features.extend(padded[i:i + 3] for i in range(len(padded) - 2))
+        return features
+
+    def embed_sync(self, texts: Sequence[str]) -> np.ndarray:
+        matrix = np.zeros((len(texts), self.dimension), dtype=np.float32)
+        for row, text in enumerate(texts):
+            digests = [int.from_bytes(hashlib.blake2b(f.encode(), digest_size=8).digest(), 'little')
+                       for f in self.features(text)]
+            if not digests:
+                continue
+            hashes = np.array(digests, dtype=np.uint64)
+            signs = np.where(hashes >> np.uint64(63), -1.0, 1.0).astype(np.float32)
+            np.add.at(matrix[row], (hashes % np.uint64(self.dimension)).astype(np.intp), signs)
+        return normalize_rows(matrix)
+
+    async def embed(self, texts: Sequence[str]) -> np.ndarray:
+        return self.embed_sync(texts)
+
+class OpenAIEmbedder(Embedder):
+    """
+    Embedder backed by the OpenAI embeddings API.
+
+    Texts are sent ``batch_size`` at a time. Use the same model as the n8n
+    "Embeddings OpenAI" nodes so vectors stay comparable with those
+    already in the ``documents`` table.
+    """
+
+    def __init__(self, api_key: str, model: str = 'text-embedding-3-small', dimension: int = 1536,
+                 base_url: str = 'https://api.openai.com/v1', batch_size: int = 100, timeout: float = 30.0):
+        """
+        Initialize the embedder.
+
+        Args:
+            api_key (str): OpenAI API key
+            model (str): Embedding model
+            dimension (int): Vector size the model returns
+            base_url (str): API base URL, for compatible gateways
+            batch_size (int): Texts per API request
+            timeout (float): Seconds allowed per request
+        """
+        self.api_key = api_key
+        self.model = model
+        self.name = model
+        self.dimension = dimension
+        self.base_url = base_url.rstrip('/')
+        self.batch_size = batch_size
+        self.timeout = timeout
+        self._client: Optional[httpx.AsyncClient] = None
+        self.requests = 0
+
+    @property
+    def client(self) -> httpx.AsyncClient:
+        if self._client is None:
+            self._client = httpx.AsyncClient(
+                base_url=self.base_url,
+                headers={'Authorization': f"Bearer {self.api_key}"},
+                timeout=self.timeout
+            )
+        return self._client
+
+    async def embed(self, texts: Sequence[str]) -> np.ndarray:
+        rows: List[List[float]] = []
+        for start in range(0, len(texts), self.batch_size):
+            batch = list(texts[start:start + self.batch_size])
+            response = await self.client.post('/embeddings', json={'model': self.model, 'input': batch})
+            response.raise_for_status()
+            self.requests += 1
+            data = sorted(response.json()['data'], key=lambda item: item['index'])
+            rows.extend(item['embedding'] for item in data)
+        if not rows:
+            return np.zeros((0, self.dimension), dtype=np.float32)
+        return normalize_rows(np.array(rows, dtype=np.float32))
+
+    async def close(self) -> None:
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
+
+def create_embedder(backend: Optional[str] = None) -> Embedder:
+    """
+    Create an embedder from the environment.
+
+    Args:
+        backend (Optional[str]): 'openai' or 'hashing'; defaults to EMBEDDING_BACKEND,
+            or 'openai' when OPENAI_API_KEY is set and 'hashing' otherwise
+
+    Returns:
+        Embedder: The configured embedder
+    """
+    api_key = os.getenv('OPENAI_API_KEY')
+    backend = (backend or os.getenv('EMBEDDING_BACKEND') or ('openai' if api_key else 'hashing')).lower()
+    if backend == 'openai':
+        if not api_key:
+            raise RuntimeError("The openai embedder requires OPENAI_API_KEY")
+        return OpenAIEmbedder(
+            api_key,
+            model=os.getenv('EMBEDDING_MODEL', 'text-embedding-3-small'),
+            dimension=int(os.getenv('EMBEDDING_DIMENSION', '1536')),
+            base_url=os.getenv('OPENAI_BASE_URL', 'https://api.openai.com/v1'),
+            batch_size=int(os.getenv('EMBEDDING_BATCH_SIZE', '100'))
+        )
+    return HashingEmbedder(int(os.getenv('HASHING_EMBEDDING_DIMENSION', '512')))
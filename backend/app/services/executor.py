@@ -0,0 +1,129 @@
+"""
+Executor module for chat application.
+Runs blocking client calls on a bounded thread pool so they never block the event loop.
+"""
+
+import asyncio
+import time
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+from typing import Any, Callable, Dict, Optional
+
+class BoundedExecutor:
+    """
+    Bounded thread-pool executor for blocking I/O.
+
+    Calls are admitted through an asyncio semaphore so that at most
+    ``max_concurrency`` blocking calls run at once; the remaining callers
+    wait on the event loop instead of piling up in the pool's queue.
+    Basic counters and timings are kept for monitoring.
+    """
+
+    def __init__(self, max_workers: int = 10, max_concurrency: Optional[int] = None, name: str = 'executor'):
+        """
+        Initialize the executor.
+
+        Args:
+            max_workers (int): Number of worker threads
+            max_concurrency (Optional[int]): Maximum concurrent calls, defaults to max_workers
+            name (str): Thread name prefix, also used in stats
+        """
+        self.name = name
+        self.max_workers = max_workers
+        self.max_concurrency = max_concurrency or max_workers
+        self._pool: Optional[ThreadPoolExecutor] = None
+        self._semaphore: Optional[asyncio.Semaphore] = None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self.submitted = 0
+        self.completed = 0
+        self.failed = 0
+        self.in_flight = 0
+        self.waiting = 0
+        self.peak_in_flight = 0
+        self.total_wait_seconds = 0.0
+        self.total_run_seconds = 0.0
+
+    @property
+    def pool(self) -> ThreadPoolExecutor:
+        """Underlying thread pool, created on first use."""
+        if self._pool is None:
+            self._pool = ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix=self.name)
+        return self._pool
+
+    async def run(self, fn: Callable[..., Any], *args: Any, **kwargs: Any) -> Any:
+        """
+        Run a blocking callable on the pool and await its result.
+
+        Args:
+            fn (Callable): Blocking function to run
+            *args: Positional arguments for fn
+            **kwargs: Keyword arguments for fn
+
+        Returns:
+            Any: The value returned by fn
+
+        Raises:
+            Exception: Whatever fn raises
+        """
+        loop = asyncio.get_running_loop()
+        if self._semaphore is None or self._loop is not loop:
+            self._semaphore = asyncio.Semaphore(self.max_concurrency)
+            self._loop = loop
+        self.submitted += 1
+        self.waiting += 1
+        queued_at = time.perf_counter()
+        try:
+            await self._semaphore.acquire()
+        finally:
+            # Also reached when a queued caller is cancelled
+            self.waiting -= 1
+        try:
+            started_at = time.perf_counter()
+            self.total_wait_seconds += started_at - queued_at
+            self.in_flight += 1
+            self.peak_in_flight = max(self.peak_in_flight, self.in_flight)
+            try:
+                result = await loop.run_in_executor(self.pool, partial(fn, *args, **kwargs))
+                self.completed += 1
+                return result
+            except Exception:
+                self.failed += 1
+                raise
+            finally:
+                self.in_flight -= 1
+                self.total_run_seconds += time.perf_counter() - started_at
+        finally:
+            self._semaphore.release()
+
+    def stats(self) -> Dict[str, Any]:
+        """
+        Snapshot of executor counters.
+
+        Returns:
+            Dict[str, Any]: Counters and average timings
+        """
+        finished = self.completed + self.failed
+        return {
+            'name': self.name,
+            'max_workers': self.max_workers,
+            'max_concurrency': self.max_concurrency,
+            'submitted': self.submitted,
+            'completed': self.completed,
+            'failed': self.failed,
+            'in_flight': self.in_flight,
+            'waiting': self.waiting,
+            'peak_in_flight': self.peak_in_flight,
+            'avg_wait_ms': (self.total_wait_seconds / finished * 1000) if finished else 0.0,
+            'avg_run_ms': (self.total_run_seconds / finished * 1000) if finished else 0.0,
+        }
+
+    def shutdown(self, wait: bool = True) -> None:
+        """
+        Shut down the thread pool.
+
+        Args:
+            wait (bool): Whether to wait for running calls to finish
+        """
+        if self._pool is not None:
+            self._pool.shutdown(wait=wait)
+            self._pool = None
@@ -0,0 +1,166 @@
+"""
+Export module for chat application.
+Streams sessions and transcripts as NDJSON, optionally gzipped, in constant memory.
+
+Command line use, from the backend directory::
+
+    python -m app.services.export --user-id user_1 --from 2024-01-01 --state ended --gzip -o export.ndjson.gz
+"""
+
+import argparse
+import asyncio
+import sys
+import zlib
+from datetime import datetime
+from typing import Any, AsyncIterator, Dict, List, Optional
+
+from .database import DatabaseService
+from .serialization import dumps
+
+EXPORT_STATES = ('ended', 'active')
+
+def parse_timestamp(value: Optional[str]) -> Optional[str]:
+    """
+    Validate an ISO date or timestamp filter.
+
+    Args:
+        value (Optional[str]): ISO 8601 date or timestamp, ``Z`` suffix allowed
+
+    Returns:
+        Optional[str]: Normalized ISO timestamp, or None when not given
+
+    Raises:
+        ValueError: If the value is not ISO 8601
+    """
+    if not value:
+        return None
+    return datetime.fromisoformat(value.replace('Z', '+00:00')).isoformat()
+
+async def export_records(
+    db: DatabaseService,
+    user_id: Optional[str] = None,
+    started_from: Optional[str] = None,
+    started_to: Optional[str] = None,
+    state: Optional[str] = None,
+    include_messages: bool = True,
+    page_size: int = 500
+) -> AsyncIterator[Dict[str, Any]]:
+    """
+    Yield export records: each session followed by its messages.
+
+    Records are flat, ``{"type": "session", ...}`` and
+    ``{"type": "message", ...}``, so a transcript never has to be held
+    whole; memory is bounded by one page of sessions plus one page of
+    messages.
+
+    Args:
+        db (DatabaseService): Storage to read from
+        user_id (Optional[str]): Only this user's sessions
+        started_from (Optional[str]): Only sessions started at or after this timestamp
+        started_to (Optional[str]): Only sessions started before this timestamp
+        state (Optional[str]): ``ended`` or ``active``
+        include_messages (bool): Whether to follow each session with its messages
+        page_size (int): Rows per database query
+
+    Yields:
+        Dict[str, Any]: Export records
+    """
+    async for session in db.iter_sessions(user_id, started_from, started_to, state, page_size):
+        yield {'type': 'session', **session}
+        if include_messages:
+            async for message in db.iter_session_messages(session['session_id'], page_size):
+                yield {'type': 'message', **message}
+
+async def ndjson_chunks(records: AsyncIterator[Dict[str, Any]], chunk_bytes: int = 64 * 1024) -> AsyncIterator[bytes]:
+    """
+    Encode records as newline-delimited JSON, batched into chunks of about ``chunk_bytes``.
+
+    Args:
+        records (AsyncIterator[Dict[str, Any]]): Records to encode
+        chunk_bytes (int): Bytes collected before a chunk is yielded
+
+    Yields:
+        bytes: NDJSON text
+    """
+    lines: List[bytes] = []
+    size = 0
+    async for record in records:
+        line = dumps(record) + b'\n'
+        lines.append(line)
+        size += len(line)
+        if size >= chunk_bytes:
+            yield b''.join(lines)
+            lines, size = [], 0
+    if lines:
+        yield b''.join(lines)
+
+async def gzip_chunks(chunks: AsyncIterator[bytes], level: int = 6) -> AsyncIterator[bytes]:
+    """
+    Gzip a byte stream incrementally.
+
+    Args:
+        chunks (AsyncIterator[bytes]): Uncompressed data
+        level (int): zlib compression level
+
+    Yields:
+        bytes: Gzip member data
+    """
+    compressor = zlib.compressobj(level, zlib.DEFLATED, 31)
+    async for chunk in chunks:
+        data = compressor.compress(chunk)
+        if data:
+            yield data
+    yield compressor.flush()
+
+async def write_export(output, chunks: AsyncIterator[bytes]) -> int:
+    """
+    Write an export stream to a binary file object.
+
+    Returns:
+        int: Bytes written
+    """
+    written = 0
+    async for chunk in chunks:
+        output.write(chunk)
+        written += len(chunk)
+    output.flush()
+    return written
+
+def main(argv: Optional[List[str]] = None) -> None:
+    parser = argparse.ArgumentParser(prog='python -m app.services.export', description="Export chat sessions and transcripts as NDJSON.")
+    parser.add_argument('--user-id', help="Only this user's sessions")
+    parser.add_argument('--from', dest='started_from', help="Sessions started at or after this ISO date/time")
+    parser.add_argument('--to', dest='started_to', help="Sessions started before this ISO date/time")
+    parser.add_argument('--state', choices=EXPORT_STATES, help="Only ended or only active sessions")
+    parser.add_argument('--no-messages', action='store_true', help="Export session rows only")
+    parser.add_argument('--page-size', type=int, default=500, help="Rows per database query")
+    parser.add_argument('--gzip', action='store_true', help="Gzip the output")
+    parser.add_argument('-o', '--output', help="Output file (default: stdout)")
+    args = parser.parse_args(argv)
+    try:
+        started_from, started_to = parse_timestamp(args.started_from), parse_timestamp(args.started_to)
+    except ValueError as e:
+        parser.error(str(e))
+
+    from .database import db_service
+
+    async def run() -> int:
+        records = export_records(db_service, args.user_id, started_from, started_to, args.state,
+                                 not args.no_messages, args.page_size)
+        chunks = ndjson_chunks(records)
+        if args.gzip:
+            chunks = gzip_chunks(chunks)
+        try:
+            if args.output:
+                with open(args.output, 'wb') as f:
+                    return await write_export(f, chunks)
+            return await write_export(sys.stdout.buffer, chunks)
+        finally:
+            await db_service.shutdown()
+
+    written = asyncio.run(run())
+    if args.output:
+        print(f"wrote {written} bytes to {args.output}", file=sys.stderr)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,308 @@
+"""
+FAQ module for chat application.
+Answers questions that have a canonical answer from an in-process vector index, ahead of n8n.
+"""
+
+import asyncio
+import csv
+import json
+import os
+import time
+from typing import Any, Dict, List, Optional, Sequence
+
+import numpy as np
+
+from .cache import LRUCache
+from .embeddings import Embedder, create_embedder
+from .metrics import MetricsRegistry
+from .n8n import N8NService
+from .log import get_logger
+
+logger = get_logger(__name__)
+
+class FAQIndex:
+    """
+    Immutable matrix of FAQ question embeddings.
+
+    Row ``i`` is the unit vector of ``questions[i]``, whose answer is
+    ``answers[answer_ids[i]]``; an answer may have several phrasings.
+    Cosine similarity against every question is one matrix-vector product.
+    """
+
+    __slots__ = ('questions', 'answer_ids', 'answers', 'matrix')
+
+    def __init__(self, questions: List[str], answer_ids: List[int], answers: List[str], matrix: np.ndarray):
+        self.questions = questions
+        self.answer_ids = np.asarray(answer_ids, dtype=np.int32)
+        self.answers = answers
+        self.matrix = matrix
+
+    @classmethod
+    def empty(cls) -> "FAQIndex":
+        return cls([], [], [], np.zeros((0, 0), dtype=np.float32))
+
+    def __len__(self) -> int:
+        return len(self.questions)
+
+    def search(self, vector: np.ndarray, k: int = 3) -> List[Dict[str, Any]]:
+        """
+        Find the answers whose questions are most similar to a query vector.
+
+        Args:
+            vector (np.ndarray): Unit query vector
+            k (int): Answers to return
+
+        Returns:
+            List[Dict[str, Any]]: ``question``, ``answer`` and cosine ``score``,
+            best first, at most one per answer
+        """
+        if not len(self) or k <= 0:
+            return []
+        scores = self.matrix @ vector
+        # Paraphrases share an answer, so look a little deeper than k before de-duplicating
+        depth = min(len(scores), k * 4)
+        top = np.argpartition(-scores, depth - 1)[:depth]
+        top = top[np.argsort(-scores[top], kind='stable')]
+        matches, seen = [], set()
+        for i in top:
+            answer_id = int(self.answer_ids[i])
+            if answer_id in seen:
+                continue
+            seen.add(answer_id)
+            matches.append({'question': self.questions[i], 'answer': self.answers[answer_id], 'score': float(scores[i])})
+            if len(matches) == k:
+                break
+        return matches
+
+def load_faq_entries(path: str) -> List[Dict[str, Any]]:
+    """
+    Read FAQ entries from a JSON or CSV file.
+
+    JSON files hold a list of ``{"question": ..., "answer": ...}`` objects,
+    where ``questions`` may list several phrasings instead; CSV files need
+    ``question`` and ``answer`` columns.
+
+    Args:
+        path (str): File path
+
+    Returns:
+        List[Dict[str, Any]]: Entries with a ``questions`` list and an ``answer``
+
+    Raises:
+        ValueError: If an entry has no question or no answer
+    """
+    with open(path, newline='', encoding='utf-8') as f:
+        if path.lower().endswith('.csv'):
+            rows = list(csv.DictReader(f))
+        else:
+            rows = json.load(f)
+    entries = []
+    for n, row in enumerate(rows, 1):
+        questions = row.get('questions') or [row.get('question')]
+        questions = [q.strip() for q in questions if q and q.strip()]
+        answer = (row.get('answer') or '').strip()
+        if not questions or not answer:
+            raise ValueError(f"FAQ entry {n} in {path} needs a question and an answer")
+        entries.append({'questions': questions, 'answer': answer})
+    return entries
+
+class FAQService:
+    """
+    Answers FAQ questions without calling n8n.
+
+    A question is embedded, compared with every FAQ question at once, and
+    answered directly when the best match scores at least ``threshold``.
+    Questions and queries are embedded in normalized form, and query
+    vectors are cached under that same form, so repeated questions cost a
+    cache lookup and one small matrix product.
+
+    ``reload`` builds a complete new index before swapping it in with a
+    single assignment; searches hold on to the index they started with,
+    so reloading never interrupts or blocks traffic, and a reload that
+    fails leaves the current index serving.
+    """
+
+    def __init__(self, embedder: Embedder, path: Optional[str] = None, threshold: float = 0.85,
+                 top_k: int = 3, query_cache_size: int = 10000):
+        """
+        Initialize the service with an empty index.
+
+        Args:
+            embedder (Embedder): Embedder for questions and queries
+            path (Optional[str]): FAQ file loaded at startup and on reload
+            threshold (float): Lowest cosine score answered from the FAQ
+            top_k (int): Matches returned by ``search``
+            query_cache_size (int): Query vectors kept
+        """
+        self.embedder = embedder
+        self.path = path
+        self.threshold = threshold
+        self.top_k = top_k
+        self.index = FAQIndex.empty()
+        self.query_cache = LRUCache(maxsize=query_cache_size)
+        self.version = 0
+        self.loaded_at: Optional[float] = None
+        self.hits = 0
+        self.misses = 0
+        self.reload_failures = 0
+        self._reload_lock = asyncio.Lock()
+
+    async def startup(self) -> None:
+        """Load the FAQ file, if configured; failures are logged and leave the FAQ empty."""
+        if not self.path:
+            return
+        try:
+            await self.reload()
+        except Exception:
+            logger.exception('faq_load_failed', path=self.path)
+
+    async def shutdown(self) -> None:
+        await self.embedder.close()
+
+    async def build(self, entries: Sequence[Dict[str, Any]]) -> FAQIndex:
+        """
+        Embed FAQ entries into a new index.
+
+        Args:
+            entries (Sequence[Dict[str, Any]]): Entries with ``questions`` and ``answer``
+
+        Returns:
+            FAQIndex: Index over every phrasing
+        """
+        questions, answer_ids, answers = [], [], []
+        for entry in entries:
+            answers.append(entry['answer'])
+            for question in entry['questions']:
+                questions.append(question)
+                answer_ids.append(len(answers) - 1)
+        if not questions:
+            return FAQIndex.empty()
+        # A whole FAQ can take a while to embed locally; keep serving meanwhile
+        matrix = await self.embedder.embed_off_loop([N8NService.normalize_question(q) for q in questions])
+        return FAQIndex(questions, answer_ids, answers, np.ascontiguousarray(matrix, dtype=np.float32))
+
+    async def load(self, entries: Sequence[Dict[str, Any]]) -> int:
+        """
+        Replace the index with one built from ``entries``.
+
+        Args:
+            entries (Sequence[Dict[str, Any]]): Entries with ``questions`` and ``answer``
+
+        Returns:
+            int: Questions indexed
+        """
+        async with self._reload_lock:
+            index = await self.build(entries)
+            self.index = index
+            self.version += 1
+            self.loaded_at = time.time()
+        logger.info('faq_loaded', questions=len(index), answers=len(index.answers), version=self.version)
+        return len(index)
+
+    async def reload(self, path: Optional[str] = None) -> int:
+        """
+        Reload the index from a FAQ file.
+
+        Args:
+            path (Optional[str]): File to read, the configured path by default
+
+        Returns:
+            int: Questions indexed
+
+        Raises:
+            ValueError: If no path is configured or the file is invalid
+            OSError: If the file cannot be read
+        """
+        path = path or self.path
+        if not path:
+            raise ValueError("No FAQ file configured (FAQ_PATH)")
+        try:
+            entries = await asyncio.get_running_loop().run_in_executor(None, load_faq_entries, path)
+            return await self.load(entries)
+        except Exception:
+            self.reload_failures += 1
+            raise
+
+    async def _query_vector(self, message: str) -> np.ndarray:
+        key = N8NService.normalize_question(message)
+        vector = self.query_cache.get(key)
+        if vector is None:
+            # Embed the key itself, so every message sharing it maps to the same vector
+            vector = (await self.embedder.embed([key]))[0]
+            self.query_cache.set(key, vector, size=vector.nbytes)
+        return vector
+
+    async def search(self, message: str, k: Optional[int] = None) -> List[Dict[str, Any]]:
+        """
+        Find the FAQ answers closest to a message.
+
+        Args:
+            message (str): User message
+            k (Optional[int]): Matches to return, ``top_k`` by default
+
+        Returns:
+            List[Dict[str, Any]]: Matches, best first
+        """
+        index = self.index
+        if not len(index):
+            return []
+        return index.search(await self._query_vector(message), k or self.top_k)
+
+    async def answer(self, message: str) -> Optional[Dict[str, Any]]:
+        """
+        Answer a message from the FAQ when a match is confident enough.
+
+        Errors are logged and treated as a miss, so the turn falls back to n8n.
+
+        Args:
+            message (str): User message
+
+        Returns:
+            Optional[Dict[str, Any]]: Response shaped like n8n's, or None
+        """
+        if not len(self.index):
+            return None
+        try:
+            matches = await self.search(message, 1)
+        except Exception as e:
+            logger.warning('faq_search_failed', error=repr(e))
+            return None
+        if matches and matches[0]['score'] >= self.threshold:
+            self.hits += 1
+            return {'response': matches[0]['answer'], 'source': 'faq', 'score': round(matches[0]['score'], 4)}
+        self.misses += 1
+        return None
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            'questions': len(self.index),
+            'answers': len(self.index.answers),
+            'embedder': self.embedder.name,
+            'threshold': self.threshold,
+            'version': self.version,
+            'loaded_at': self.loaded_at,
+            'hits': self.hits,
+            'misses': self.misses,
+            'reload_failures': self.reload_failures,
+        }
+
+    def register_metrics(self, registry: MetricsRegistry) -> None:
+        """
+        Expose FAQ size and hit rate as metrics.
+
+        Args:
+            registry (MetricsRegistry): Registry to add the metrics to
+        """
+        registry.callback('gauge', 'faq_questions', 'Questions in the FAQ index', lambda: len(self.index))
+        registry.callback('counter', 'faq_hits_total', 'Messages answered from the FAQ', lambda: self.hits)
+        registry.callback('counter', 'faq_misses_total', 'Messages the FAQ could not answer confidently',
+                          lambda: self.misses)
+        registry.callback('counter', 'faq_reload_failures_total', 'FAQ reloads that failed', lambda: self.reload_failures)
+
+# Process-wide FAQ service; empty unless FAQ_PATH is set
+faq_service = FAQService(
+    create_embedder(os.getenv('FAQ_EMBEDDER', 'hashing')),
+    path=os.getenv('FAQ_PATH') or None,
+    threshold=float(os.getenv('FAQ_THRESHOLD', '0.85')),
+    top_k=int(os.getenv('FAQ_TOP_K', '3'))
+)
@@ -0,0 +1,295 @@
+"""
+Ingestion module for chat application.
+Streams CSV and text files into the ``documents`` vector store, embedding only what changed.
+
+Command line use, from the backend directory::
+
+    python -m app.services.ingest products.csv --embedder openai --source klevu
+    python -m app.services.ingest policies.txt --embedder hashing --dry-run
+"""
+
+import argparse
+import asyncio
+import csv
+import hashlib
+import json
+import os
+import sys
+from collections import deque
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Sequence, Set
+
+from .database import DatabaseService
+from .embeddings import Embedder
+from .log import get_logger
+
+logger = get_logger(__name__)
+
+# Product descriptions can be long; the csv module's default field limit is 128 KiB
+csv.field_size_limit(min(sys.maxsize, 2 ** 31 - 1))
+
+SEPARATORS = ('\n\n', '\n', ' ', '')
+
+def _merge(pieces: Sequence[str], separator: str, chunk_size: int, chunk_overlap: int) -> List[str]:
+    """Join pieces into chunks of at most ``chunk_size``, repeating up to ``chunk_overlap`` characters."""
+    chunks: List[str] = []
+    window: deque = deque()
+    length = 0
+    for piece in pieces:
+        added = len(piece) + (len(separator) if window else 0)
+        if window and length + added > chunk_size:
+            chunks.append(separator.join(window))
+            while window and (length > chunk_overlap or length + added > chunk_size):
+                length -= len(window.popleft()) + (len(separator) if window else 0)
+            added = len(piece) + (len(separator) if window else 0)
+        window.append(piece)
+        length += added
+    if window:
+        chunks.append(separator.join(window))
+    return [chunk.strip() for chunk in chunks if chunk.strip()]
+
+def split_text(text: str, chunk_size: int = 1000, chunk_overlap: int = 200,
+               separators: Sequence[str] = SEPARATORS) -> List[str]:
+    """
+    Split text recursively on paragraphs, lines, words, then characters.
+
+    Behaves like the Recursive Character Text Splitter used by the n8n
+    ingestion workflow, with the same defaults.
+
+    Args:
+        text (str): Text to split
+        chunk_size (int): Longest chunk, in characters
+        chunk_overlap (int): Characters repeated between neighbouring chunks
+        separators (Sequence[str]): Separators to try, coarsest first
+
+    Returns:
+        List[str]: Chunks
+    """
+    if len(text) <= chunk_size:
+        return [text.strip()] if text.strip() else []
+    separator, rest = separators[-1], ()
+    for i, candidate in enumerate(separators):
+        if candidate == '' or candidate in text:
+            separator, rest = candidate, separators[i + 1:]
+            break
+    pieces = text.split(separator) if separator else list(text)
+    chunks: List[str] = []
+    short: List[str] = []
+    for piece in pieces:
+        if len(piece) <= chunk_size:
+            short.append(piece)
+            continue
+        if short:
+            chunks.extend(_merge(short, separator, chunk_size, chunk_overlap))
+            short = []
+        chunks.extend(split_text(piece, chunk_size, chunk_overlap, rest) if rest else [piece])
+    if short:
+        chunks.extend(_merge(short, separator, chunk_size, chunk_overlap))
+    return chunks
+
+def csv_records(path: str, id_column: Optional[str] = None, encoding: str = 'utf-8') -> Iterator[Dict[str, Any]]:
+    """
+    Read a CSV file one row at a time.
+
+    Each row becomes ``column: value`` lines, the format the n8n data
+    loader produced, so chunks stay comparable with older ones.
+
+    Args:
+        path (str): CSV file with a header row
+        id_column (Optional[str]): Column copied into the chunk metadata as ``id``
+        encoding (str): File encoding
+
+    Yields:
+        Dict[str, Any]: Records with ``text`` and ``metadata``
+    """
+    with open(path, newline='', encoding=encoding) as f:
+        for row in csv.DictReader(f):
+            text = '\n'.join(f"{k.strip()}: {(v or '').strip()}" for k, v in row.items() if k)
+            if not any((v or '').strip() for k, v in row.items() if k):
+                continue
+            metadata = {'id': row.get(id_column)} if id_column else {}
+            yield {'text': text, 'metadata': metadata}
+
+def text_records(path: str, encoding: str = 'utf-8') -> Iterator[Dict[str, Any]]:
+    """
+    Read a text file one paragraph at a time.
+
+    Paragraphs are chunked separately, so editing one only changes that
+    paragraph's chunks instead of shifting every chunk after it.
+
+    Args:
+        path (str): Text file
+        encoding (str): File encoding
+
+    Yields:
+        Dict[str, Any]: Records with ``text`` and ``metadata``
+    """
+    with open(path, encoding=encoding) as f:
+        lines: List[str] = []
+        for line in f:
+            if line.strip():
+                lines.append(line)
+            elif lines:
+                yield {'text': ''.join(lines), 'metadata': {}}
+                lines = []
+        if lines:
+            yield {'text': ''.join(lines), 'metadata': {}}
+
+class IngestPipeline:
+    """
+    Incremental ingestion into the vector store.
+
+    Chunks are content-addressed: each is identified by a hash of the
+    embedder, source and text. A run reads the hashes already stored for
+    the source, streams the input, and only embeds and inserts chunks
+    whose hash is new, ``batch_size`` per embedding call and insert;
+    hashes that no longer occur in the input are deleted afterwards.
+    Unchanged content costs one hash and a set lookup, and memory is
+    bounded by the set of hashes plus one batch. Changing the embedding
+    model changes every hash, so everything is re-embedded once.
+    """
+
+    def __init__(self, db: DatabaseService, embedder: Embedder, chunk_size: int = 1000,
+                 chunk_overlap: int = 200, batch_size: int = 100, delete_batch_size: int = 100):
+        """
+        Initialize the pipeline.
+
+        Args:
+            db (DatabaseService): Storage holding the vector store
+            embedder (Embedder): Embedder matching the one used for retrieval
+            chunk_size (int): Longest chunk, in characters
+            chunk_overlap (int): Characters repeated between neighbouring chunks
+            batch_size (int): Chunks per embedding call and insert
+            delete_batch_size (int): Hashes per delete request
+        """
+        self.db = db
+        self.embedder = embedder
+        self.chunk_size = chunk_size
+        self.chunk_overlap = chunk_overlap
+        self.batch_size = batch_size
+        self.delete_batch_size = delete_batch_size
+
+    def content_hash(self, source: str, text: str) -> str:
+        return hashlib.sha256(f"{self.embedder.name}\0{source}\0{text}".encode('utf-8')).hexdigest()
+
+    async def ingest(self, source: str, records: Iterable[Dict[str, Any]], delete: bool = True,
+                     dry_run: bool = False) -> Dict[str, int]:
+        """
+        Bring the stored chunks of ``source`` in line with ``records``.
+
+        Args:
+            source (str): Source name, e.g. the file name
+            records (Iterable[Dict[str, Any]]): Records with ``text`` and ``metadata``
+            delete (bool): Whether to delete chunks no longer in the input
+            dry_run (bool): Count the changes without embedding or writing
+
+        Returns:
+            Dict[str, int]: Records read, chunks seen, unchanged, embedded and deleted
+        """
+        stored: Set[str] = {h async for h in self.db.iter_document_hashes(source)}
+        seen: Set[str] = set()
+        stats = {'records': 0, 'chunks': 0, 'unchanged': 0, 'duplicates': 0, 'embedded': 0, 'deleted': 0}
+        batch: List[Dict[str, Any]] = []
+        writing: Optional[asyncio.Task] = None
+
+        async def flush():
+            nonlocal batch, writing
+            rows, batch = batch, []
+            vectors = await self.embedder.embed([row['content'] for row in rows])
+            for row, vector in zip(rows, vectors):
+                row['embedding'] = vector.tolist()
+            # Insert this batch while the next one is being read and embedded
+            if writing is not None:
+                await writing
+            writing = asyncio.get_running_loop().create_task(self.db.upsert_documents(rows))
+            stats['embedded'] += len(rows)
+
+        try:
+            for record in records:
+                stats['records'] += 1
+                for text in split_text(record['text'], self.chunk_size, self.chunk_overlap):
+                    stats['chunks'] += 1
+                    digest = self.content_hash(source, text)
+                    if digest in seen:
+                        stats['duplicates'] += 1
+                        continue
+                    seen.add(digest)
+                    if digest in stored:
+                        stats['unchanged'] += 1
+                        continue
+                    if dry_run:
+                        stats['embedded'] += 1
+                        continue
+                    batch.append({
+                        'content': text,
+                        'metadata': {**record['metadata'], 'source': source, 'content_hash': digest},
+                        'source': source,
+                        'content_hash': digest,
+                    })
+                    if len(batch) >= self.batch_size:
+                        await flush()
+            if batch:
+                await flush()
+        finally:
+            if writing is not None:
+                await writing
+
+        stale = sorted(stored - seen)
+        if delete and not dry_run:
+            for start in range(0, len(stale), self.delete_batch_size):
+                await self.db.delete_documents(source, stale[start:start + self.delete_batch_size])
+        stats['deleted'] = len(stale) if delete else 0
+        logger.info('ingest_finished', source=source, dry_run=dry_run, **stats)
+        return stats
+
+def main(argv: Optional[List[str]] = None) -> None:
+    parser = argparse.ArgumentParser(prog='python -m app.services.ingest',
+                                     description="Ingest a CSV or text file into the documents vector store.")
+    parser.add_argument('path', help="CSV file with a header row, or a text file")
+    parser.add_argument('--source', help="Source name the chunks are stored under (default: file name)")
+    parser.add_argument('--format', choices=('csv', 'text'), help="Input format (default: from the file extension)")
+    parser.add_argument('--id-column', help="CSV column copied into chunk metadata as id")
+    parser.add_argument('--encoding', default='utf-8', help="File encoding")
+    parser.add_argument('--chunk-size', type=int, default=int(os.getenv('INGEST_CHUNK_SIZE', '1000')))
+    parser.add_argument('--chunk-overlap', type=int, default=int(os.getenv('INGEST_CHUNK_OVERLAP', '200')))
+    parser.add_argument('--batch-size', type=int, default=int(os.getenv('INGEST_BATCH_SIZE', '100')),
+                        help="Chunks per embedding call and insert")
+    parser.add_argument('--no-delete', action='store_true', help="Keep chunks that are no longer in the file")
+    parser.add_argument('--dry-run', action='store_true', help="Report what would change without embedding or writing")
+    parser.add_argument('--embedder', choices=('openai', 'hashing'), default=os.getenv('EMBEDDING_BACKEND'),
+                        help="Embedding backend (default: EMBEDDING_BACKEND); hashing is only allowed with --dry-run")
+    parser.add_argument('--vector-dimension', type=int, default=int(os.getenv('INGEST_VECTOR_DIMENSION', '1536')),
+                        help="Dimension of the documents embedding column")
+    args = parser.parse_args(argv)
+
+    if args.embedder is None:
+        parser.error("choose an embedder with --embedder or EMBEDDING_BACKEND")
+    # The hashing embedder is not the model the n8n agent retrieves with
+    if args.embedder == 'hashing' and not args.dry_run:
+        parser.error("the hashing embedder cannot write to the documents store; use --dry-run")
+
+    source = args.source or os.path.basename(args.path)
+    is_csv = args.format == 'csv' or (args.format is None and args.path.lower().endswith('.csv'))
+    records = (csv_records(args.path, args.id_column, args.encoding) if is_csv
+               else text_records(args.path, args.encoding))
+
+    from .embeddings import create_embedder
+
+    embedder = create_embedder(args.embedder)
+    if not args.dry_run and embedder.dimension != args.vector_dimension:
+        parser.error(f"the {embedder.name} embedder makes {embedder.dimension}-dim vectors "
+                     f"but the documents column holds {args.vector_dimension}")
+
+    from .database import db_service
+
+    async def run() -> Dict[str, int]:
+        pipeline = IngestPipeline(db_service, embedder, args.chunk_size, args.chunk_overlap, args.batch_size)
+        try:
+            return await pipeline.ingest(source, records, delete=not args.no_delete, dry_run=args.dry_run)
+        finally:
+            await embedder.close()
+            await db_service.shutdown()
+
+    print(json.dumps({'source': source, **asyncio.run(run())}))
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,479 @@
+"""
+Jobs module for chat application.
+Runs chat turns in the background for clients that do not want to hold a request open.
+"""
+
+import asyncio
+import json
+import os
+import time
+import uuid
+from collections import OrderedDict
+from datetime import datetime, timezone
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Tuple
+
+from .admission import AdmissionRejected
+from .chat import run_chat_turn, ChatTurnError, TurnRejected, ERROR_MESSAGE
+from .database import db_service
+from .n8n import n8n_service
+from .metrics import MetricsRegistry
+from .log import get_logger, log_context
+
+logger = get_logger(__name__)
+
+# Job states; a job in a final state never changes again
+QUEUED, RUNNING, DONE, FAILED = 'queued', 'running', 'done', 'failed'
+FINAL_STATES = (DONE, FAILED)
+
+# Called with a job once it reaches a final state
+JobListener = Callable[[Dict[str, Any]], Awaitable[None]]
+
+def _now() -> str:
+    return datetime.now(timezone.utc).isoformat()
+
+class JobStore:
+    """
+    Base class for job stores.
+
+    Jobs are plain dicts with ``id``, ``session_id``, ``status``,
+    timestamps and, once final, ``result`` or ``error``. A job may be
+    created under a client key so a retried submission finds the job
+    already running instead of starting another one.
+    """
+
+    async def create(self, job: Dict[str, Any], key: Optional[str] = None) -> Tuple[Dict[str, Any], bool]:
+        """
+        Store a new job, unless ``key`` already names one.
+
+        Args:
+            job (Dict[str, Any]): Job to store
+            key (Optional[str]): Client idempotency key
+
+        Returns:
+            Tuple[Dict[str, Any], bool]: The stored job and whether it is new
+
+        Raises:
+            AdmissionRejected: If the key stays claimed by a job that cannot be read (409)
+        """
+        raise NotImplementedError
+
+    async def find(self, key: str) -> Optional[Dict[str, Any]]:
+        """
+        Look up the job created under a client key.
+
+        Args:
+            key (str): Client idempotency key
+
+        Returns:
+            Optional[Dict[str, Any]]: The job, or None if the key is unused or expired
+        """
+        raise NotImplementedError
+
+    async def get(self, job_id: str) -> Optional[Dict[str, Any]]:
+        """
+        Look up a job.
+
+        Args:
+            job_id (str): Job identifier
+
+        Returns:
+            Optional[Dict[str, Any]]: The job, or None if unknown or expired
+        """
+        raise NotImplementedError
+
+    async def update(self, job_id: str, **fields: Any) -> Optional[Dict[str, Any]]:
+        """
+        Change fields of a job.
+
+        Args:
+            job_id (str): Job identifier
+            **fields: Fields to set
+
+        Returns:
+            Optional[Dict[str, Any]]: The updated job, or None if unknown
+        """
+        raise NotImplementedError
+
+    async def wait(self, job_id: str, timeout: float) -> Optional[Dict[str, Any]]:
+        """
+        Wait up to ``timeout`` seconds for a job to reach a final state.
+
+        Args:
+            job_id (str): Job identifier
+            timeout (float): Longest wait in seconds
+
+        Returns:
+            Optional[Dict[str, Any]]: The job as it is when the wait ends, or None if unknown
+        """
+        raise NotImplementedError
+
+    async def close(self) -> None:
+        """Release resources."""
+
+class InMemoryJobStore(JobStore):
+    """
+    Job store for a single process.
+
+    Finished jobs are kept for ``ttl`` seconds and at most ``max_jobs``
+    jobs are held; the oldest finished ones go first. Waiters are woken
+    by an event per job, so long polls cost nothing while they wait.
+    """
+
+    def __init__(self, ttl: float = 600.0, max_jobs: int = 10000):
+        """
+        Initialize the store.
+
+        Args:
+            ttl (float): Seconds a finished job stays readable
+            max_jobs (int): Jobs held before the oldest finished ones are dropped
+        """
+        self.ttl = ttl
+        self.max_jobs = max_jobs
+        self.jobs: "OrderedDict[str, Dict[str, Any]]" = OrderedDict()
+        self.keys: Dict[str, str] = {}
+        self._finished: Dict[str, float] = {}
+        self._done: Dict[str, asyncio.Event] = {}
+
+    def _prune(self) -> None:
+        cutoff = time.monotonic() - self.ttl
+        for job_id in [job_id for job_id, at in self._finished.items() if at < cutoff]:
+            self._remove(job_id)
+        # Finished jobs are in finishing order, so the oldest go first
+        while len(self.jobs) >= self.max_jobs and self._finished:
+            self._remove(next(iter(self._finished)))
+
+    def _remove(self, job_id: str) -> None:
+        job = self.jobs.pop(job_id, None)
+        self._finished.pop(job_id, None)
+        self._done.pop(job_id, None)
+        if job and job.get('key') and self.keys.get(job['key']) == job_id:
+            del self.keys[job['key']]
+
+    async def create(self, job: Dict[str, Any], key: Optional[str] = None) -> Tuple[Dict[str, Any], bool]:
+        self._prune()
+        if key and key in self.keys:
+            return self.jobs[self.keys[key]], False
+        job = {**job, 'key': key}
+        self.jobs[job['id']] = job
+        self._done[job['id']] = asyncio.Event()
+        if key:
+            self.keys[key] = job['id']
+        return job, True
+
+    async def find(self, key: str) -> Optional[Dict[str, Any]]:
+        job_id = self.keys.get(key)
+        return self.jobs.get(job_id) if job_id else None
+
+    async def get(self, job_id: str) -> Optional[Dict[str, Any]]:
+        return self.jobs.get(job_id)
+
+    async def update(self, job_id: str, **fields: Any) -> Optional[Dict[str, Any]]:
+        job = self.jobs.get(job_id)
+        if job is None:
+            return None
+        job.update(fields)
+        if job['status'] in FINAL_STATES and job_id not in self._finished:
+            self._finished[job_id] = time.monotonic()
+            self._done[job_id].set()
+        return job
+
+    async def wait(self, job_id: str, timeout: float) -> Optional[Dict[str, Any]]:
+        job = self.jobs.get(job_id)
+        if job is None or job['status'] in FINAL_STATES or timeout <= 0:
+            return job
+        try:
+            await asyncio.wait_for(self._done[job_id].wait(), timeout)
+        except asyncio.TimeoutError:
+            pass
+        return self.jobs.get(job_id, job)
+
+class RedisJobStore(JobStore):
+    """
+    Job store shared by every process through Redis.
+
+    Each job is one JSON value that expires ``ttl`` seconds after its last
+    update; client keys are claimed with ``SET NX`` and never overwritten.
+    Waits poll, since the job may finish on another process. Requires the
+    optional ``redis`` package.
+    """
+
+    # Times a client key is claimed before giving up with 409
+    CLAIM_ATTEMPTS = 3
+
+    def __init__(self, url: str, prefix: str = 'chat:job', ttl: float = 600.0,
+                 poll_interval: float = 0.25, client: Any = None):
+        """
+        Initialize the store.
+
+        Args:
+            url (str): Redis connection URL
+            prefix (str): Key prefix for jobs and client keys
+            ttl (float): Seconds a job stays readable after its last update
+            poll_interval (float): Seconds between reads while waiting
+            client (Any): Pre-built redis.asyncio client, mainly for tests
+        """
+        self.url = url
+        self.prefix = prefix
+        self.ttl = int(ttl)
+        self.poll_interval = poll_interval
+        self._client = client
+
+    def _connect(self):
+        if self._client is None:
+            try:
+                import redis.asyncio as redis
+            except ImportError as e:
+                raise RuntimeError("JOB_STORE_BACKEND=redis requires the 'redis' package") from e
+            self._client = redis.from_url(self.url)
+        return self._client
+
+    async def create(self, job: Dict[str, Any], key: Optional[str] = None) -> Tuple[Dict[str, Any], bool]:
+        client = self._connect()
+        job = {**job, 'key': key}
+        job_name = f"{self.prefix}:{job['id']}"
+        # The body is written before the key is claimed, so whoever loses the
+        # claim can always read the winner's job
+        await client.set(job_name, json.dumps(job, default=str), ex=self.ttl)
+        if not key:
+            return job, True
+        key_name = f"{self.prefix}:key:{key}"
+        for _ in range(self.CLAIM_ATTEMPTS):
+            if await client.set(key_name, job['id'], nx=True, ex=self.ttl):
+                return job, True
+            existing = await self.find(key)
+            if existing is not None:
+                await client.delete(job_name)
+                return existing, False
+            # The key expired or its job vanished in between; claim again
+            await asyncio.sleep(self.poll_interval)
+        await client.delete(job_name)
+        raise AdmissionRejected('job_key_conflict', 409, 1)
+
+    async def find(self, key: str) -> Optional[Dict[str, Any]]:
+        job_id = await self._connect().get(f"{self.prefix}:key:{key}")
+        if isinstance(job_id, bytes):
+            job_id = job_id.decode()
+        return await self.get(job_id) if job_id else None
+
+    async def get(self, job_id: str) -> Optional[Dict[str, Any]]:
+        raw = await self._connect().get(f"{self.prefix}:{job_id}")
+        return json.loads(raw) if raw else None
+
+    async def update(self, job_id: str, **fields: Any) -> Optional[Dict[str, Any]]:
+        # Only the process running a job updates it, so read-modify-write is safe
+        job = await self.get(job_id)
+        if job is None:
+            return None
+        job.update(fields)
+        await self._connect().set(f"{self.prefix}:{job_id}", json.dumps(job, default=str), ex=self.ttl)
+        return job
+
+    async def wait(self, job_id: str, timeout: float) -> Optional[Dict[str, Any]]:
+        deadline = time.monotonic() + timeout
+        job = await self.get(job_id)
+        while job is not None and job['status'] not in FINAL_STATES and time.monotonic() < deadline:
+            await asyncio.sleep(min(self.poll_interval, max(0.0, deadline - time.monotonic())))
+            job = await self.get(job_id)
+        return job
+
+    async def close(self) -> None:
+        if self._client is not None:
+            await self._client.close()
+            self._client = None
+
+def create_job_store() -> JobStore:
+    """
+    Create the job store selected by JOB_STORE_BACKEND.
+
+    Returns:
+        JobStore: Redis store for 'redis', otherwise the in-memory store
+    """
+    ttl = float(os.getenv('JOB_TTL', '600'))
+    if os.getenv('JOB_STORE_BACKEND', 'memory').lower() == 'redis':
+        return RedisJobStore(os.getenv('REDIS_URL', 'redis://localhost:6379/0'), ttl=ttl)
+    return InMemoryJobStore(ttl=ttl, max_jobs=int(os.getenv('JOB_MAX_STORED', '10000')))
+
+def public_job(job: Dict[str, Any]) -> Dict[str, Any]:
+    """Job fields safe to return to clients."""
+    return {k: v for k, v in job.items() if k != 'key'}
+
+async def _run_turn(session_id: str, message: str) -> Dict[str, Any]:
+    return await run_chat_turn(db_service, n8n_service, session_id, message)
+
+class ChatJobQueue:
+    """
+    Bounded pool of workers running chat turns submitted as jobs.
+
+    ``submit`` stores the job and returns at once; ``workers`` tasks take
+    jobs from a queue of at most ``max_queue`` entries and record the
+    outcome in the store, then notify listeners (the WebSocket manager
+    pushes it to the session). When the queue is full submissions are
+    rejected with AdmissionRejected, like a saturated n8n. Turns rejected
+    up front with TurnRejected are retried after its Retry-After hint,
+    since nothing was stored for them yet; a rejection raised after the
+    user message was stored fails the job, as a retry would store it
+    again.
+    """
+
+    def __init__(self, store: JobStore, run_turn: Callable[[str, str], Awaitable[Dict[str, Any]]] = _run_turn,
+                 workers: int = 4, max_queue: int = 100, retry_after: int = 5, max_attempts: int = 3):
+        """
+        Initialize the queue.
+
+        Args:
+            store (JobStore): Where job state is kept
+            run_turn (Callable): Coroutine function running one turn for (session_id, message)
+            workers (int): Turns run at once
+            max_queue (int): Jobs waiting for a worker before submissions are rejected
+            retry_after (int): Retry-After hint for rejected submissions, in seconds
+            max_attempts (int): Tries per turn while n8n rejects it as busy before storing anything
+        """
+        self.store = store
+        self.run_turn = run_turn
+        self.workers = workers
+        self.max_queue = max_queue
+        self.retry_after = retry_after
+        self.max_attempts = max_attempts
+        self.listeners: List[JobListener] = []
+        self.running = 0
+        self.completed = 0
+        self.failed = 0
+        self.rejected = 0
+        self._queue: Optional[asyncio.Queue] = None
+        self._tasks: List[asyncio.Task] = []
+
+    def add_listener(self, listener: JobListener) -> None:
+        """Call ``listener`` with each job that reaches a final state."""
+        self.listeners.append(listener)
+
+    def start(self) -> None:
+        """Start the workers on the running event loop."""
+        if self._tasks:
+            return
+        self._queue = asyncio.Queue(maxsize=self.max_queue)
+        loop = asyncio.get_running_loop()
+        self._tasks = [loop.create_task(self._worker()) for _ in range(self.workers)]
+
+    async def stop(self) -> None:
+        """Stop the workers; jobs not yet finished are marked failed."""
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+        while self._queue is not None and not self._queue.empty():
+            job_id, _, _ = self._queue.get_nowait()
+            await self.store.update(job_id, status=FAILED, error='Server restarting, please retry.', finished_at=_now())
+        await self.store.close()
+
+    def pending(self) -> int:
+        return self._queue.qsize() if self._queue is not None else 0
+
+    async def submit(self, session_id: str, message: str, key: Optional[str] = None) -> Tuple[Dict[str, Any], bool]:
+        """
+        Submit a chat turn.
+
+        Args:
+            session_id (str): Session identifier
+            message (str): Message from the user
+            key (Optional[str]): Client idempotency key; resubmitting it returns the existing job
+
+        Returns:
+            Tuple[Dict[str, Any], bool]: The job and whether it was newly created
+
+        Raises:
+            AdmissionRejected: If the queue is full, the workers are not running or the key is stuck (409)
+        """
+        # Keys are scoped to the session so clients cannot reach each other's jobs
+        key = f"{session_id}:{key}" if key else None
+        if key:
+            existing = await self.store.find(key)
+            if existing is not None:
+                return existing, False
+        if self._queue is None or self._queue.full():
+            self.rejected += 1
+            raise AdmissionRejected('job_queue_full', 503, self.retry_after)
+        job = {'id': uuid.uuid4().hex, 'session_id': session_id, 'status': QUEUED, 'created_at': _now(),
+               'started_at': None, 'finished_at': None, 'result': None, 'error': None}
+        job, created = await self.store.create(job, key)
+        if created:
+            self._queue.put_nowait((job['id'], session_id, message))
+        return job, created
+
+    async def get(self, job_id: str) -> Optional[Dict[str, Any]]:
+        return await self.store.get(job_id)
+
+    async def wait(self, job_id: str, timeout: float) -> Optional[Dict[str, Any]]:
+        return await self.store.wait(job_id, timeout)
+
+    async def _worker(self) -> None:
+        while True:
+            job_id, session_id, message = await self._queue.get()
+            with log_context(session_id=session_id, job_id=job_id):
+                self.running += 1
+                try:
+                    job = await self._run(job_id, session_id, message)
+                finally:
+                    self.running -= 1
+            if job is not None:
+                await self._notify(job)
+
+    async def _run(self, job_id: str, session_id: str, message: str) -> Optional[Dict[str, Any]]:
+        await self.store.update(job_id, status=RUNNING, started_at=_now())
+        try:
+            for attempt in range(1, self.max_attempts + 1):
+                try:
+                    result = await self.run_turn(session_id, message)
+                    break
+                except TurnRejected as e:
+                    if attempt == self.max_attempts:
+                        raise
+                    await asyncio.sleep(e.retry_after)
+        except asyncio.CancelledError:
+            await self.store.update(job_id, status=FAILED, error='Server restarting, please retry.', finished_at=_now())
+            raise
+        except Exception as e:
+            self.failed += 1
+            error = 'Service is busy, please retry shortly.' if isinstance(e, AdmissionRejected) else ERROR_MESSAGE
+            if not isinstance(e, (ChatTurnError, AdmissionRejected)):
+                logger.exception('chat_job_failed')
+            return await self.store.update(job_id, status=FAILED, error=error, finished_at=_now())
+        self.completed += 1
+        return await self.store.update(job_id, status=DONE, result=result, finished_at=_now())
+
+    async def _notify(self, job: Dict[str, Any]) -> None:
+        for listener in self.listeners:
+            try:
+                await listener(public_job(job))
+            except Exception:
+                logger.exception('chat_job_listener_failed', job_id=job['id'])
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            'workers': self.workers,
+            'queued': self.pending(),
+            'running': self.running,
+            'completed': self.completed,
+            'failed': self.failed,
+            'rejected': self.rejected,
+        }
+
+    def register_metrics(self, registry: MetricsRegistry) -> None:
+        """
+        Expose queue depth and job outcomes as metrics.
+
+        Args:
+            registry (MetricsRegistry): Registry to add the metrics to
+        """
+        registry.callback('gauge', 'chat_jobs_queued', 'Chat jobs waiting for a worker', self.pending)
+        registry.callback('gauge', 'chat_jobs_running', 'Chat jobs being processed', lambda: self.running)
+        registry.callback('counter', 'chat_jobs_completed_total', 'Chat jobs that produced a reply', lambda: self.completed)
+        registry.callback('counter', 'chat_jobs_failed_total', 'Chat jobs that ended in an error', lambda: self.failed)
+        registry.callback('counter', 'chat_jobs_rejected_total', 'Chat job submissions rejected because the queue was full',
+                          lambda: self.rejected)
+
+# Process-wide job queue
+chat_jobs = ChatJobQueue(
+    create_job_store(),
+    workers=int(os.getenv('JOB_WORKERS', '4')),
+    max_queue=int(os.getenv('JOB_QUEUE_SIZE', '100'))
+)
@@ -0,0 +1,318 @@
+"""
+Logging module for chat application.
+Structured event logging with correlation IDs, written off the request path.
+"""
+
+import json
+import logging
+import os
+import queue
+import random
+import reprlib
+import sys
+import uuid
+from contextlib import contextmanager
+from contextvars import ContextVar
+from datetime import datetime, timezone
+from logging.handlers import QueueHandler, QueueListener
+from typing import Any, Dict, Iterator, Optional
+
+# Correlation fields (request_id, session_id, ...) attached to every event logged in this context
+_context: ContextVar[Dict[str, str]] = ContextVar('log_context', default={})
+
+def bind_context(**fields: Optional[str]):
+    """
+    Add correlation fields to events logged from the current context.
+
+    Tasks started afterwards inherit the fields; changes made inside a task
+    stay in that task.
+
+    Args:
+        **fields (Optional[str]): Field values; None values are ignored
+
+    Returns:
+        Token for ``reset_context``
+    """
+    return _context.set({**_context.get(), **{k: v for k, v in fields.items() if v is not None}})
+
+def reset_context(token) -> None:
+    """Restore the correlation fields from before ``bind_context``."""
+    _context.reset(token)
+
+@contextmanager
+def log_context(**fields: Optional[str]) -> Iterator[None]:
+    """Bind correlation fields for the duration of a ``with`` block."""
+    token = bind_context(**fields)
+    try:
+        yield
+    finally:
+        reset_context(token)
+
+def parse_sample_rates(spec: str) -> Dict[str, float]:
+    """
+    Parse ``event=rate`` pairs, e.g. ``history_fetched=0.01,turn_completed=0.1``.
+
+    Args:
+        spec (str): Comma separated pairs
+
+    Returns:
+        Dict[str, float]: Keep probability per event name
+    """
+    rates = {}
+    for item in spec.split(','):
+        event, _, rate = item.partition('=')
+        if event.strip() and rate.strip():
+            rates[event.strip()] = min(1.0, max(0.0, float(rate)))
+    return rates
+
+class _FieldRepr(reprlib.Repr):
+    """Bounded repr, so the cost of logging a value does not grow with its size."""
+
+    def __init__(self, max_length: int):
+        super().__init__()
+        self.maxstring = max_length
+        self.maxother = max_length
+        self.maxlist = self.maxtuple = self.maxdict = self.maxset = 10
+        self.maxlevel = 3
+
+def truncate(value: Any, max_length: int, _repr: Optional[reprlib.Repr] = None) -> Any:
+    """
+    Make a field value safe to log.
+
+    Numbers, booleans and None pass through; strings longer than
+    ``max_length`` are cut and marked with the number of characters
+    dropped; anything else is rendered with a bounded repr.
+
+    Args:
+        value (Any): Field value
+        max_length (int): Longest string kept
+
+    Returns:
+        Any: JSON-serializable value
+    """
+    if value is None or isinstance(value, (bool, int, float)):
+        return value
+    if isinstance(value, str):
+        if len(value) <= max_length:
+            return value
+        return f"{value[:max_length]}...(+{len(value) - max_length} chars)"
+    return (_repr or _FieldRepr(max_length)).repr(value)
+
+class StructuredFormatter(logging.Formatter):
+    """
+    Renders event records as one JSON object per line, or as
+    ``key=value`` text when ``json_output`` is off.
+
+    Runs on the listener thread, so formatting cost stays off the event loop.
+    """
+
+    def __init__(self, max_length: int = 200, json_output: bool = True):
+        super().__init__()
+        self.max_length = max_length
+        self.json_output = json_output
+        self._repr = _FieldRepr(max_length)
+
+    def format(self, record: logging.LogRecord) -> str:
+        entry = {
+            'ts': datetime.fromtimestamp(record.created, timezone.utc).isoformat(timespec='milliseconds'),
+            'level': record.levelname.lower(),
+            'logger': record.name,
+            'event': record.getMessage(),
+        }
+        entry.update(getattr(record, 'context', None) or {})
+        for key, value in (getattr(record, 'fields', None) or {}).items():
+            entry[key] = truncate(value, self.max_length, self._repr)
+        if record.exc_info:
+            entry['exc'] = self.formatException(record.exc_info)
+        if self.json_output:
+            return json.dumps(entry, default=str)
+        head = f"{entry.pop('ts')} {entry.pop('level').upper():<7} {entry.pop('logger')} {entry.pop('event')}"
+        exc = entry.pop('exc', None)
+        line = ' '.join([head] + [f"{k}={v}" for k, v in entry.items()])
+        return f"{line}\n{exc}" if exc else line
+
+class _DroppingQueueHandler(QueueHandler):
+    """
+    Queue handler that never blocks the caller.
+
+    Records go to the listener thread as they are, unformatted; when the
+    queue is full the record is dropped and counted instead of waiting.
+    """
+
+    def __init__(self, log_queue: queue.Queue, pipeline: "LogPipeline"):
+        super().__init__(log_queue)
+        self.pipeline = pipeline
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        return record
+
+    def enqueue(self, record: logging.LogRecord) -> None:
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.pipeline.dropped += 1
+
+class LogPipeline:
+    """
+    Owns the ``app`` logger configuration.
+
+    Events are put on a bounded queue and written to stdout by a
+    QueueListener thread, so a slow terminal or log collector never stalls
+    request handling. Configured from LOG_LEVEL, LOG_FORMAT (``json`` or
+    ``text``), LOG_MAX_FIELD_LENGTH, LOG_QUEUE_SIZE and LOG_SAMPLE_RATES.
+    """
+
+    def __init__(self):
+        """Initialize the pipeline from environment settings."""
+        self.level = logging.getLevelName(os.getenv('LOG_LEVEL', 'INFO').upper())
+        if not isinstance(self.level, int):
+            self.level = logging.INFO
+        self.json_output = os.getenv('LOG_FORMAT', 'json').lower() != 'text'
+        self.max_length = int(os.getenv('LOG_MAX_FIELD_LENGTH', '200'))
+        self.sample_rates = parse_sample_rates(os.getenv('LOG_SAMPLE_RATES', ''))
+        self.queue: queue.Queue = queue.Queue(maxsize=int(os.getenv('LOG_QUEUE_SIZE', '10000')))
+        self.dropped = 0
+        self.sampled_out = 0
+        self.listener: Optional[QueueListener] = None
+        self.handler = _DroppingQueueHandler(self.queue, self)
+
+    def install(self, name: str = 'app') -> None:
+        """
+        Route a logger hierarchy into the queue.
+
+        Events logged before ``start`` wait in the queue and are written
+        once the listener runs.
+        """
+        root = logging.getLogger(name)
+        root.setLevel(self.level)
+        root.propagate = False
+        if self.handler not in root.handlers:
+            root.addHandler(self.handler)
+
+    def keep(self, event: str) -> bool:
+        """Decide whether a sampled event is logged this time."""
+        rate = self.sample_rates.get(event)
+        if rate is None or rate >= 1.0 or random.random() < rate:
+            return True
+        self.sampled_out += 1
+        return False
+
+    def start(self) -> None:
+        """Start the writer thread; calling it again while running does nothing."""
+        if self.listener is not None:
+            return
+        output = logging.StreamHandler(sys.stdout)
+        output.setFormatter(StructuredFormatter(self.max_length, self.json_output))
+        self.listener = QueueListener(self.queue, output, respect_handler_level=False)
+        self.listener.start()
+
+    def stop(self) -> None:
+        """Write out queued events and stop the writer thread."""
+        if self.listener is None:
+            return
+        self.listener.stop()
+        self.listener = None
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            'level': logging.getLevelName(self.level),
+            'queued': self.queue.qsize(),
+            'dropped': self.dropped,
+            'sampled_out': self.sampled_out,
+        }
+
+    def register_metrics(self, registry) -> None:
+        registry.callback('gauge', 'log_queue_depth', 'Log events waiting to be written', self.queue.qsize)
+        registry.callback('counter', 'log_events_dropped_total', 'Log events dropped because the queue was full',
+                          lambda: self.dropped)
+        registry.callback('counter', 'log_events_sampled_out_total', 'Log events skipped by sampling',
+                          lambda: self.sampled_out)
+
+class EventLogger:
+    """
+    Logger for named events with keyword fields.
+
+    Level and sampling are checked before a record is created, so
+    disabled or sampled-out events cost a couple of comparisons. Warnings
+    and errors are never sampled.
+    """
+
+    __slots__ = ('logger',)
+
+    def __init__(self, name: str):
+        self.logger = logging.getLogger(name)
+
+    def _log(self, level: int, event: str, exc_info: bool, fields: Dict[str, Any]) -> None:
+        if not self.logger.isEnabledFor(level):
+            return
+        if level < logging.WARNING and not log_pipeline.keep(event):
+            return
+        self.logger.log(level, event, exc_info=exc_info, extra={'fields': fields, 'context': _context.get()})
+
+    def debug(self, event: str, **fields: Any) -> None:
+        self._log(logging.DEBUG, event, False, fields)
+
+    def info(self, event: str, **fields: Any) -> None:
+        self._log(logging.INFO, event, False, fields)
+
+    def warning(self, event: str, **fields: Any) -> None:
+        self._log(logging.WARNING, event, False, fields)
+
+    def error(self, event: str, **fields: Any) -> None:
+        self._log(logging.ERROR, event, False, fields)
+
+    def exception(self, event: str, **fields: Any) -> None:
+        """Log an error with the traceback of the exception being handled."""
+        self._log(logging.ERROR, event, True, fields)
+
+def get_logger(name: str) -> EventLogger:
+    """
+    Get an event logger; pass the module's ``__name__``.
+
+    Args:
+        name (str): Logger name under the ``app`` hierarchy
+
+    Returns:
+        EventLogger: Logger for the module
+    """
+    return EventLogger(name)
+
+class RequestContextMiddleware:
+    """
+    ASGI middleware that gives each HTTP request and WebSocket connection a
+    request ID for log correlation.
+
+    A client-supplied ``X-Request-ID`` is reused when it looks sane,
+    otherwise one is generated; HTTP responses echo it back.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    @staticmethod
+    def _request_id(scope) -> str:
+        for name, value in scope.get('headers') or ():
+            if name == b'x-request-id':
+                candidate = value.decode('latin-1')
+                if 0 < len(candidate) <= 64 and candidate.replace('-', '').isalnum():
+                    return candidate
+                break
+        return uuid.uuid4().hex
+
+    async def __call__(self, scope, receive, send):
+        if scope['type'] not in ('http', 'websocket'):
+            await self.app(scope, receive, send)
+            return
+        request_id = self._request_id(scope)
+
+        async def send_with_id(message):
+            if message['type'] == 'http.response.start':
+                message = {**message, 'headers': list(message.get('headers', [])) + [(b'x-request-id', request_id.encode())]}
+            await send(message)
+
+        with log_context(request_id=request_id):
+            await self.app(scope, receive, send_with_id if scope['type'] == 'http' else send)
+
+# Process-wide logging pipeline
+log_pipeline = LogPipeline()
+log_pipeline.install()
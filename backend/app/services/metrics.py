@@ -0,0 +1,358 @@
+"""
+Metrics module for chat application.
+In-process counters, gauges and histograms rendered in the Prometheus text format.
+"""
+
+import math
+import time
+from bisect import bisect_left
+from typing import Callable, Dict, Iterator, List, Optional, Tuple, Union
+
+from .log import get_logger
+
+logger = get_logger(__name__)
+
+# Latency buckets in seconds, from a cached session lookup to a slow LLM call
+DEFAULT_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+LabelValues = Tuple[str, ...]
+CallbackResult = Union[float, Dict[LabelValues, float]]
+
+def _format_labels(names: Tuple[str, ...], values: LabelValues, extra: str = '') -> str:
+    pairs = [f'{n}="{str(v).replace(chr(92), chr(92) * 2).replace(chr(34), chr(92) + chr(34))}"' for n, v in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return '{' + ','.join(pairs) + '}' if pairs else ''
+
+def _format_value(value: float) -> str:
+    if value == math.inf:
+        return '+Inf'
+    return repr(float(value)) if not float(value).is_integer() else str(int(value))
+
+class _Metric:
+    """Base class for metrics with optional labels."""
+
+    kind = 'untyped'
+
+    def __init__(self, name: str, documentation: str, labelnames: Tuple[str, ...] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._children: Dict[LabelValues, object] = {}
+        if not self.labelnames:
+            self._unlabelled = self.labels()
+
+    def labels(self, *values: str):
+        """
+        Get the child for a set of label values, creating it on first use.
+
+        Args:
+            *values (str): One value per label name, in order
+
+        Returns:
+            The child metric
+        """
+        child = self._children.get(values)
+        if child is None:
+            if len(values) != len(self.labelnames):
+                raise ValueError(f"{self.name} expects labels {self.labelnames}")
+            child = self._children[values] = self._new_child()
+        return child
+
+    def _new_child(self):
+        raise NotImplementedError
+
+    def samples(self) -> Iterator[str]:
+        raise NotImplementedError
+
+class _CounterChild:
+    __slots__ = ('value',)
+
+    def __init__(self):
+        self.value = 0.0
+
+    def inc(self, amount: float = 1.0) -> None:
+        self.value += amount
+
+class Counter(_Metric):
+    """Monotonically increasing count."""
+
+    kind = 'counter'
+
+    def _new_child(self):
+        return _CounterChild()
+
+    def inc(self, amount: float = 1.0) -> None:
+        """Increment an unlabelled counter."""
+        self._unlabelled.inc(amount)
+
+    def samples(self) -> Iterator[str]:
+        for values, child in self._children.items():
+            yield f"{self.name}{_format_labels(self.labelnames, values)} {_format_value(child.value)}"
+
+class _GaugeChild:
+    __slots__ = ('value',)
+
+    def __init__(self):
+        self.value = 0.0
+
+    def inc(self, amount: float = 1.0) -> None:
+        self.value += amount
+
+    def dec(self, amount: float = 1.0) -> None:
+        self.value -= amount
+
+    def set(self, value: float) -> None:
+        self.value = value
+
+class Gauge(_Metric):
+    """Value that can go up and down."""
+
+    kind = 'gauge'
+
+    def _new_child(self):
+        return _GaugeChild()
+
+    def inc(self, amount: float = 1.0) -> None:
+        self._unlabelled.inc(amount)
+
+    def dec(self, amount: float = 1.0) -> None:
+        self._unlabelled.dec(amount)
+
+    def set(self, value: float) -> None:
+        self._unlabelled.set(value)
+
+    def samples(self) -> Iterator[str]:
+        for values, child in self._children.items():
+            yield f"{self.name}{_format_labels(self.labelnames, values)} {_format_value(child.value)}"
+
+class _HistogramChild:
+    __slots__ = ('buckets', 'counts', 'sum', 'count')
+
+    def __init__(self, buckets: Tuple[float, ...]):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value: float) -> None:
+        self.counts[bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+
+    def time(self) -> "_Timer":
+        """Observe the duration of a ``with`` block."""
+        return _Timer(self)
+
+class _Timer:
+    __slots__ = ('child', 'start')
+
+    def __init__(self, child: _HistogramChild):
+        self.child = child
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self.child.observe(time.perf_counter() - self.start)
+
+class Histogram(_Metric):
+    """
+    Distribution of observed values in cumulative buckets.
+
+    Observing is one bisect and three additions, so it is cheap enough for
+    every request; bucket counts are only made cumulative when rendered.
+    """
+
+    kind = 'histogram'
+
+    def __init__(self, name: str, documentation: str, labelnames: Tuple[str, ...] = (),
+                 buckets: Tuple[float, ...] = DEFAULT_BUCKETS):
+        self.buckets = tuple(sorted(buckets))
+        super().__init__(name, documentation, labelnames)
+
+    def _new_child(self):
+        return _HistogramChild(self.buckets)
+
+    def observe(self, value: float) -> None:
+        self._unlabelled.observe(value)
+
+    def time(self) -> _Timer:
+        return self._unlabelled.time()
+
+    def samples(self) -> Iterator[str]:
+        for values, child in self._children.items():
+            cumulative = 0
+            for bound, count in zip(self.buckets + (math.inf,), child.counts):
+                cumulative += count
+                le = 'le="' + _format_value(bound) + '"'
+                yield f"{self.name}_bucket{_format_labels(self.labelnames, values, le)} {cumulative}"
+            yield f"{self.name}_sum{_format_labels(self.labelnames, values)} {_format_value(child.sum)}"
+            yield f"{self.name}_count{_format_labels(self.labelnames, values)} {child.count}"
+
+class _CallbackMetric:
+    """Metric whose value is read from a function at scrape time."""
+
+    def __init__(self, kind: str, name: str, documentation: str, fn: Callable[[], CallbackResult],
+                 labelnames: Tuple[str, ...] = ()):
+        self.kind = kind
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self.fn = fn
+
+    def samples(self) -> Iterator[str]:
+        result = self.fn()
+        if not isinstance(result, dict):
+            result = {(): result}
+        for values, value in result.items():
+            yield f"{self.name}{_format_labels(self.labelnames, values)} {_format_value(value)}"
+
+class MetricsRegistry:
+    """
+    Collection of metrics rendered together for /metrics.
+
+    Metrics are keyed by name, so registering a name again replaces the
+    earlier metric.
+    """
+
+    def __init__(self):
+        self._metrics: Dict[str, object] = {}
+
+    def register(self, metric):
+        """Add a metric and return it."""
+        self._metrics[metric.name] = metric
+        return metric
+
+    def counter(self, name: str, documentation: str, labelnames: Tuple[str, ...] = ()) -> Counter:
+        return self.register(Counter(name, documentation, labelnames))
+
+    def gauge(self, name: str, documentation: str, labelnames: Tuple[str, ...] = ()) -> Gauge:
+        return self.register(Gauge(name, documentation, labelnames))
+
+    def histogram(self, name: str, documentation: str, labelnames: Tuple[str, ...] = (),
+                  buckets: Tuple[float, ...] = DEFAULT_BUCKETS) -> Histogram:
+        return self.register(Histogram(name, documentation, labelnames, buckets))
+
+    def callback(self, kind: str, name: str, documentation: str, fn: Callable[[], CallbackResult],
+                 labelnames: Tuple[str, ...] = ()) -> None:
+        """
+        Register a gauge or counter read from existing state when scraped.
+
+        Used for values services already track, so the hot path pays nothing.
+
+        Args:
+            kind (str): ``gauge`` or ``counter``
+            name (str): Metric name
+            documentation (str): Help text
+            fn (Callable): Returns a number, or a dict of label values to numbers
+            labelnames (Tuple[str, ...]): Label names for dict results
+        """
+        self.register(_CallbackMetric(kind, name, documentation, fn, labelnames))
+
+    def get(self, name: str) -> Optional[object]:
+        return self._metrics.get(name)
+
+    def render(self) -> str:
+        """
+        Render every metric in the Prometheus text exposition format.
+
+        A failing callback is skipped so one broken source cannot break the scrape.
+
+        Returns:
+            str: Exposition text
+        """
+        lines: List[str] = []
+        for metric in self._metrics.values():
+            try:
+                samples = list(metric.samples())
+            except Exception as e:
+                logger.warning('metric_collect_failed', metric=metric.name, error=repr(e))
+                continue
+            lines.append(f"# HELP {metric.name} {metric.documentation}")
+            lines.append(f"# TYPE {metric.name} {metric.kind}")
+            lines.extend(samples)
+        return '\n'.join(lines) + '\n'
+
+# Server-Timing group for each stage; unlisted stages and untimed work count as app time
+STAGE_GROUPS = {
+    'session_lookup': 'db',
+    'save_user': 'db',
+    'save_bot': 'db',
+    'history_query': 'db',
+    'sessions_query': 'db',
+    'n8n': 'n8n',
+    'n8n_stream': 'n8n',
+}
+
+class StageTimer:
+    """
+    Times consecutive stages of one request.
+
+    ``enter`` closes the previous stage and starts the next; each finished
+    stage is observed in the histogram under its name and kept in
+    ``durations`` for the caller.
+    """
+
+    __slots__ = ('histogram', 'current', 'started', 'durations', 'created')
+
+    def __init__(self, histogram: Histogram):
+        self.histogram = histogram
+        self.current: Optional[str] = None
+        self.started = 0.0
+        self.durations: Dict[str, float] = {}
+        self.created = time.perf_counter()
+
+    def enter(self, stage: str) -> None:
+        """Finish the current stage, if any, and start timing ``stage``."""
+        now = time.perf_counter()
+        self._close(now)
+        self.current = stage
+        self.started = now
+
+    def finish(self) -> None:
+        """Finish the current stage."""
+        self._close(time.perf_counter())
+        self.current = None
+
+    def _close(self, now: float) -> None:
+        if self.current is not None:
+            elapsed = now - self.started
+            self.durations[self.current] = self.durations.get(self.current, 0.0) + elapsed
+            self.histogram.labels(self.current).observe(elapsed)
+
+    def server_timing(self) -> str:
+        """
+        Summarize the request as a ``Server-Timing`` header value.
+
+        Stages are grouped into ``db`` and ``n8n`` time; everything else
+        since the timer was created, including untimed handler work, is
+        reported as ``app``, and ``total`` covers the whole span.
+
+        Returns:
+            str: Header value, durations in milliseconds
+        """
+        total = time.perf_counter() - self.created
+        groups = {'db': 0.0, 'n8n': 0.0}
+        for stage, seconds in self.durations.items():
+            group = STAGE_GROUPS.get(stage)
+            if group:
+                groups[group] += seconds
+        groups['app'] = max(0.0, total - groups['db'] - groups['n8n'])
+        groups['total'] = total
+        return ', '.join(f"{name};dur={seconds * 1000:.1f}" for name, seconds in groups.items())
+
+# Process-wide registry served on /metrics
+REGISTRY = MetricsRegistry()
+
+CHAT_STAGE_SECONDS = REGISTRY.histogram(
+    'chat_stage_duration_seconds',
+    'Time spent in each stage of a chat turn',
+    ('stage',)
+)
+CHAT_TURN_ERRORS = REGISTRY.counter(
+    'chat_turn_errors_total',
+    'Chat turns that failed, by the stage that failed',
+    ('stage',)
+)
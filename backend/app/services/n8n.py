@@ -4,19 +4,119 @@ Handles all interactions with the n8n workflow engine.
 """
 
 import os
-import requests
-from typing import Optional, Dict, Any
+import re
+import json
+import importlib.util
+from typing import Optional, Dict, Any, AsyncIterator
+
+import httpx
+
+from .cache import LRUCache
+from .coalesce import SingleFlight
+from .admission import AdmissionController, AdmissionRejected
+from .circuit import CircuitBreaker, CircuitOpen
+from .retry import RetryPolicy, is_upstream_failure
+from .metrics import REGISTRY, MetricsRegistry
+from .log import get_logger
+
+logger = get_logger(__name__)
+
+class N8NStreamError(RuntimeError):
+    """Raised when a streaming webhook reports an error chunk."""
 
 class N8NService:
     """
     Service class for handling all n8n webhook interactions.
     Manages different webhook modes and response processing.
+
+    A single pooled ``httpx.AsyncClient`` is shared by every request so that
+    connections to the n8n container are kept alive between chat turns.
+
+    When ``N8N_CACHE_ENABLED`` is set, answers are cached by normalized
+    question text so repeated questions skip the webhook. Cached answers
+    ignore per-session conversation memory, so the cache is opt-in.
+
+    ``N8N_COALESCE_SCOPE`` (``session`` or ``global``) makes concurrent
+    identical messages share one webhook call; ``off`` disables it.
+
+    Webhook calls pass through an admission controller that caps
+    concurrent calls to n8n and rejects callers once its queue is full.
+    A circuit breaker in front of it fails calls immediately while n8n
+    keeps erroring, and calls that never reached n8n are retried with
+    jittered exponential backoff.
     """
     
     def __init__(self):
         """Initialize n8n service with environment-based configuration."""
         self.mode = os.getenv('N8N_WEBHOOK_MODE', 'production')
         self.webhook_url = self._get_webhook_url()
+        self.stream_webhook_url = os.getenv('N8N_WEBHOOK_URL_STREAM', self.webhook_url)
+        self.timeout = float(os.getenv('N8N_TIMEOUT', '30'))
+        self.max_connections = int(os.getenv('N8N_HTTP_MAX_CONNECTIONS', '100'))
+        self.max_keepalive_connections = int(os.getenv('N8N_HTTP_MAX_KEEPALIVE', '20'))
+        self.keepalive_expiry = float(os.getenv('N8N_HTTP_KEEPALIVE_EXPIRY', '30'))
+        self.http2 = os.getenv('N8N_HTTP2', 'false').lower() == 'true'
+        self._client: Optional[httpx.AsyncClient] = None
+        self.cache_enabled = os.getenv('N8N_CACHE_ENABLED', 'false').lower() == 'true'
+        self.response_cache = LRUCache(
+            maxsize=int(os.getenv('N8N_CACHE_MAX_ENTRIES', '1000')),
+            ttl=float(os.getenv('N8N_CACHE_TTL', '3600')),
+            max_bytes=int(os.getenv('N8N_CACHE_MAX_BYTES', str(16 * 1024 * 1024)))
+        )
+        self.coalesce_scope = os.getenv('N8N_COALESCE_SCOPE', 'off').lower()
+        self.single_flight = SingleFlight()
+        self.admission = AdmissionController(
+            max_in_flight=int(os.getenv('N8N_MAX_IN_FLIGHT', '8')),
+            max_queue=int(os.getenv('N8N_MAX_QUEUE', '32')),
+            queue_timeout=float(os.getenv('N8N_QUEUE_TIMEOUT', '10')),
+            retry_after=int(os.getenv('N8N_RETRY_AFTER', '5')),
+            status_code=int(os.getenv('N8N_REJECT_STATUS', '503'))
+        )
+        self.circuit = CircuitBreaker(
+            failure_threshold=int(os.getenv('N8N_CIRCUIT_FAILURE_THRESHOLD', '5')),
+            recovery_timeout=float(os.getenv('N8N_CIRCUIT_RECOVERY_TIMEOUT', '30')),
+            half_open_max_calls=int(os.getenv('N8N_CIRCUIT_HALF_OPEN_MAX_CALLS', '1')),
+            status_code=int(os.getenv('N8N_REJECT_STATUS', '503'))
+        )
+        self.retry_policy = RetryPolicy(
+            max_attempts=int(os.getenv('N8N_RETRY_MAX_ATTEMPTS', '3')),
+            base_delay=float(os.getenv('N8N_RETRY_BASE_DELAY', '0.2')),
+            max_delay=float(os.getenv('N8N_RETRY_MAX_DELAY', '2'))
+        )
+
+    def register_metrics(self, registry: MetricsRegistry) -> None:
+        """
+        Expose upstream, admission, circuit and cache counters as metrics.
+
+        Values are read from the existing counters when scraped, so calls
+        pay nothing extra.
+
+        Args:
+            registry (MetricsRegistry): Registry to add the metrics to
+        """
+        states = ('closed', 'half_open', 'open')
+        registry.callback('gauge', 'n8n_in_flight_calls', 'Webhook calls currently holding an admission slot',
+                          lambda: self.admission.in_flight)
+        registry.callback('gauge', 'n8n_queue_depth', 'Callers waiting for an admission slot',
+                          lambda: self.admission.queue_depth)
+        registry.callback('counter', 'n8n_admission_rejected_total', 'Calls rejected by admission control',
+                          lambda: {('queue_full',): self.admission.rejected_queue_full,
+                                   ('queue_timeout',): self.admission.rejected_timeout,
+                                   ('circuit_open',): self.circuit.short_circuited}, ('reason',))
+        registry.callback('gauge', 'n8n_circuit_state', 'Circuit breaker state, 1 for the current state',
+                          lambda: {(state,): int(self.circuit.state == state) for state in states}, ('state',))
+        registry.callback('counter', 'n8n_upstream_failures_total', 'Webhook calls that failed upstream',
+                          lambda: self.circuit.failures)
+        registry.callback('counter', 'n8n_retries_total', 'Webhook calls retried after a connection failure',
+                          lambda: self.retry_policy.retries)
+        registry.callback('counter', 'n8n_coalesced_total', 'Messages that shared an in-flight webhook call',
+                          lambda: self.single_flight.coalesced)
+        registry.callback('counter', 'n8n_cache_hits_total', 'Answers served from the response cache',
+                          lambda: self.response_cache.hits)
+        registry.callback('counter', 'n8n_cache_misses_total', 'Response cache lookups that missed',
+                          lambda: self.response_cache.misses)
+        registry.callback('gauge', 'n8n_cache_entries', 'Answers held in the response cache',
+                          lambda: len(self.response_cache))
 
     def _get_webhook_url(self) -> str:
         """
@@ -29,14 +129,176 @@ class N8NService:
             return os.getenv('N8N_WEBHOOK_URL_TEST', 'http://n8n:5678/webhook-test/returning-user')
         return os.getenv('N8N_WEBHOOK_URL_PRODUCTION', 'http://n8n:5678/webhook/returning-user')
 
-<<<<<<< HEAD
+    def _create_client(self) -> httpx.AsyncClient:
+        """
+        Build the pooled HTTP client used for webhook calls.
+
+        HTTP/2 is only enabled when requested and the optional ``h2``
+        package is installed; otherwise the client falls back to HTTP/1.1.
+
+        Returns:
+            httpx.AsyncClient: Configured client
+        """
+        http2 = self.http2
+        if http2 and importlib.util.find_spec('h2') is None:
+            logger.warning('n8n_http2_unavailable', reason="the 'h2' package is not installed; using HTTP/1.1")
+            http2 = False
+        return httpx.AsyncClient(
+            timeout=self.timeout,
+            http2=http2,
+            limits=httpx.Limits(
+                max_connections=self.max_connections,
+                max_keepalive_connections=self.max_keepalive_connections,
+                keepalive_expiry=self.keepalive_expiry,
+            ),
+        )
+
+    @property
+    def client(self) -> httpx.AsyncClient:
+        """
+        Shared HTTP client, created on first use if startup() was not called.
+
+        Returns:
+            httpx.AsyncClient: The pooled client
+        """
+        if self._client is None or self._client.is_closed:
+            self._client = self._create_client()
+        return self._client
+
+    async def startup(self) -> None:
+        """Open the pooled HTTP client. Called from the application lifespan."""
+        if self._client is None or self._client.is_closed:
+            self._client = self._create_client()
+
+    async def shutdown(self) -> None:
+        """Close the pooled HTTP client and release its connections."""
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
+
+    @staticmethod
+    def normalize_question(message: str) -> str:
+        """
+        Normalize a question for use as a cache key.
+
+        Case, repeated whitespace and trailing punctuation are ignored.
+
+        Args:
+            message (str): Raw user message
+
+        Returns:
+            str: Normalized question
+        """
+        return re.sub(r'\s+', ' ', message).strip().lower().rstrip('?!. ')
+
+    def get_cached_response(self, message: str) -> Optional[Dict[str, Any]]:
+        """
+        Look up a cached answer for a question.
+
+        Args:
+            message (str): Raw user message
+
+        Returns:
+            Optional[Dict[str, Any]]: Copy of the cached response, or None
+        """
+        if not self.cache_enabled:
+            return None
+        cached = self.response_cache.get(self.normalize_question(message))
+        return json.loads(cached) if cached is not None else None
+
+    def cache_response(self, message: str, response_json: Dict[str, Any]) -> None:
+        """
+        Cache a response if it carries a bot answer.
+
+        Args:
+            message (str): Raw user message
+            response_json (Dict[str, Any]): Response from n8n
+        """
+        if not self.cache_enabled or not self.extract_bot_message(response_json):
+            return
+        key = self.normalize_question(message)
+        encoded = json.dumps(response_json)
+        self.response_cache.set(key, encoded, size=len(encoded) + len(key))
+
+    def invalidate_cached_response(self, message: str) -> bool:
+        """
+        Remove the cached answer for a question.
+
+        Args:
+            message (str): Question as asked by users
+
+        Returns:
+            bool: True if an entry was removed
+        """
+        return self.response_cache.discard(self.normalize_question(message))
+
+    def clear_cache(self) -> None:
+        """Drop every cached answer, e.g. after the knowledge base is re-ingested."""
+        self.response_cache.clear()
+
+    def check_admission(self, message: str) -> None:
+        """
+        Reject a message up front when its webhook call would be refused anyway.
+
+        Lets callers fail fast before storing anything. Messages answered
+        from the cache are always let through.
+
+        Args:
+            message (str): Raw user message
+
+        Raises:
+            AdmissionRejected: If the circuit is open or the admission queue is full
+        """
+        if self.cache_enabled and self.normalize_question(message) in self.response_cache:
+            return
+        if not self.circuit.allows_calls():
+            self.circuit.short_circuited += 1
+            raise CircuitOpen(self.circuit.status_code, self.circuit.retry_after())
+        if self.admission.saturated():
+            self.admission.rejected_queue_full += 1
+            raise AdmissionRejected('queue_full', self.admission.status_code, self.admission.retry_after)
+
+    def _record_outcome(self, error: Optional[BaseException]) -> None:
+        """
+        Report the outcome of a webhook call to the circuit breaker.
+
+        Args:
+            error (Optional[BaseException]): Error the call ended with, or None on success
+        """
+        if error is None:
+            self.circuit.record_success()
+        elif isinstance(error, AdmissionRejected) or not isinstance(error, Exception):
+            # Rejected locally or cancelled: says nothing about n8n's health
+            self.circuit.release_probe()
+        elif is_upstream_failure(error) or isinstance(error, N8NStreamError):
+            self.circuit.record_failure()
+        else:
+            self.circuit.record_success()
+
+    def _coalesce_key(self, session_id: str, message: str) -> Optional[tuple]:
+        """
+        Build the single-flight key for a message under the configured scope.
+
+        Args:
+            session_id (str): Session identifier
+            message (str): Raw user message
+
+        Returns:
+            Optional[tuple]: Key, or None when coalescing is off
+        """
+        if self.coalesce_scope == 'global':
+            return ('global', self.normalize_question(message))
+        if self.coalesce_scope == 'session':
+            return ('session', session_id, self.normalize_question(message))
+        return None
+
     async def send_message(self, session_id: str, message: str) -> Dict[str, Any]:
-=======
-    def send_message(self, session_id: str, message: str) -> Dict[str, Any]:
->>>>>>> c1f9070ccb7a29111fee9de0911e64545c5cae06
         """
-        Send message to n8n webhook.
+        Send message to n8n webhook, answering from the cache when possible.
         
+        Identical concurrent messages within the coalescing scope share a
+        single webhook call and its result or error.
+
         Args:
             session_id (str): Session identifier
             message (str): Message to send
@@ -45,33 +307,141 @@ class N8NService:
             Dict[str, Any]: Processed response from n8n
             
         Raises:
-<<<<<<< HEAD
-            Exception: If the request fails
+            httpx.HTTPError: If the request fails
+            AdmissionRejected: If n8n is saturated or its circuit is open
+        """
+        cached = self.get_cached_response(message)
+        if cached is not None:
+            return cached
+        key = self._coalesce_key(session_id, message)
+        if key is None:
+            return await self._post_message(session_id, message)
+        return await self.single_flight.do(key, lambda: self._post_message(session_id, message))
+
+    async def _post_message(self, session_id: str, message: str) -> Dict[str, Any]:
+        """
+        Post a message to the webhook through the circuit breaker and cache the answer.
+
+        Args:
+            session_id (str): Session identifier
+            message (str): Message to send
+
+        Returns:
+            Dict[str, Any]: Response from n8n
         """
         try:
-            from httpx import AsyncClient
-            async with AsyncClient() as client:
-                response = await client.post(
-                    self.webhook_url,
-                    json={'sessionId': session_id, 'message': message},
-                    timeout=30.0
-                )
-                response.raise_for_status()
-                return response.json()
+            self.circuit.before_call()
+            try:
+                response_json = await self.retry_policy.run(lambda: self._post_once(session_id, message))
+            except BaseException as e:
+                self._record_outcome(e)
+                raise
+            self._record_outcome(None)
+            self.cache_response(message, response_json)
+            return response_json
         except Exception as e:
-            print(f"Error sending message to n8n: {str(e)}")
+            logger.warning('n8n_call_failed', error=repr(e))
             raise
-=======
-            requests.RequestException: If the request fails
+
+    async def _post_once(self, session_id: str, message: str) -> Dict[str, Any]:
         """
-        response = requests.post(
-            self.webhook_url,
-            json={'sessionId': session_id, 'message': message},
-            timeout=30
-        )
+        Make a single webhook call while holding an admission slot.
+
+        Args:
+            session_id (str): Session identifier
+            message (str): Message to send
+
+        Returns:
+            Dict[str, Any]: Response from n8n
+        """
+        async with self.admission.slot():
+            response = await self.client.post(
+                self.webhook_url,
+                json={'sessionId': session_id, 'message': message}
+            )
         response.raise_for_status()
         return response.json()
->>>>>>> c1f9070ccb7a29111fee9de0911e64545c5cae06
+
+    async def stream_message(self, session_id: str, message: str) -> AsyncIterator[str]:
+        """
+        Send message to n8n and yield the bot response as it arrives.
+
+        Streaming webhooks answer with newline-delimited JSON chunks
+        (``{"type": "item", "content": ...}``); each chunk's content is
+        yielded as soon as it is read. A webhook that answers with a single
+        JSON body instead is parsed once complete and yielded as one piece.
+        Streams go through the circuit breaker but are never retried, since
+        part of the answer may already have been relayed.
+
+        Args:
+            session_id (str): Session identifier
+            message (str): Message to send
+
+        Yields:
+            str: Pieces of the bot response
+
+        Raises:
+            httpx.HTTPError: If the request fails
+            AdmissionRejected: If n8n is saturated or its circuit is open
+        """
+        cached = self.get_cached_response(message)
+        if cached is not None:
+            yield self.extract_bot_message(cached)
+            return
+        self.circuit.before_call()
+        try:
+            async for piece in self._stream_once(session_id, message):
+                yield piece
+        except BaseException as e:
+            self._record_outcome(e)
+            raise
+        self._record_outcome(None)
+
+    async def _stream_once(self, session_id: str, message: str) -> AsyncIterator[str]:
+        """
+        Make a single streaming webhook call and yield the bot response pieces.
+
+        Args:
+            session_id (str): Session identifier
+            message (str): Message to send
+
+        Yields:
+            str: Pieces of the bot response
+        """
+        buffered = []
+        parts = []
+        streamed = False
+        async with self.admission.slot(), self.client.stream(
+            'POST',
+            self.stream_webhook_url,
+            json={'sessionId': session_id, 'message': message}
+        ) as response:
+            response.raise_for_status()
+            async for line in response.aiter_lines():
+                if not line.strip():
+                    continue
+                chunk = None
+                try:
+                    chunk = json.loads(line)
+                except ValueError:
+                    pass
+                if isinstance(chunk, dict) and chunk.get('type') in ('begin', 'item', 'end', 'error'):
+                    streamed = True
+                    if chunk['type'] == 'item' and chunk.get('content'):
+                        parts.append(chunk['content'])
+                        yield chunk['content']
+                    elif chunk['type'] == 'error':
+                        raise N8NStreamError(chunk.get('content') or 'n8n streaming error')
+                else:
+                    buffered.append(line)
+        if streamed:
+            self.cache_response(message, {'response': ''.join(parts)})
+        elif buffered:
+            response_json = json.loads('\n'.join(buffered))
+            bot_message = self.extract_bot_message(response_json)
+            if bot_message:
+                self.cache_response(message, response_json)
+                yield bot_message
 
     def extract_bot_message(self, response_json: dict) -> Optional[str]:
         """
@@ -92,3 +462,4 @@ class N8NService:
 
 # Initialize n8n service
 n8n_service = N8NService()
+n8n_service.register_metrics(REGISTRY)
@@ -0,0 +1,97 @@
+"""
+Pagination module for chat application.
+Encodes and decodes opaque keyset cursors used by the history endpoints.
+"""
+
+import base64
+import json
+from typing import Any, Optional, Tuple
+
+Cursor = Tuple[str, Optional[Any]]
+
+def encode_cursor(sort_value: Any, tiebreak: Any = None) -> str:
+    """
+    Encode a row position as an opaque cursor.
+
+    Args:
+        sort_value (Any): Value of the sort column, e.g. a timestamp
+        tiebreak (Any): Unique column value used to order rows with equal sort values
+
+    Returns:
+        str: URL-safe cursor string
+    """
+    if hasattr(sort_value, 'isoformat'):
+        sort_value = sort_value.isoformat()
+    raw = json.dumps([str(sort_value), tiebreak], separators=(',', ':'))
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip('=')
+
+def decode_cursor(cursor: str) -> Cursor:
+    """
+    Decode a cursor produced by encode_cursor.
+
+    Args:
+        cursor (str): Cursor string
+
+    Returns:
+        Cursor: Sort value and tiebreak value
+
+    Raises:
+        ValueError: If the cursor is malformed
+    """
+    try:
+        padded = cursor + '=' * (-len(cursor) % 4)
+        sort_value, tiebreak = json.loads(base64.urlsafe_b64decode(padded.encode()))
+    except Exception as e:
+        raise ValueError(f"Invalid cursor: {cursor}") from e
+    # Row IDs are ints or strings (UUIDs); anything else was not made by encode_cursor
+    if not isinstance(sort_value, (str, int, float)) or isinstance(sort_value, bool) or (
+        tiebreak is not None and (not isinstance(tiebreak, (str, int)) or isinstance(tiebreak, bool))
+    ):
+        raise ValueError(f"Invalid cursor: {cursor}")
+    return str(sort_value), tiebreak
+
+def is_backward(limit: Optional[int], before: Optional[Cursor], after: Optional[Cursor], since: Optional[str]) -> bool:
+    """
+    Whether a page is read newest-first.
+
+    Reading before a cursor, or taking only a limit, pages backwards from
+    the newest rows; after/since page forwards.
+
+    Returns:
+        bool: True for backward pages
+    """
+    return before is not None or (limit is not None and after is None and since is None)
+
+def quote_value(value: Any) -> str:
+    """
+    Quote a value for a PostgREST filter expression.
+
+    Double quotes keep commas, dots and parentheses in the value from being
+    read as filter syntax; backslashes and quotes inside it are escaped.
+
+    Args:
+        value (Any): Filter value
+
+    Returns:
+        str: Quoted value
+    """
+    return '"' + str(value).replace('\\', '\\\\').replace('"', '\\"') + '"'
+
+def keyset_filter(column: str, tiebreak_column: str, cursor: Cursor, op: str) -> str:
+    """
+    Build a PostgREST ``or`` filter selecting rows strictly past a cursor.
+
+    Args:
+        column (str): Sort column
+        tiebreak_column (str): Unique tiebreak column
+        cursor (Cursor): Decoded cursor
+        op (str): ``gt`` for rows after the cursor, ``lt`` for rows before it
+
+    Returns:
+        str: Value for the ``or`` query parameter
+    """
+    sort_value, tiebreak = cursor
+    quoted = quote_value(sort_value)
+    if tiebreak is None:
+        return f"({column}.{op}.{quoted})"
+    return f"({column}.{op}.{quoted},and({column}.eq.{quoted},{tiebreak_column}.{op}.{quote_value(tiebreak)}))"
@@ -0,0 +1,269 @@
+"""
+Profiling module for chat application.
+Opt-in sampling profiler for individual requests, with stored profiles for download.
+"""
+
+import asyncio
+import os
+import random
+import sys
+import threading
+import time
+import uuid
+from collections import Counter as StackCounter, OrderedDict
+from datetime import datetime, timezone
+from typing import Any, Dict, List, Optional
+
+from .log import get_logger
+
+logger = get_logger(__name__)
+
+class SamplingProfiler:
+    """
+    Wall-clock stack sampler.
+
+    A background thread snapshots the stack of every other thread each
+    ``interval`` seconds and counts identical stacks. Sampling all threads
+    covers both the event loop and the storage worker threads; while the
+    loop is idle its samples end in the selector wait, which shows time
+    spent awaiting I/O.
+    """
+
+    def __init__(self, interval: float = 0.005, max_depth: int = 64):
+        """
+        Initialize the profiler.
+
+        Args:
+            interval (float): Seconds between samples
+            max_depth (int): Deepest stack frames kept per sample
+        """
+        self.interval = interval
+        self.max_depth = max_depth
+        self.stacks: StackCounter = StackCounter()
+        self.samples = 0
+        self.started = 0.0
+        self.duration = 0.0
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def start(self) -> None:
+        """Start sampling in a daemon thread."""
+        self.started = time.perf_counter()
+        self._thread = threading.Thread(target=self._run, name='request-profiler', daemon=True)
+        self._thread.start()
+
+    def stop(self) -> None:
+        """Stop sampling and wait for the sampler thread."""
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+        self.duration = time.perf_counter() - self.started
+
+    def _run(self) -> None:
+        own = threading.get_ident()
+        names = {}
+        while not self._stop.wait(self.interval):
+            for thread in threading.enumerate():
+                names[thread.ident] = thread.name
+            for ident, frame in sys._current_frames().items():
+                if ident == own:
+                    continue
+                self.stacks[self._fold(names.get(ident, str(ident)), frame)] += 1
+            self.samples += 1
+
+    def _fold(self, thread_name: str, frame) -> str:
+        """Render a stack root-first in the collapsed ``a;b;c`` format."""
+        parts = []
+        while frame is not None and len(parts) < self.max_depth:
+            code = frame.f_code
+            parts.append(f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})")
+            frame = frame.f_back
+        parts.append(thread_name)
+        return ';'.join(reversed(parts))
+
+    def folded(self) -> str:
+        """
+        Collapsed stacks, one ``stack count`` line each, most frequent first.
+
+        The output loads directly into flamegraph.pl, speedscope and similar tools.
+
+        Returns:
+            str: Collapsed stack text
+        """
+        return ''.join(f"{stack} {count}\n" for stack, count in self.stacks.most_common())
+
+class ProfileStore:
+    """
+    Keeps recent request profiles for download.
+
+    The newest ``max_profiles`` profiles are kept in memory; when
+    ``directory`` is set they are also written there so every worker can
+    serve them. Profiles are saved from executor threads, so the in-memory
+    index is guarded by a lock.
+    """
+
+    def __init__(self, max_profiles: int = 50, directory: Optional[str] = None):
+        """
+        Initialize the store.
+
+        Args:
+            max_profiles (int): Profiles kept in memory
+            directory (Optional[str]): Directory to also write profiles to
+        """
+        self.max_profiles = max_profiles
+        self.profiles: "OrderedDict[str, Dict[str, Any]]" = OrderedDict()
+        self.directory = directory
+        self._lock = threading.Lock()
+
+    def save(self, profiler: SamplingProfiler, method: str, path: str, status: Optional[int],
+             profile_id: Optional[str] = None) -> str:
+        """
+        Store a finished profile.
+
+        Args:
+            profiler (SamplingProfiler): Stopped profiler
+            method (str): Request method
+            path (str): Request path
+            status (Optional[int]): Response status, if one was sent
+            profile_id (Optional[str]): Identifier already handed to the client
+
+        Returns:
+            str: Profile identifier
+        """
+        profile_id = profile_id or uuid.uuid4().hex
+        profile = {
+            'id': profile_id,
+            'method': method,
+            'path': path,
+            'status': status,
+            'created_at': datetime.now(timezone.utc).isoformat(),
+            'duration_ms': round(profiler.duration * 1000, 1),
+            'samples': profiler.samples,
+            'folded': profiler.folded(),
+        }
+        with self._lock:
+            self.profiles[profile_id] = profile
+            while len(self.profiles) > self.max_profiles:
+                self.profiles.popitem(last=False)
+        if self.directory:
+            try:
+                os.makedirs(self.directory, exist_ok=True)
+                with open(os.path.join(self.directory, f"{profile_id}.folded"), 'w') as f:
+                    f.write(profile['folded'])
+            except OSError as e:
+                logger.warning('profile_write_failed', profile_id=profile_id, error=repr(e))
+        return profile_id
+
+    def get(self, profile_id: str) -> Optional[str]:
+        """
+        Get a profile's collapsed stacks.
+
+        Args:
+            profile_id (str): Profile identifier
+
+        Returns:
+            Optional[str]: Collapsed stack text, or None if unknown
+        """
+        profile = self.profiles.get(profile_id)
+        if profile is not None:
+            return profile['folded']
+        if self.directory and profile_id.isalnum():
+            try:
+                with open(os.path.join(self.directory, f"{profile_id}.folded")) as f:
+                    return f.read()
+            except OSError:
+                return None
+        return None
+
+    def list(self) -> List[Dict[str, Any]]:
+        """
+        Describe the profiles held in memory, newest first.
+
+        Returns:
+            List[Dict[str, Any]]: Profile metadata without the stacks
+        """
+        with self._lock:
+            profiles = list(self.profiles.values())
+        return [{k: v for k, v in p.items() if k != 'folded'} for p in reversed(profiles)]
+
+class ProfilingMiddleware:
+    """
+    ASGI middleware that profiles selected HTTP requests.
+
+    A request is profiled when it sends ``X-Profile: 1`` with an
+    ``X-Admin-Token`` matching ADMIN_TOKEN (the header is ignored while no
+    token is configured) or is picked by the PROFILE_SAMPLE_RATE fraction.
+    The response then carries an ``X-Profile-Id`` header naming the stored
+    profile. Other requests only pay for a header scan and, with sampling
+    on, one random draw. Joining the sampler thread and storing the
+    profile run on an executor thread, off the event loop.
+    """
+
+    def __init__(self, app, store: ProfileStore, sample_rate: float = 0.0, interval: float = 0.005,
+                 max_concurrent: int = 2):
+        """
+        Initialize the middleware.
+
+        Args:
+            app: Wrapped ASGI application
+            store (ProfileStore): Where finished profiles go
+            sample_rate (float): Fraction of requests profiled without being asked
+            interval (float): Seconds between stack samples
+            max_concurrent (int): Profiles allowed to run at once; extra requests run unprofiled
+        """
+        self.app = app
+        self.store = store
+        self.sample_rate = sample_rate
+        self.interval = interval
+        self.max_concurrent = max_concurrent
+        self.active = 0
+
+    def _requested(self, scope) -> bool:
+        headers = dict(scope.get('headers') or ())
+        if headers.get(b'x-profile') not in (b'1', b'true'):
+            return False
+        admin_token = os.getenv('ADMIN_TOKEN')
+        return bool(admin_token) and headers.get(b'x-admin-token') == admin_token.encode()
+
+    async def __call__(self, scope, receive, send):
+        if scope['type'] != 'http' or self.active >= self.max_concurrent:
+            await self.app(scope, receive, send)
+            return
+        if not (self._requested(scope) or (self.sample_rate and random.random() < self.sample_rate)):
+            await self.app(scope, receive, send)
+            return
+
+        profiler = SamplingProfiler(self.interval)
+        profile_id = uuid.uuid4().hex
+        status = None
+        self.active += 1
+        profiler.start()
+
+        async def send_with_id(message):
+            nonlocal status
+            if message['type'] == 'http.response.start':
+                status = message['status']
+                message = {**message, 'headers': list(message.get('headers', [])) + [(b'x-profile-id', profile_id.encode())]}
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_id)
+        finally:
+            try:
+                await asyncio.get_running_loop().run_in_executor(
+                    None, self._finish, profiler, scope.get('method', ''), scope.get('path', ''), status, profile_id
+                )
+            finally:
+                self.active -= 1
+
+    def _finish(self, profiler: SamplingProfiler, method: str, path: str, status: Optional[int],
+                profile_id: str) -> None:
+        """Stop the sampler and store its profile. Runs on an executor thread."""
+        profiler.stop()
+        self.store.save(profiler, method, path, status, profile_id)
+
+# Process-wide profile store
+profile_store = ProfileStore(
+    max_profiles=int(os.getenv('PROFILE_MAX_STORED', '50')),
+    directory=os.getenv('PROFILE_DIR') or None
+)
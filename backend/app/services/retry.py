@@ -0,0 +1,129 @@
+"""
+Retry module for chat application.
+Retries upstream calls that failed before reaching the upstream, with jittered backoff.
+"""
+
+import asyncio
+import random
+from typing import Any, Awaitable, Callable, Dict
+
+import httpx
+
+from .log import get_logger
+
+logger = get_logger(__name__)
+
+# Failures raised before the request was sent, so sending it again cannot
+# run the LLM workflow twice. No HTTP status qualifies: a 502 or 504 from a
+# proxy can arrive while n8n is still running the workflow, and a 503 does
+# not say whether the request was dispatched.
+RETRYABLE_EXCEPTIONS = (httpx.ConnectError, httpx.ConnectTimeout, httpx.PoolTimeout)
+
+def is_retryable(exc: BaseException) -> bool:
+    """
+    Whether a failed webhook call is safe to send again.
+
+    Only failures to connect or to get a pooled connection qualify; HTTP
+    error answers, read timeouts and other errors do not, since n8n may
+    still be working on the first request.
+
+    Args:
+        exc (BaseException): Error raised by the call
+
+    Returns:
+        bool: True if the call can be retried
+    """
+    return isinstance(exc, RETRYABLE_EXCEPTIONS)
+
+def is_upstream_failure(exc: BaseException) -> bool:
+    """
+    Whether an error says the upstream is unhealthy.
+
+    Transport errors and 5xx answers count; 4xx answers mean n8n is up
+    and rejected the request itself.
+
+    Args:
+        exc (BaseException): Error raised by the call
+
+    Returns:
+        bool: True if the error should count against the circuit breaker
+    """
+    if isinstance(exc, httpx.HTTPStatusError):
+        return exc.response.status_code >= 500
+    return isinstance(exc, httpx.TransportError)
+
+class RetryPolicy:
+    """
+    Bounded retries with exponential backoff and full jitter.
+
+    Attempt ``n`` (starting at 0) that fails with a retryable error sleeps
+    a random time between 0 and ``min(max_delay, base_delay * 2 ** n)``
+    before trying again, up to ``max_attempts`` attempts in total.
+    """
+
+    def __init__(self, max_attempts: int = 3, base_delay: float = 0.2, max_delay: float = 2.0):
+        """
+        Initialize the policy.
+
+        Args:
+            max_attempts (int): Total attempts including the first; 1 disables retries
+            base_delay (float): Backoff ceiling after the first failure, in seconds
+            max_delay (float): Upper bound on any single backoff, in seconds
+        """
+        self.max_attempts = max(1, max_attempts)
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.retries = 0
+        self.exhausted = 0
+
+    def backoff(self, attempt: int) -> float:
+        """
+        Jittered delay after a failed attempt.
+
+        Args:
+            attempt (int): Zero-based number of the failed attempt
+
+        Returns:
+            float: Seconds to wait
+        """
+        return random.uniform(0, min(self.max_delay, self.base_delay * (2 ** attempt)))
+
+    async def run(self, fn: Callable[[], Awaitable[Any]]) -> Any:
+        """
+        Call ``fn`` until it succeeds, fails permanently or attempts run out.
+
+        Args:
+            fn (Callable[[], Awaitable[Any]]): Zero-argument coroutine factory
+
+        Returns:
+            Any: Result of the first successful attempt
+
+        Raises:
+            Exception: The last error when it is not retryable or attempts run out
+        """
+        for attempt in range(self.max_attempts):
+            try:
+                return await fn()
+            except Exception as e:
+                if not is_retryable(e):
+                    raise
+                if attempt + 1 >= self.max_attempts:
+                    self.exhausted += 1
+                    raise
+                self.retries += 1
+                delay = self.backoff(attempt)
+                logger.info('n8n_retry', attempt=attempt + 1, delay=round(delay, 3), error=repr(e))
+                await asyncio.sleep(delay)
+
+    def stats(self) -> Dict[str, Any]:
+        """
+        Snapshot of retry counters.
+
+        Returns:
+            Dict[str, Any]: Retries performed and calls that ran out of attempts
+        """
+        return {
+            'max_attempts': self.max_attempts,
+            'retries': self.retries,
+            'exhausted': self.exhausted,
+        }
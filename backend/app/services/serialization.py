@@ -0,0 +1,97 @@
+"""
+Serialization module for chat application.
+Fast JSON encoding for history responses, with streaming for very large pages.
+"""
+
+import asyncio
+import json
+from datetime import date, datetime
+from typing import Any, AsyncIterator, Dict, Iterable, List
+
+from fastapi.responses import Response
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover - exercised only without the optional package
+    orjson = None
+
+def _default(value: Any) -> Any:
+    if isinstance(value, (datetime, date)):
+        return value.isoformat()
+    if hasattr(value, 'dict'):
+        return value.dict()
+    raise TypeError(f"Object of type {type(value).__name__} is not JSON serializable")
+
+def dumps(content: Any) -> bytes:
+    """
+    Encode a value as compact UTF-8 JSON.
+
+    Uses orjson when installed, which encodes datetimes natively and is
+    several times faster than the standard library; falls back to ``json``
+    with the same output for the types the API returns.
+
+    Args:
+        content (Any): Dicts, lists, strings, numbers, datetimes or pydantic models
+
+    Returns:
+        bytes: JSON document
+    """
+    if orjson is not None:
+        return orjson.dumps(content, default=_default)
+    return json.dumps(content, default=_default, ensure_ascii=False, separators=(',', ':')).encode('utf-8')
+
+class FastJSONResponse(Response):
+    """
+    JSON response encoded in one pass with ``dumps``.
+
+    Unlike JSONResponse it needs no ``jsonable_encoder`` pre-pass, because
+    datetimes and models are handled by the encoder itself.
+    """
+
+    media_type = "application/json"
+
+    def render(self, content: Any) -> bytes:
+        return dumps(content)
+
+async def stream_json_object(head: Dict[str, Any], key: str, items: List[Any], chunk_size: int = 500) -> AsyncIterator[bytes]:
+    """
+    Encode ``{**head, key: items}`` as a stream of JSON chunks.
+
+    Items are encoded ``chunk_size`` at a time and the generator yields to
+    the event loop between chunks, so a very large history neither holds
+    one huge buffer nor blocks other requests while it is encoded.
+
+    Args:
+        head (Dict[str, Any]): Fields written before the array
+        key (str): Name of the array field
+        items (List[Any]): Array elements
+        chunk_size (int): Elements encoded per chunk
+
+    Yields:
+        bytes: Consecutive pieces of the JSON document
+    """
+    opening = dumps(head)
+    opening = opening[:-1] + (b',' if head else b'') + dumps(key) + b':['
+    yield opening
+    for start in range(0, len(items), chunk_size):
+        body = dumps(items[start:start + chunk_size])[1:-1]
+        yield body if start == 0 else b',' + body
+        await asyncio.sleep(0)
+    yield b']}'
+
+def project(rows: Iterable[Dict[str, Any]], fields: Iterable[str]) -> List[Dict[str, Any]]:
+    """
+    Keep only the given fields of each row, in order.
+
+    Used instead of a model round trip for rows the database already
+    validated; missing fields become None like optional model fields.
+
+    Args:
+        rows (Iterable[Dict[str, Any]]): Database rows
+        fields (Iterable[str]): Field names to keep
+
+    Returns:
+        List[Dict[str, Any]]: Projected rows
+    """
+    fields = tuple(fields)
+    return [{f: row.get(f) for f in fields} for row in rows]
@@ -0,0 +1,91 @@
+"""
+Streaming module for chat application.
+Runs a chat turn against n8n while relaying partial bot output to the caller.
+"""
+
+import json
+from typing import Any, AsyncIterator, Dict
+
+from .database import DatabaseService
+from .n8n import N8NService
+from .chat import ERROR_MESSAGE, save_apology
+from .admission import AdmissionRejected
+from .faq import faq_service
+from .metrics import CHAT_STAGE_SECONDS, CHAT_TURN_ERRORS, StageTimer
+from .log import get_logger
+
+logger = get_logger(__name__)
+
+async def stream_chat_turn(
+    db: DatabaseService,
+    n8n: N8NService,
+    session_id: str,
+    message: str
+) -> AsyncIterator[Dict[str, Any]]:
+    """
+    Run one streamed chat turn and yield events as they happen.
+
+    The FAQ is consulted first; on a miss n8n admission is checked before
+    anything is stored, as in ``run_chat_turn``. The user message is then
+    stored, each piece of bot output is yielded as a ``token`` event (a
+    confident FAQ answer is one piece, without calling n8n), and only the
+    fully assembled reply is stored once the stream completes. Failures
+    yield an ``error`` event instead of raising so the transport can close
+    cleanly; a busy n8n adds ``retryAfter`` and stores no apology.
+
+    Args:
+        db (DatabaseService): Storage service
+        n8n (N8NService): n8n service
+        session_id (str): Session identifier
+        message (str): Message from the user
+
+    Yields:
+        Dict[str, Any]: ``token``, ``done`` or ``error`` events
+    """
+    parts = []
+    stages = StageTimer(CHAT_STAGE_SECONDS)
+    try:
+        stages.enter('faq')
+        faq_answer = await faq_service.answer(message)
+        if faq_answer is None:
+            n8n.check_admission(message)
+        stages.enter('session_lookup')
+        await db.get_or_create_session(session_id)
+        stages.enter('save_user')
+        await db.save_message(session_id, 'user', message)
+        if faq_answer is not None:
+            parts.append(faq_answer['response'])
+            yield {'type': 'token', 'delta': faq_answer['response']}
+        else:
+            stages.enter('n8n_stream')
+            async for delta in n8n.stream_message(session_id, message):
+                parts.append(delta)
+                yield {'type': 'token', 'delta': delta}
+        bot_message = ''.join(parts)
+        if bot_message:
+            stages.enter('save_bot')
+            await db.save_message(session_id, 'bot', bot_message)
+        stages.finish()
+        yield {'type': 'done', 'response': bot_message}
+    except Exception as e:
+        CHAT_TURN_ERRORS.labels(stages.current).inc()
+        logger.warning('stream_turn_failed', stage=stages.current, error=repr(e))
+        stages.finish()
+        event = {'type': 'error', 'detail': ERROR_MESSAGE}
+        if isinstance(e, AdmissionRejected):
+            event['retryAfter'] = e.retry_after
+        else:
+            await save_apology(db, session_id)
+        yield event
+
+def format_sse(event: Dict[str, Any]) -> str:
+    """
+    Encode an event as a Server-Sent Events frame.
+
+    Args:
+        event (Dict[str, Any]): Event with a ``type`` key
+
+    Returns:
+        str: SSE frame using the event type as the SSE event name
+    """
+    return f"event: {event['type']}\ndata: {json.dumps(event)}\n\n"
@@ -0,0 +1,182 @@
+"""
+Sweeper module for chat application.
+Background task that ends idle sessions in batches.
+"""
+
+import asyncio
+import os
+import time
+from datetime import datetime, timedelta, timezone
+from typing import Any, Dict, Optional
+
+from .database import DatabaseService
+from .metrics import MetricsRegistry
+from .log import get_logger
+
+logger = get_logger(__name__)
+
+# PostgREST error codes for a table or view that does not exist
+MISSING_RELATION_CODES = ('42P01', 'PGRST205')
+
+class SessionSweeper:
+    """
+    Periodically ends sessions nobody is using.
+
+    Each run pages through open sessions idle for longer than
+    ``idle_timeout`` and ends each page with a single update. Idleness
+    is judged only by the persisted ``last_activity``, which every node
+    sees the same way; an open socket on some node does not keep a
+    session alive. At most ``max_batches`` pages are ended per run so one
+    run cannot hog the storage pool; leftovers are picked up by the next
+    run.
+
+    ``connections`` is the WebSocket manager: anything with an async
+    ``end_sessions(ids)`` that closes the sessions' sockets on every
+    node. Silent sockets are closed by the manager's own heartbeat.
+    """
+
+    def __init__(self, db: DatabaseService, connections: Any, interval: float = 0.0,
+                 idle_timeout: float = 1800.0,
+                 batch_size: int = 200, max_batches: int = 10):
+        """
+        Initialize the sweeper.
+
+        Args:
+            db (DatabaseService): Storage holding the sessions
+            connections: Local WebSocket manager
+            interval (float): Seconds between runs; 0 disables the background loop
+            idle_timeout (float): Seconds without activity before a session is ended
+            batch_size (int): Sessions ended per update
+            max_batches (int): Updates per run
+        """
+        self.db = db
+        self.connections = connections
+        self.interval = interval
+        self.idle_timeout = idle_timeout
+        self.batch_size = batch_size
+        self.max_batches = max_batches
+        self.runs = 0
+        self.failures = 0
+        self.sessions_ended = 0
+        self.sockets_closed = 0
+        self.last_duration = 0.0
+        self.lag = 0.0
+        self.backlog = False
+        self._task: Optional[asyncio.Task] = None
+
+    def start(self) -> None:
+        """Start the background loop."""
+        if self._task is None and self.interval > 0:
+            self._task = asyncio.get_running_loop().create_task(self._loop())
+
+    async def stop(self) -> None:
+        """Stop the background loop, letting a run in progress be cancelled."""
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    async def _loop(self) -> None:
+        due = time.monotonic() + self.interval
+        while True:
+            await asyncio.sleep(max(0.0, due - time.monotonic()))
+            # How late this run starts, e.g. because the event loop was busy
+            self.lag = max(0.0, time.monotonic() - due)
+            try:
+                await self.run_once()
+            except Exception as e:
+                self.failures += 1
+                if getattr(e, 'code', None) in MISSING_RELATION_CODES:
+                    # Retrying cannot help until the view is created
+                    logger.error('session_sweep_stopped', error=str(e),
+                                 hint='apply backend/sql/chat_session_summaries.sql')
+                    return
+                logger.exception('session_sweep_failed')
+            due = max(due + self.interval, time.monotonic())
+
+    async def run_once(self) -> Dict[str, int]:
+        """
+        Run one sweep.
+
+        Returns:
+            Dict[str, int]: Sockets closed on this node and sessions ended by this run
+        """
+        started = time.monotonic()
+        closed = 0
+        idle_before = (datetime.now(timezone.utc) - timedelta(seconds=self.idle_timeout)).isoformat()
+
+        ended = 0
+        cursor = None
+        self.backlog = False
+        for _ in range(self.max_batches):
+            rows = await self.db.find_idle_sessions(idle_before, self.batch_size, cursor)
+            if not rows:
+                break
+            cursor = (str(rows[-1]['last_activity']), rows[-1]['session_id'])
+            ended_ids = await self.db.end_sessions([row['session_id'] for row in rows])
+            closed += await self.connections.end_sessions(ended_ids)
+            ended += len(ended_ids)
+            if len(rows) < self.batch_size:
+                break
+        else:
+            self.backlog = True
+
+        self.runs += 1
+        self.sessions_ended += ended
+        self.sockets_closed += closed
+        self.last_duration = time.monotonic() - started
+        if ended or closed:
+            logger.info('session_sweep', sessions_ended=ended, sockets_closed=closed,
+                        duration_ms=round(self.last_duration * 1000, 1), backlog=self.backlog)
+        return {'sessions_ended': ended, 'sockets_closed': closed}
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            'runs': self.runs,
+            'failures': self.failures,
+            'sessions_ended': self.sessions_ended,
+            'sockets_closed': self.sockets_closed,
+            'last_duration_s': round(self.last_duration, 4),
+            'lag_s': round(self.lag, 4),
+            'backlog': self.backlog,
+        }
+
+    def register_metrics(self, registry: MetricsRegistry) -> None:
+        """
+        Expose sweep throughput and lag as metrics.
+
+        Args:
+            registry (MetricsRegistry): Registry to add the metrics to
+        """
+        registry.callback('counter', 'session_sweeper_runs_total', 'Completed sweeper runs', lambda: self.runs)
+        registry.callback('counter', 'session_sweeper_failures_total', 'Sweeper runs that raised', lambda: self.failures)
+        registry.callback('counter', 'session_sweeper_sessions_ended_total', 'Idle sessions ended by the sweeper',
+                          lambda: self.sessions_ended)
+        registry.callback('counter', 'session_sweeper_sockets_closed_total', 'WebSockets of ended sessions closed by the sweeper',
+                          lambda: self.sockets_closed)
+        registry.callback('gauge', 'session_sweeper_last_duration_seconds', 'Duration of the last sweeper run',
+                          lambda: self.last_duration)
+        registry.callback('gauge', 'session_sweeper_lag_seconds', 'How late the last sweeper run started',
+                          lambda: self.lag)
+        registry.callback('gauge', 'session_sweeper_backlog', '1 if the last run hit its batch limit with idle sessions left',
+                          lambda: int(self.backlog))
+
+def create_session_sweeper(db: DatabaseService, connections: Any) -> SessionSweeper:
+    """
+    Build a sweeper configured from the environment.
+
+    SESSION_SWEEP_INTERVAL (0, the default, disables the sweeper; it needs
+    the view in ``sql/chat_session_summaries.sql``), SESSION_IDLE_TIMEOUT,
+    SESSION_SWEEP_BATCH_SIZE and SESSION_SWEEP_MAX_BATCHES.
+    """
+    return SessionSweeper(
+        db,
+        connections,
+        interval=float(os.getenv('SESSION_SWEEP_INTERVAL', '0')),
+        idle_timeout=float(os.getenv('SESSION_IDLE_TIMEOUT', '1800')),
+        batch_size=int(os.getenv('SESSION_SWEEP_BATCH_SIZE', '200')),
+        max_batches=int(os.getenv('SESSION_SWEEP_MAX_BATCHES', '10'))
+    )
@@ -0,0 +1,210 @@
+"""
+Write-behind module for chat application.
+Buffers rows in memory and persists them in batches from a background task.
+"""
+
+import asyncio
+from collections import defaultdict, deque
+from typing import Any, Awaitable, Callable, Deque, Dict, List, Optional, Tuple
+
+from .log import get_logger
+
+logger = get_logger(__name__)
+
+class WriteBehindBuffer:
+    """
+    Bounded write-behind buffer with a background flusher.
+
+    Rows are queued by ``put`` and bulk-written by ``flush_fn`` once
+    ``batch_size`` rows are waiting or ``flush_interval`` seconds have
+    passed. The queue is bounded, so producers wait when the database
+    falls behind instead of growing memory without limit. Rows stay
+    visible through ``pending_for`` until they have been written.
+
+    A failing write is retried with exponential backoff. A batch that
+    still fails is held back and retried ahead of newer rows on later
+    flushes, up to ``max_requeues`` times and ``max_pending`` held rows;
+    only then are its rows dropped, with an error logged.
+    """
+
+    def __init__(
+        self,
+        flush_fn: Callable[[List[Dict[str, Any]]], Awaitable[Any]],
+        batch_size: int = 50,
+        flush_interval: float = 0.5,
+        max_pending: int = 10000,
+        max_retries: int = 3,
+        retry_backoff: float = 0.1,
+        max_backoff: float = 2.0,
+        max_requeues: int = 5,
+        key: str = 'session_id'
+    ):
+        """
+        Initialize the buffer.
+
+        Args:
+            flush_fn (Callable): Coroutine function that writes a batch of rows
+            batch_size (int): Maximum rows per write
+            flush_interval (float): Maximum seconds a row waits before a flush
+            max_pending (int): Maximum queued rows before producers wait
+            max_retries (int): Attempts per flush before the batch is held back
+            retry_backoff (float): Seconds before the first retry, doubled per attempt
+            max_backoff (float): Longest wait between attempts
+            max_requeues (int): Flushes a held-back batch is retried on before its rows are dropped
+            key (str): Row field used to group pending rows for reads
+        """
+        self.flush_fn = flush_fn
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.max_pending = max_pending
+        self.max_retries = max_retries
+        self.retry_backoff = retry_backoff
+        self.max_backoff = max_backoff
+        self.max_requeues = max_requeues
+        self.key = key
+        self._queue: Optional[asyncio.Queue] = None
+        self._wakeup: Optional[asyncio.Event] = None
+        self._task: Optional[asyncio.Task] = None
+        self._stopping = False
+        self._pending: Dict[Any, List[Dict[str, Any]]] = defaultdict(list)
+        # Failed batches awaiting another flush, with how often they were requeued
+        self._held: Deque[Tuple[List[Dict[str, Any]], int]] = deque()
+        self._held_rows = 0
+        self.flushed_rows = 0
+        self.flushed_batches = 0
+        self.failed_batches = 0
+        self.requeued_batches = 0
+        self.dropped_rows = 0
+
+    def start(self) -> None:
+        """Start the background flusher on the running event loop."""
+        if self._task is not None and not self._task.done():
+            return
+        self._queue = asyncio.Queue(maxsize=self.max_pending)
+        self._wakeup = asyncio.Event()
+        self._stopping = False
+        self._task = asyncio.get_running_loop().create_task(self._run())
+
+    async def stop(self) -> None:
+        """Stop the flusher after writing every queued row."""
+        if self._task is None:
+            return
+        self._stopping = True
+        self._wakeup.set()
+        await self._task
+        self._task = None
+
+    async def put(self, row: Dict[str, Any]) -> None:
+        """
+        Queue a row for writing, waiting if the buffer is full.
+
+        Args:
+            row (Dict[str, Any]): Row to persist
+        """
+        if self._task is None or self._task.done():
+            self.start()
+        self._pending[row.get(self.key)].append(row)
+        await self._queue.put(row)
+        if self._queue.qsize() >= self.batch_size:
+            self._wakeup.set()
+
+    def pending_for(self, key_value: Any) -> List[Dict[str, Any]]:
+        """
+        Get rows for a key that have not been written yet.
+
+        Args:
+            key_value (Any): Value of the grouping field, e.g. a session ID
+
+        Returns:
+            List[Dict[str, Any]]: Unwritten rows in insertion order
+        """
+        return list(self._pending.get(key_value, ()))
+
+    @property
+    def pending_count(self) -> int:
+        """Number of rows queued or being written."""
+        return sum(len(rows) for rows in self._pending.values())
+
+    async def _run(self) -> None:
+        """Flusher loop: wait for a full batch or the interval, then drain."""
+        while True:
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout=self.flush_interval)
+            except asyncio.TimeoutError:
+                pass
+            self._wakeup.clear()
+            await self._drain()
+            if self._stopping and self._queue.empty() and not self._held:
+                return
+
+    async def _drain(self) -> None:
+        """Retry held-back batches, then write everything queued in batches of batch_size."""
+        for _ in range(len(self._held)):
+            batch, requeues = self._held.popleft()
+            self._held_rows -= len(batch)
+            await self._write(batch, requeues)
+        while not self._queue.empty():
+            batch = []
+            while len(batch) < self.batch_size and not self._queue.empty():
+                batch.append(self._queue.get_nowait())
+            await self._write(batch)
+
+    def _backoff(self, attempt: int) -> float:
+        return min(self.max_backoff, self.retry_backoff * 2 ** (attempt - 1))
+
+    async def _write(self, batch: List[Dict[str, Any]], requeues: int = 0) -> None:
+        """
+        Write one batch, retrying with backoff before holding it back.
+
+        Args:
+            batch (List[Dict[str, Any]]): Rows to write
+            requeues (int): Times the batch has already been held back
+        """
+        error: Optional[Exception] = None
+        for attempt in range(1, self.max_retries + 1):
+            if attempt > 1:
+                # Keep growing across requeues so a long outage is not hammered
+                await asyncio.sleep(self._backoff(requeues * self.max_retries + attempt - 1))
+            try:
+                await self.flush_fn(batch)
+                self.flushed_rows += len(batch)
+                self.flushed_batches += 1
+                error = None
+                break
+            except Exception as e:
+                error = e
+                self.failed_batches += 1
+                logger.warning('write_behind_flush_failed', attempt=attempt, max_retries=self.max_retries,
+                               requeues=requeues, rows=len(batch), error=repr(e))
+        if error is not None:
+            if requeues < self.max_requeues and self._held_rows + len(batch) <= self.max_pending:
+                # Rows stay in _pending, so reads keep seeing them while held
+                self._held.append((batch, requeues + 1))
+                self._held_rows += len(batch)
+                self.requeued_batches += 1
+                return
+            self.dropped_rows += len(batch)
+            logger.error('write_behind_rows_dropped', rows=len(batch), requeues=requeues, error=repr(error))
+        for row in batch:
+            rows = self._pending.get(row.get(self.key))
+            if rows is not None:
+                rows.remove(row)
+                if not rows:
+                    del self._pending[row.get(self.key)]
+
+    def stats(self) -> Dict[str, Any]:
+        """
+        Snapshot of buffer counters.
+
+        Returns:
+            Dict[str, Any]: Pending, held, flushed, failed and dropped counts
+        """
+        return {
+            'pending': self.pending_count,
+            'held_rows': self._held_rows,
+            'flushed_rows': self.flushed_rows,
+            'flushed_batches': self.flushed_batches,
+            'failed_batches': self.failed_batches,
+            'requeued_batches': self.requeued_batches,
+            'dropped_rows': self.dropped_rows,
+        }
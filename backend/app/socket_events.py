@@ -3,96 +3,553 @@ WebSocket events module for chat application.
 Handles real-time communication features like typing indicators and live updates.
 """
 
+import asyncio
+import os
+import time
+from collections import deque
 from fastapi import WebSocket, WebSocketDisconnect
-from typing import Dict, Set
+from starlette.websockets import WebSocketState
+from typing import Deque, Dict, Iterable, List, Optional, Set
 from datetime import datetime
 
+from .services.database import db_service
+from .services.n8n import n8n_service
+from .services.chat import run_chat_turn, ChatTurnError, ERROR_MESSAGE
+from .services.admission import AdmissionRejected
+from .services.streaming import stream_chat_turn
+from .services.broadcast import BroadcastBus, create_broadcast_bus
+from .services.metrics import REGISTRY, MetricsRegistry
+from .services.log import get_logger, bind_context
+from .services.jobs import chat_jobs
+
+logger = get_logger(__name__)
+
+SEND_QUEUE_SIZE = int(os.getenv('WS_SEND_QUEUE_SIZE', '100'))
+SEND_TIMEOUT = float(os.getenv('WS_SEND_TIMEOUT', '5'))
+SLOW_CONSUMER_POLICY = os.getenv('WS_SLOW_CONSUMER_POLICY', 'coalesce')
+HEARTBEAT_INTERVAL = float(os.getenv('WS_HEARTBEAT_INTERVAL', '25'))
+IDLE_TIMEOUT = float(os.getenv('WS_IDLE_TIMEOUT', '75'))
+MAX_CONNECTIONS_PER_SESSION = int(os.getenv('WS_MAX_CONNECTIONS_PER_SESSION', '10'))
+
+# Message types where only the latest value matters, so queued copies can be replaced
+COALESCIBLE_TYPES = {'typing', 'connection', 'ping'}
+# Bus-only message telling other nodes to close a session's sockets; never sent to clients
+SESSION_ENDED = 'session_ended'
+
+class Connection:
+    """
+    One WebSocket connection: its session, timestamps and outbound queue.
+
+    Slotted and task-free while idle, so tens of thousands fit in a
+    worker: a sender task only exists while messages are queued, and
+    queue limits and timeouts live on the manager. When the queue is full
+    the manager's slow-consumer policy applies: ``drop`` discards the
+    oldest queued message, ``coalesce`` first replaces a queued message
+    of the same coalescible type (falling back to ``drop``), and
+    ``disconnect`` closes the socket.
+    """
+
+    __slots__ = ('websocket', 'session_id', 'connected_at', 'last_seen', 'queue', 'task', 'dropped', 'closed', 'manager')
+
+    def __init__(self, websocket: WebSocket, session_id: str, manager: "ConnectionManager"):
+        """
+        Initialize the record.
+
+        Args:
+            websocket (WebSocket): The WebSocket connection
+            session_id (str): Chat session identifier
+            manager (ConnectionManager): Owner, for queue settings and broken-socket cleanup
+        """
+        self.websocket = websocket
+        self.session_id = session_id
+        self.manager = manager
+        # Monotonic times of the connection and of the last frame received from the client
+        self.connected_at = self.last_seen = time.monotonic()
+        self.queue: Deque[dict] = deque()
+        self.task: Optional[asyncio.Task] = None
+        self.dropped = 0
+        self.closed = False
+
+    def enqueue(self, message: dict) -> bool:
+        """
+        Queue a message without waiting.
+
+        Args:
+            message (dict): Message to send
+
+        Returns:
+            bool: False if the message was dropped or the socket is closing
+        """
+        if self.closed:
+            return False
+        if len(self.queue) >= self.manager.send_queue_size:
+            if self.manager.slow_consumer_policy == 'disconnect':
+                self._fail()
+                return False
+            if self.manager.slow_consumer_policy == 'coalesce' and message.get('type') in COALESCIBLE_TYPES:
+                for i in range(len(self.queue) - 1, -1, -1):
+                    if self.queue[i].get('type') == message['type']:
+                        self.queue[i] = message
+                        self.dropped += 1
+                        return True
+            self.queue.popleft()
+            self.dropped += 1
+        self.queue.append(message)
+        if self.task is None:
+            self.task = asyncio.get_running_loop().create_task(self._drain())
+        return True
+
+    async def _drain(self):
+        """Send queued messages in order, then exit until more are queued."""
+        try:
+            while self.queue:
+                message = self.queue.popleft()
+                await asyncio.wait_for(self.websocket.send_json(message), timeout=self.manager.send_timeout)
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            logger.info('ws_send_failed', error=repr(e))
+            self._fail()
+        finally:
+            self.task = None
+
+    def _fail(self):
+        """Mark the connection broken and hand it back to the manager."""
+        if self.closed:
+            return
+        self.closed = True
+        self.manager.drop(self, code=1011)
+
+    def close(self):
+        """Stop sending."""
+        self.closed = True
+        if self.task is not None and self.task is not asyncio.current_task():
+            self.task.cancel()
+
 class ConnectionManager:
     """
     Manages WebSocket connections and broadcasts.
     Handles connection lifecycle and message distribution.
+
+    Connections are local to this process. Broadcasts are delivered to
+    local sockets directly and published once on the broadcast bus so
+    other workers and replicas can fan them out to theirs.
+
+    A single heartbeat task pings every connection each
+    ``heartbeat_interval`` seconds and closes those that have sent
+    nothing, not even a pong, for ``idle_timeout`` seconds, so half-open
+    connections do not linger. A session holds at most
+    ``max_per_session`` connections; the oldest is closed to make room.
     """
     
-    def __init__(self):
-        """Initialize connection manager with empty connection pools."""
-        self.active_connections: Dict[str, Set[WebSocket]] = {}
+    def __init__(self, bus: Optional[BroadcastBus] = None, send_queue_size: int = SEND_QUEUE_SIZE,
+                 slow_consumer_policy: str = SLOW_CONSUMER_POLICY, send_timeout: float = SEND_TIMEOUT,
+                 heartbeat_interval: float = HEARTBEAT_INTERVAL, idle_timeout: float = IDLE_TIMEOUT,
+                 max_per_session: int = MAX_CONNECTIONS_PER_SESSION):
+        """
+        Initialize connection manager with empty connection pools.
+
+        Args:
+            bus (Optional[BroadcastBus]): Cross-process broadcast bus, chosen from the environment by default
+            send_queue_size (int): Maximum queued messages per connection
+            slow_consumer_policy (str): 'drop', 'coalesce' or 'disconnect'
+            send_timeout (float): Seconds allowed for a single send
+            heartbeat_interval (float): Seconds between pings; 0 disables the heartbeat
+            idle_timeout (float): Seconds of client silence before a connection is closed; 0 never closes
+            max_per_session (int): Connections allowed per session; 0 for no limit
+        """
+        self.connections: Dict[WebSocket, Connection] = {}
+        self.sessions: Dict[str, List[Connection]] = {}
+        self.bus = bus or create_broadcast_bus()
+        self.send_queue_size = send_queue_size
+        self.slow_consumer_policy = slow_consumer_policy
+        self.send_timeout = send_timeout
+        self.heartbeat_interval = heartbeat_interval
+        self.idle_timeout = idle_timeout
+        self.max_per_session = max_per_session
+        self.idle_closed = 0
+        self.evicted = 0
+        self._heartbeat: Optional[asyncio.Task] = None
+
+    def register_metrics(self, registry: MetricsRegistry):
+        """
+        Expose connection and broadcast counts as metrics.
+
+        Args:
+            registry (MetricsRegistry): Registry to add the metrics to
+        """
+        registry.callback('gauge', 'ws_active_connections', 'Open WebSocket connections on this node',
+                          lambda: len(self.connections))
+        registry.callback('gauge', 'ws_active_sessions', 'Sessions with at least one open WebSocket on this node',
+                          lambda: len(self.sessions))
+        registry.callback('counter', 'ws_idle_closed_total', 'Connections closed by the heartbeat for silence',
+                          lambda: self.idle_closed)
+        registry.callback('counter', 'ws_evicted_total', 'Connections closed to respect the per-session cap',
+                          lambda: self.evicted)
+        registry.callback('counter', 'ws_broadcasts_published_total', 'Broadcasts published to other nodes',
+                          lambda: self.bus.published)
+        registry.callback('counter', 'ws_broadcasts_received_total', 'Broadcasts received from other nodes',
+                          lambda: self.bus.received)
+        registry.callback('counter', 'ws_broadcast_reconnects_total', 'Times the broadcast subscription was re-established',
+                          lambda: self.bus.reconnects)
+
+    async def start(self):
+        """Start receiving broadcasts and the heartbeat. Called from the application lifespan."""
+        await self.bus.start(self._deliver_remote)
+        if self.heartbeat_interval > 0 and self._heartbeat is None:
+            self._heartbeat = asyncio.get_running_loop().create_task(self._heartbeat_loop())
+
+    async def stop(self):
+        """Stop the heartbeat and the broadcast bus."""
+        if self._heartbeat is not None:
+            self._heartbeat.cancel()
+            try:
+                await self._heartbeat
+            except asyncio.CancelledError:
+                pass
+            self._heartbeat = None
+        await self.bus.stop()
+
+    async def _heartbeat_loop(self):
+        while True:
+            await asyncio.sleep(self.heartbeat_interval)
+            try:
+                self.heartbeat()
+            except Exception:
+                logger.exception('ws_heartbeat_failed')
+
+    def heartbeat(self) -> int:
+        """
+        Close silent connections and ping the rest.
+
+        Returns:
+            int: Connections closed for silence
+        """
+        closed = self.close_idle(self.idle_timeout) if self.idle_timeout > 0 else 0
+        ping = {'type': 'ping'}
+        for connection in list(self.connections.values()):
+            connection.enqueue(ping)
+        return closed
 
-    async def connect(self, websocket: WebSocket, session_id: str):
+    async def _deliver_remote(self, session_id: str, message: dict):
+        """
+        Fan out a broadcast published by another node to local sockets.
+
+        Args:
+            session_id (str): Target session identifier
+            message (dict): Message to deliver
+        """
+        if message.get('type') == SESSION_ENDED:
+            self.close_sessions([session_id])
+            return
+        self.deliver_local(message, session_id)
+
+    async def connect(self, websocket: WebSocket, session_id: str) -> Connection:
         """
         Accept a new WebSocket connection.
         
         Args:
             websocket (WebSocket): The WebSocket connection
             session_id (str): Chat session identifier
+
+        Returns:
+            Connection: The connection record
         """
-        await websocket.accept()
-        if session_id not in self.active_connections:
-            self.active_connections[session_id] = set()
-        self.active_connections[session_id].add(websocket)
+        if websocket.client_state == WebSocketState.CONNECTING:
+            await websocket.accept()
+        # Make room by closing the oldest connections in the session
+        while self.max_per_session and len(self.sessions.get(session_id, ())) >= self.max_per_session:
+            self.evicted += 1
+            self.drop(self.sessions[session_id][0], code=1001)
+        connection = Connection(websocket, session_id, self)
+        self.sessions.setdefault(session_id, []).append(connection)
+        self.connections[websocket] = connection
+        return connection
 
-    def disconnect(self, websocket: WebSocket, session_id: str):
+    def disconnect(self, websocket: WebSocket, session_id: Optional[str] = None):
         """
         Remove a WebSocket connection.
         
         Args:
             websocket (WebSocket): The WebSocket connection
-            session_id (str): Chat session identifier
+            session_id (Optional[str]): Unused; the session is taken from the connection record
+        """
+        connection = self.connections.pop(websocket, None)
+        if connection is None:
+            return
+        connection.close()
+        session = self.sessions.get(connection.session_id)
+        if session is not None:
+            if connection in session:
+                session.remove(connection)
+            if not session:
+                del self.sessions[connection.session_id]
+
+    def drop(self, connection: Connection, code: int = 1011, final: Optional[dict] = None):
+        """
+        Remove a connection and close its socket in the background.
+
+        Args:
+            connection (Connection): Connection to drop
+            code (int): WebSocket close code
+            final (Optional[dict]): Message to send before closing
+        """
+        self.disconnect(connection.websocket)
+        asyncio.get_running_loop().create_task(self._close_quietly(connection.websocket, code, final))
+
+    @staticmethod
+    async def _close_quietly(websocket: WebSocket, code: int = 1011, final: Optional[dict] = None):
+        """Close a socket, optionally sending one last message, ignoring errors from one that is already gone."""
+        try:
+            if final is not None:
+                await asyncio.wait_for(websocket.send_json(final), timeout=SEND_TIMEOUT)
+            await websocket.close(code=code)
+        except Exception:
+            pass
+
+    def touch(self, websocket: WebSocket):
+        """Record that a frame arrived on a connection."""
+        connection = self.connections.get(websocket)
+        if connection:
+            connection.last_seen = time.monotonic()
+
+    def active_session_ids(self) -> Set[str]:
+        """Sessions with at least one open connection on this node."""
+        return set(self.sessions)
+
+    def close_idle(self, idle_seconds: float) -> int:
+        """
+        Close connections that have sent nothing for ``idle_seconds``.
+
+        Args:
+            idle_seconds (float): Allowed silence per connection
+
+        Returns:
+            int: Connections closed
+        """
+        cutoff = time.monotonic() - idle_seconds
+        stale = [c for c in self.connections.values() if c.last_seen < cutoff]
+        for connection in stale:
+            self.drop(connection, code=1001)
+        self.idle_closed += len(stale)
+        return len(stale)
+
+    def close_sessions(self, session_ids: Iterable[str]) -> int:
+        """
+        Tell local connections their session has ended, then close them.
+
+        Args:
+            session_ids (Iterable[str]): Ended sessions
+
+        Returns:
+            int: Connections closed
+        """
+        closed = 0
+        for session_id in session_ids:
+            for connection in list(self.sessions.get(session_id, ())):
+                notice = {'type': 'connection', 'status': 'ended', 'timestamp': datetime.now().isoformat()}
+                self.drop(connection, code=1000, final=notice)
+                closed += 1
+        return closed
+
+    async def end_sessions(self, session_ids: Iterable[str]) -> int:
+        """
+        Close the connections of ended sessions on every node.
+
+        Local connections are closed straight away; the other nodes are
+        told through the broadcast bus and close theirs.
+
+        Args:
+            session_ids (Iterable[str]): Ended sessions
+
+        Returns:
+            int: Connections closed on this node
+        """
+        session_ids = list(session_ids)
+        closed = self.close_sessions(session_ids)
+        for session_id in session_ids:
+            await self.bus.publish(session_id, {'type': SESSION_ENDED})
+        return closed
+
+    def send_to(self, websocket: WebSocket, message: dict) -> bool:
+        """
+        Queue a message for a single connection.
+        
+        Args:
+            websocket (WebSocket): Target connection
+            message (dict): Message to send
+
+        Returns:
+            bool: True if the message was queued
+        """
+        connection = self.connections.get(websocket)
+        return connection.enqueue(message) if connection else False
+
+    def deliver_local(self, message: dict, session_id: str):
+        """
+        Queue a message on every local connection in a session.
+
+        Args:
+            message (dict): Message to deliver
+            session_id (str): Target session identifier
         """
-        if session_id in self.active_connections:
-            self.active_connections[session_id].remove(websocket)
-            if not self.active_connections[session_id]:
-                del self.active_connections[session_id]
+        for connection in list(self.sessions.get(session_id, ())):
+            connection.enqueue(message)
 
     async def broadcast_to_session(self, message: dict, session_id: str):
         """
-        Broadcast message to all connections in a session.
+        Broadcast message to all connections in a session, on every node.
+
+        Messages are queued on every local connection, so delivery happens
+        concurrently and never waits on a slow socket, then published once
+        for the other nodes.
         
         Args:
             message (dict): Message to broadcast
             session_id (str): Target session identifier
         """
-        if session_id in self.active_connections:
-            for connection in self.active_connections[session_id]:
-                await connection.send_json(message)
+        self.deliver_local(message, session_id)
+        await self.bus.publish(session_id, message)
 
 # Initialize connection manager
 manager = ConnectionManager()
+manager.register_metrics(REGISTRY)
+
+def job_frame(job: dict) -> dict:
+    """Render a chat job as a socket frame."""
+    return {
+        'type': 'job',
+        'jobId': job['id'],
+        'status': job['status'],
+        'result': job.get('result'),
+        'error': job.get('error'),
+        'timestamp': datetime.now().isoformat()
+    }
+
+async def deliver_job(job: dict):
+    """Push a finished chat job to every socket in its session."""
+    await manager.broadcast_to_session(job_frame(job), job['session_id'])
+
+chat_jobs.add_listener(deliver_job)
+
+async def resume_job(websocket: WebSocket, session_id: str, job_id: str):
+    """
+    Answer a ``job`` frame with the job's current state.
+
+    Lets a client that reconnects pick up a job started before it went
+    away; if the job is still running its result arrives like any other
+    job result once it finishes.
+    """
+    job = await chat_jobs.get(job_id) if job_id else None
+    if job is None or job['session_id'] != session_id:
+        manager.send_to(websocket, {'type': 'error', 'detail': 'Job not found', 'jobId': job_id,
+                                    'timestamp': datetime.now().isoformat()})
+        return
+    manager.send_to(websocket, job_frame(job))
+
+async def run_socket_turn(websocket: WebSocket, session_id: str, data: dict):
+    """
+    Run a chat turn requested over the socket and reply on the same socket.
+
+    Replies carry the client's ``requestId`` so they can be matched to the
+    request even when several turns are in flight.
+
+    Args:
+        websocket (WebSocket): The requesting connection
+        session_id (str): Chat session identifier
+        data (dict): The ``message`` or ``stream`` frame
+    """
+    request_id = data.get('requestId')
+    bind_context(turn_id=request_id)
+    if data.get('type') == 'stream':
+        # Relay the bot reply to the session piece by piece
+        async for event in stream_chat_turn(db_service, n8n_service, session_id, data['message']):
+            event['requestId'] = request_id
+            event['timestamp'] = datetime.now().isoformat()
+            await manager.broadcast_to_session(event, session_id)
+        return
+    try:
+        response_json = await run_chat_turn(db_service, n8n_service, session_id, data['message'])
+        manager.send_to(websocket, {
+            **response_json,
+            'type': 'message',
+            'sender': 'bot',
+            'message': response_json.get('response') or ERROR_MESSAGE,
+            'requestId': request_id,
+            'timestamp': datetime.now().isoformat()
+        })
+    except (ChatTurnError, AdmissionRejected) as e:
+        error = {
+            'type': 'error',
+            'detail': str(e) if isinstance(e, ChatTurnError) else 'Service is busy, please retry shortly.',
+            'requestId': request_id,
+            'timestamp': datetime.now().isoformat()
+        }
+        if isinstance(e, AdmissionRejected):
+            error['retryAfter'] = e.retry_after
+        manager.send_to(websocket, error)
 
 async def websocket_endpoint(websocket: WebSocket):
     """
     Handle WebSocket connections and messages.
-    Currently used for typing indicators and connection status.
+    Used for typing indicators, connection status and full chat turns.
+
+    ``message`` frames run the same pipeline as POST /chat/message and
+    ``stream`` frames relay the reply as it is generated. Results of chat
+    jobs in the session are pushed as ``job`` frames, and a client sends
+    ``{"type": "job", "jobId": ...}`` to get the state of one it started
+    before reconnecting. Turns run as
+    tasks so typing events keep flowing while the bot answers; a turn
+    still completes and is stored if the client goes away. The join
+    frame may itself carry the first message; a client that sends no
+    join frame within the idle timeout is closed with 1008, since the
+    heartbeat only sees registered connections.
     
     Args:
         websocket (WebSocket): The WebSocket connection
     """
     session_id = None
+    turns: Set[asyncio.Task] = set()
+
+    def start_turn(data: dict):
+        task = asyncio.get_running_loop().create_task(run_socket_turn(websocket, session_id, data))
+        turns.add(task)
+        task.add_done_callback(turns.discard)
     
     try:
         # Accept initial connection
         await websocket.accept()
         
         # Get session information
-        data = await websocket.receive_json()
+        try:
+            data = await asyncio.wait_for(websocket.receive_json(), timeout=manager.idle_timeout or None)
+        except asyncio.TimeoutError:
+            await websocket.close(code=1008)  # 1008 = Policy violation
+            return
         session_id = data.get('sessionId')
         
         if not session_id:
             await websocket.close(code=1003)  # 1003 = Unsupported data
             return
+        bind_context(session_id=session_id)
             
-        # Register connection
-        await manager.connect(websocket, session_id)
-        
-        # Notify session of connection
+        # Notify the rest of the session, then register connection
         await manager.broadcast_to_session({
             'type': 'connection',
             'status': 'connected',
             'timestamp': datetime.now().isoformat()
         }, session_id)
+        await manager.connect(websocket, session_id)
+
+        if data.get('message') and data.get('type') in (None, 'message', 'stream'):
+            start_turn(data)
         
         # Main message loop
         while True:
             data = await websocket.receive_json()
+            manager.touch(websocket)
+            if data.get('type') == 'pong':
+                continue
             if data.get('type') == 'typing':
                 # Broadcast typing status
                 await manager.broadcast_to_session({
@@ -100,6 +557,10 @@ async def websocket_endpoint(websocket: WebSocket):
                     'sender': data.get('sender'),
                     'timestamp': datetime.now().isoformat()
                 }, session_id)
+            elif data.get('type') in ('message', 'stream') and data.get('message'):
+                start_turn(data)
+            elif data.get('type') == 'job':
+                await resume_job(websocket, session_id, data.get('jobId'))
                 
     except WebSocketDisconnect:
         if session_id:
@@ -109,7 +570,7 @@ async def websocket_endpoint(websocket: WebSocket):
                 'status': 'disconnected',
                 'timestamp': datetime.now().isoformat()
             }, session_id)
-    except Exception as e:
-        print(f"WebSocket error: {e}")
+    except Exception:
+        logger.exception('ws_connection_failed')
         if session_id:
-            manager.disconnect(websocket, session_id)
\ No newline at end of file
+            manager.disconnect(websocket, session_id)
@@ -0,0 +1,13 @@
+"""
+Benchmark suite for the chat backend.
+
+Runs the real application against local stand-ins for n8n and Supabase so
+throughput and latency can be measured offline on a single machine:
+
+    cd backend
+    python -m benchmarks run --scenario all --duration 10 --concurrency 16
+    python -m benchmarks compare benchmarks/results/abc1234.json benchmarks/results/def5678.json
+
+See ``python -m benchmarks run --help`` for the stub latency and error
+settings.
+"""
@@ -0,0 +1,293 @@
+"""
+Load drivers for benchmarks.
+Closed-loop HTTP and WebSocket workloads that record per-operation latency.
+"""
+
+import asyncio
+import json
+import time
+import uuid
+from typing import Any, Awaitable, Callable, Dict, List, Optional
+
+import httpx
+
+def percentile(ordered: List[float], q: float) -> float:
+    """
+    Nearest-rank percentile of pre-sorted samples.
+
+    Args:
+        ordered (List[float]): Samples in ascending order
+        q (float): Percentile between 0 and 100
+
+    Returns:
+        float: Sample at the percentile, or 0.0 when there are none
+    """
+    if not ordered:
+        return 0.0
+    rank = max(1, -(-len(ordered) * q // 100))
+    return ordered[int(rank) - 1]
+
+class LatencyRecorder:
+    """Collects operation latencies and errors for one scenario."""
+
+    def __init__(self, name: str):
+        self.name = name
+        self.samples: List[float] = []
+        self.errors = 0
+        self.error_kinds: Dict[str, int] = {}
+        self.started = time.perf_counter()
+        self.finished: Optional[float] = None
+
+    def record(self, seconds: float) -> None:
+        self.samples.append(seconds)
+
+    def record_error(self, kind: str) -> None:
+        self.errors += 1
+        self.error_kinds[kind] = self.error_kinds.get(kind, 0) + 1
+
+    def stop(self) -> None:
+        self.finished = time.perf_counter()
+
+    def summary(self) -> Dict[str, Any]:
+        """
+        Summarize the run.
+
+        Returns:
+            Dict[str, Any]: Counts, throughput and latency percentiles in milliseconds
+        """
+        elapsed = (self.finished or time.perf_counter()) - self.started
+        ordered = sorted(self.samples)
+        ms = lambda seconds: round(seconds * 1000, 3)
+        return {
+            'ok': len(ordered),
+            'errors': self.errors,
+            'error_kinds': dict(self.error_kinds),
+            'elapsed_s': round(elapsed, 3),
+            'throughput_rps': round(len(ordered) / elapsed, 2) if elapsed > 0 else 0.0,
+            'mean_ms': ms(sum(ordered) / len(ordered)) if ordered else 0.0,
+            'p50_ms': ms(percentile(ordered, 50)),
+            'p95_ms': ms(percentile(ordered, 95)),
+            'p99_ms': ms(percentile(ordered, 99)),
+            'max_ms': ms(ordered[-1]) if ordered else 0.0,
+        }
+
+async def closed_loop(
+    recorder: LatencyRecorder,
+    operation: Callable[[int], Awaitable[None]],
+    concurrency: int,
+    duration: float
+) -> Dict[str, Any]:
+    """
+    Run ``concurrency`` workers that call ``operation`` back to back.
+
+    Each worker gets its own index so it can use its own session. An
+    operation reports failure by raising; its latency is then counted as
+    an error instead of a sample.
+
+    Args:
+        recorder (LatencyRecorder): Where results go
+        operation (Callable[[int], Awaitable[None]]): Called with the worker index
+        concurrency (int): Number of workers
+        duration (float): Seconds to run
+
+    Returns:
+        Dict[str, Any]: Recorder summary
+    """
+    deadline = time.perf_counter() + duration
+
+    async def worker(index: int):
+        while time.perf_counter() < deadline:
+            start = time.perf_counter()
+            try:
+                await operation(index)
+            except Exception as e:
+                recorder.record_error(type(e).__name__)
+                continue
+            recorder.record(time.perf_counter() - start)
+
+    recorder.started = time.perf_counter()
+    await asyncio.gather(*(worker(i) for i in range(concurrency)))
+    recorder.stop()
+    return recorder.summary()
+
+def session_ids(prefix: str, count: int) -> List[str]:
+    """Unique session identifiers for one scenario run."""
+    run = uuid.uuid4().hex[:8]
+    return [f"{prefix}-{run}-{i}" for i in range(count)]
+
+async def chat_message_load(client: httpx.AsyncClient, concurrency: int, duration: float) -> Dict[str, Any]:
+    """
+    Drive POST /chat/message, one session per worker.
+
+    Args:
+        client (httpx.AsyncClient): Client pointed at the backend
+        concurrency (int): Concurrent workers
+        duration (float): Seconds to run
+
+    Returns:
+        Dict[str, Any]: Latency summary
+    """
+    sessions = session_ids('bench-chat', concurrency)
+    counter = 0
+
+    async def send(index: int):
+        nonlocal counter
+        counter += 1
+        response = await client.post('/chat/message', json={
+            'sessionId': sessions[index],
+            'message': f"Question {counter}"
+        })
+        if response.status_code != 200:
+            raise RuntimeError(f"HTTP {response.status_code}")
+
+    return await closed_loop(LatencyRecorder('chat_message'), send, concurrency, duration)
+
+async def seed_history(postgrest_url: str, sessions: List[str], messages_per_session: int) -> None:
+    """
+    Write sessions and message history straight into the PostgREST stub.
+
+    Args:
+        postgrest_url (str): Base URL of the stub
+        sessions (List[str]): Session identifiers to create
+        messages_per_session (int): Messages to create in each session
+    """
+    async with httpx.AsyncClient(base_url=f"{postgrest_url}/rest/v1") as client:
+        await client.post('/chat_sessions', json=[
+            {'session_id': s, 'user_id': f"user_{s[:8]}", 'started_at': '2024-01-01T00:00:00+00:00', 'ended_at': None}
+            for s in sessions
+        ])
+        for session_id in sessions:
+            await client.post('/chat_messages', json=[
+                {
+                    'session_id': session_id,
+                    'sender': 'user' if i % 2 == 0 else 'bot',
+                    'message': f"History message {i} " + 'x' * 120,
+                    'timestamp': f"2024-01-01T00:{i // 60 % 60:02d}:{i % 60:02d}.{i:06d}+00:00"
+                }
+                for i in range(messages_per_session)
+            ])
+
+async def history_load(
+    client: httpx.AsyncClient,
+    postgrest_url: str,
+    concurrency: int,
+    duration: float,
+    messages_per_session: int,
+    page_size: int
+) -> Dict[str, Any]:
+    """
+    Drive GET /chat/messages/{id} against seeded sessions.
+
+    Args:
+        client (httpx.AsyncClient): Client pointed at the backend
+        postgrest_url (str): Base URL of the PostgREST stub, for seeding
+        concurrency (int): Concurrent workers
+        duration (float): Seconds to run
+        messages_per_session (int): History length per session
+        page_size (int): ``limit`` to request, or 0 for the full history
+
+    Returns:
+        Dict[str, Any]: Latency summary
+    """
+    sessions = session_ids('bench-history', concurrency)
+    await seed_history(postgrest_url, sessions, messages_per_session)
+    params = {'limit': page_size} if page_size else {}
+
+    async def fetch(index: int):
+        response = await client.get(f"/chat/messages/{sessions[index]}", params=params)
+        if response.status_code != 200:
+            raise RuntimeError(f"HTTP {response.status_code}")
+
+    return await closed_loop(LatencyRecorder('chat_history'), fetch, concurrency, duration)
+
+async def ws_fanout_load(
+    ws_url: str,
+    sessions: int,
+    subscribers: int,
+    duration: float,
+    rate: float
+) -> Dict[str, Any]:
+    """
+    Measure /ws/chat broadcast fan-out latency.
+
+    Each session gets ``subscribers`` sockets; one of them publishes
+    typing frames at ``rate`` per second. A frame's latency is the time
+    from sending it to each socket in the session receiving its
+    broadcast, so one frame yields up to ``subscribers`` samples. The
+    frame sequence number travels in the ``sender`` field. Typing frames
+    may be coalesced for slow sockets, so the delivery ratio is reported.
+
+    Args:
+        ws_url (str): WebSocket URL of /ws/chat
+        sessions (int): Number of sessions
+        subscribers (int): Sockets per session, including the publisher
+        duration (float): Seconds to publish for
+        rate (float): Frames per second per publisher
+
+    Returns:
+        Dict[str, Any]: Latency summary plus sent/expected/delivered counts
+    """
+    try:
+        import websockets
+    except ImportError as e:
+        raise RuntimeError("The ws_fanout scenario requires the 'websockets' package") from e
+
+    recorder = LatencyRecorder('ws_fanout')
+    sent_at: Dict[str, float] = {}
+    sent = 0
+    ids = session_ids('bench-ws', sessions)
+
+    async def listen(socket):
+        try:
+            async for raw in socket:
+                data = json.loads(raw)
+                if data.get('type') == 'ping':
+                    await socket.send('{"type": "pong"}')
+                    continue
+                start = sent_at.get(data.get('sender')) if data.get('type') == 'typing' else None
+                if start is not None:
+                    recorder.record(time.perf_counter() - start)
+        except websockets.ConnectionClosed:
+            pass
+
+    async def publish(socket, session_id: str, deadline: float):
+        nonlocal sent
+        seq = 0
+        while time.perf_counter() < deadline:
+            seq += 1
+            key = f"{session_id}:{seq}"
+            sent_at[key] = time.perf_counter()
+            await socket.send(json.dumps({'type': 'typing', 'sender': key}))
+            sent += 1
+            await asyncio.sleep(1 / rate)
+
+    sockets, listeners = [], []
+    for session_id in ids:
+        for _ in range(subscribers):
+            socket = await websockets.connect(ws_url, max_queue=None)
+            await socket.send(json.dumps({'type': 'join', 'sessionId': session_id}))
+            sockets.append((session_id, socket))
+    # Joins broadcast a notice; give them time to settle before measuring
+    await asyncio.sleep(0.2)
+    for _, socket in sockets:
+        listeners.append(asyncio.create_task(listen(socket)))
+
+    recorder.started = time.perf_counter()
+    deadline = recorder.started + duration
+    publishers = [socket for i, (session_id, socket) in enumerate(sockets) if i % subscribers == 0]
+    await asyncio.gather(*(publish(socket, ids[i], deadline) for i, socket in enumerate(publishers)))
+    await asyncio.sleep(0.5)
+    recorder.stop()
+    for _, socket in sockets:
+        await socket.close()
+    await asyncio.gather(*listeners, return_exceptions=True)
+
+    summary = recorder.summary()
+    expected = sent * subscribers
+    summary.update({
+        'frames_sent': sent,
+        'deliveries_expected': expected,
+        'delivery_ratio': round(len(recorder.samples) / expected, 4) if expected else 0.0,
+        'throughput_rps': round(len(recorder.samples) / duration, 2),
+    })
+    return summary
@@ -0,0 +1,122 @@
+"""
+Benchmark reports.
+Writes run results as JSON tagged with the git commit, and compares two runs.
+"""
+
+import json
+import os
+import platform
+import subprocess
+from datetime import datetime, timezone
+from typing import Any, Dict, List, Optional
+
+# Metrics shown by compare; for each, whether a higher value is better
+COMPARED_METRICS = [
+    ('throughput_rps', True),
+    ('p50_ms', False),
+    ('p95_ms', False),
+    ('p99_ms', False),
+    ('errors', False),
+]
+
+def git_revision() -> Dict[str, Any]:
+    """
+    Describe the checked-out commit.
+
+    Returns:
+        Dict[str, Any]: Short commit hash and whether the tree has local changes
+    """
+    def git(*args: str) -> Optional[str]:
+        try:
+            return subprocess.run(['git', *args], capture_output=True, text=True, check=True).stdout.strip()
+        except (OSError, subprocess.CalledProcessError):
+            return None
+    return {'commit': git('rev-parse', '--short', 'HEAD') or 'unknown', 'dirty': bool(git('status', '--porcelain', '--untracked-files=no'))}
+
+def build_report(config: Dict[str, Any], scenarios: Dict[str, Dict[str, Any]]) -> Dict[str, Any]:
+    """
+    Assemble a run report.
+
+    Args:
+        config (Dict[str, Any]): Settings the run used
+        scenarios (Dict[str, Dict[str, Any]]): Summary per scenario
+
+    Returns:
+        Dict[str, Any]: Report with metadata, config and results
+    """
+    return {
+        'meta': {
+            **git_revision(),
+            'created_at': datetime.now(timezone.utc).isoformat(),
+            'python': platform.python_version(),
+            'machine': platform.machine(),
+            'cpus': os.cpu_count(),
+        },
+        'config': config,
+        'scenarios': scenarios,
+    }
+
+def save_report(report: Dict[str, Any], path: str) -> None:
+    """Write a report as JSON, creating parent directories."""
+    os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+    with open(path, 'w') as f:
+        json.dump(report, f, indent=2)
+
+def load_report(path: str) -> Dict[str, Any]:
+    """Read a report written by save_report."""
+    with open(path) as f:
+        return json.load(f)
+
+def format_summary(report: Dict[str, Any]) -> str:
+    """
+    Render a report as a fixed-width table.
+
+    Returns:
+        str: One line per scenario
+    """
+    lines = [f"commit {report['meta']['commit']}{' (dirty)' if report['meta']['dirty'] else ''}"]
+    lines.append(f"{'scenario':<14}{'ok':>8}{'errors':>8}{'rps':>10}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}")
+    for name, s in report['scenarios'].items():
+        lines.append(
+            f"{name:<14}{s['ok']:>8}{s['errors']:>8}{s['throughput_rps']:>10.1f}"
+            f"{s['p50_ms']:>10.2f}{s['p95_ms']:>10.2f}{s['p99_ms']:>10.2f}"
+        )
+    return '\n'.join(lines)
+
+def compare_reports(base: Dict[str, Any], head: Dict[str, Any], threshold: float = 0.05) -> List[Dict[str, Any]]:
+    """
+    Compare the scenarios two reports have in common.
+
+    Args:
+        base (Dict[str, Any]): Baseline report
+        head (Dict[str, Any]): Report to compare against the baseline
+        threshold (float): Relative change treated as noise
+
+    Returns:
+        List[Dict[str, Any]]: One row per scenario and metric with values,
+        relative change and a verdict of ``better``, ``worse`` or ``same``
+    """
+    rows = []
+    for name in base['scenarios']:
+        if name not in head['scenarios']:
+            continue
+        for metric, higher_is_better in COMPARED_METRICS:
+            old = base['scenarios'][name].get(metric, 0)
+            new = head['scenarios'][name].get(metric, 0)
+            change = (new - old) / old if old else (0.0 if new == old else float('inf'))
+            verdict = 'same'
+            if abs(change) > threshold:
+                verdict = 'better' if (change > 0) == higher_is_better else 'worse'
+            rows.append({'scenario': name, 'metric': metric, 'base': old, 'head': new, 'change': change, 'verdict': verdict})
+    return rows
+
+def format_comparison(base: Dict[str, Any], head: Dict[str, Any], rows: List[Dict[str, Any]]) -> str:
+    """Render compare_reports output as a fixed-width table."""
+    lines = [f"base {base['meta']['commit']} -> head {head['meta']['commit']}"]
+    if base.get('config') != head.get('config'):
+        lines.append("warning: the runs used different settings")
+    lines.append(f"{'scenario':<14}{'metric':<16}{'base':>12}{'head':>12}{'change':>10}  verdict")
+    for r in rows:
+        change = f"{r['change']:+.1%}" if r['change'] != float('inf') else 'n/a'
+        lines.append(f"{r['scenario']:<14}{r['metric']:<16}{r['base']:>12}{r['head']:>12}{change:>10}  {r['verdict']}")
+    return '\n'.join(lines)
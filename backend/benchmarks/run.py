@@ -0,0 +1,180 @@
+"""
+Benchmark runner.
+Starts the stubs and the backend as local processes, drives load and writes a report.
+"""
+
+import argparse
+import asyncio
+import os
+import socket
+import subprocess
+import sys
+import time
+from contextlib import contextmanager
+from typing import Dict, Iterator, List, Optional
+
+import httpx
+
+from .load import chat_message_load, history_load, ws_fanout_load
+from .report import build_report, compare_reports, format_comparison, format_summary, load_report, save_report
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+RESULTS_DIR = os.path.join(BACKEND_DIR, 'benchmarks', 'results')
+SCENARIOS = ['chat_message', 'chat_history', 'ws_fanout']
+
+def free_port() -> int:
+    """Pick an unused local TCP port."""
+    with socket.socket() as s:
+        s.bind(('127.0.0.1', 0))
+        return s.getsockname()[1]
+
+def wait_until_ready(url: str, proc: subprocess.Popen, timeout: float = 20.0) -> None:
+    """
+    Poll a URL until the process serving it answers.
+
+    Raises:
+        RuntimeError: If the process exits or does not answer within the timeout
+    """
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if proc.poll() is not None:
+            raise RuntimeError(f"{' '.join(proc.args)} exited with status {proc.returncode}")
+        try:
+            httpx.get(url, timeout=1.0)
+            return
+        except httpx.TransportError:
+            time.sleep(0.1)
+    raise RuntimeError(f"{url} did not come up within {timeout}s")
+
+@contextmanager
+def processes(commands: List[List[str]], env: Dict[str, str], log_path: str) -> Iterator[List[subprocess.Popen]]:
+    """Run commands from the backend directory for the duration of the block, logging their output."""
+    os.makedirs(os.path.dirname(log_path), exist_ok=True)
+    with open(log_path, 'w') as log:
+        procs = [subprocess.Popen(cmd, cwd=BACKEND_DIR, env=env, stdout=log, stderr=subprocess.STDOUT) for cmd in commands]
+    try:
+        yield procs
+    finally:
+        for proc in procs:
+            proc.terminate()
+        for proc in procs:
+            try:
+                proc.wait(timeout=10)
+            except subprocess.TimeoutExpired:
+                proc.kill()
+
+def backend_env(args: argparse.Namespace, n8n_port: int, postgrest_port: int) -> Dict[str, str]:
+    """
+    Environment for the backend under test.
+
+    Settings given with ``--env KEY=VALUE`` are applied last so any
+    backend option can be benchmarked.
+    """
+    env = dict(os.environ)
+    env.update({
+        'SUPABASE_URL': f"http://127.0.0.1:{postgrest_port}",
+        'SUPABASE_KEY': 'bench.bench.bench',
+        'N8N_WEBHOOK_MODE': 'production',
+        'N8N_WEBHOOK_URL_PRODUCTION': f"http://127.0.0.1:{n8n_port}/webhook/bench",
+        'N8N_WEBHOOK_URL_STREAM': f"http://127.0.0.1:{n8n_port}/webhook/bench",
+    })
+    for item in args.env:
+        key, _, value = item.partition('=')
+        env[key] = value
+    return env
+
+async def run_scenarios(args: argparse.Namespace, app_url: str, postgrest_url: str) -> Dict[str, dict]:
+    """Run the selected scenarios one after another."""
+    results = {}
+    limits = httpx.Limits(max_connections=args.concurrency, max_keepalive_connections=args.concurrency)
+    async with httpx.AsyncClient(base_url=app_url, timeout=args.request_timeout, limits=limits) as client:
+        for name in args.scenarios:
+            print(f"running {name} for {args.duration}s ...", flush=True)
+            if name == 'chat_message':
+                results[name] = await chat_message_load(client, args.concurrency, args.duration)
+            elif name == 'chat_history':
+                results[name] = await history_load(
+                    client, postgrest_url, args.concurrency, args.duration, args.history_messages, args.history_limit
+                )
+            elif name == 'ws_fanout':
+                ws_url = app_url.replace('http://', 'ws://') + '/ws/chat'
+                results[name] = await ws_fanout_load(
+                    ws_url, args.ws_sessions, args.ws_subscribers, args.duration, args.ws_rate
+                )
+    return results
+
+def run(args: argparse.Namespace) -> None:
+    """Start the stack, run the scenarios and write the report."""
+    n8n_port, postgrest_port, app_port = free_port(), free_port(), free_port()
+    stub = [sys.executable, '-m', 'benchmarks.stubs']
+    if args.seed is not None:
+        stub += ['--seed', str(args.seed)]
+    commands = [
+        stub + ['n8n', '--port', str(n8n_port), '--latency', args.n8n_latency,
+                '--error-rate', str(args.n8n_error_rate), '--error-status', str(args.n8n_error_status),
+                '--hang-rate', str(args.n8n_hang_rate)],
+        stub + ['postgrest', '--port', str(postgrest_port), '--latency', args.db_latency],
+        [sys.executable, '-m', 'uvicorn', 'app.main:app', '--host', '127.0.0.1', '--port', str(app_port),
+         '--log-level', 'warning', '--no-access-log'],
+    ]
+    app_url = f"http://127.0.0.1:{app_port}"
+    postgrest_url = f"http://127.0.0.1:{postgrest_port}"
+    log_path = os.path.join(RESULTS_DIR, 'server.log')
+    with processes(commands, backend_env(args, n8n_port, postgrest_port), log_path) as procs:
+        urls = (f"http://127.0.0.1:{n8n_port}/health", f"{postgrest_url}/health", f"{app_url}/health")
+        for url, proc in zip(urls, procs):
+            wait_until_ready(url, proc)
+        scenarios = asyncio.run(run_scenarios(args, app_url, postgrest_url))
+    print(f"server output written to {log_path}")
+
+    config = {k: v for k, v in vars(args).items() if k not in ('command', 'output', 'func')}
+    report = build_report(config, scenarios)
+    output = args.output or os.path.join(RESULTS_DIR, f"{report['meta']['commit']}.json")
+    save_report(report, output)
+    print(format_summary(report))
+    print(f"report written to {output}")
+
+def compare(args: argparse.Namespace) -> None:
+    """Print the difference between two reports."""
+    base, head = load_report(args.base), load_report(args.head)
+    rows = compare_reports(base, head, args.threshold)
+    print(format_comparison(base, head, rows))
+    if args.fail_on_regression and any(r['verdict'] == 'worse' for r in rows):
+        sys.exit(1)
+
+def main(argv: Optional[List[str]] = None) -> None:
+    parser = argparse.ArgumentParser(prog='python -m benchmarks', description="Offline load benchmarks for the chat backend.")
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    p = commands.add_parser('run', help="Run scenarios and write a report")
+    p.add_argument('--scenario', dest='scenarios', action='append', choices=SCENARIOS + ['all'],
+                   help="Scenario to run; repeat for several (default: all)")
+    p.add_argument('--duration', type=float, default=10.0, help="Seconds per scenario")
+    p.add_argument('--concurrency', type=int, default=16, help="Concurrent HTTP workers")
+    p.add_argument('--request-timeout', type=float, default=60.0)
+    p.add_argument('--n8n-latency', default='lognormal:200:0.5', help="Stub n8n latency spec, see stubs.LatencyModel")
+    p.add_argument('--n8n-error-rate', type=float, default=0.0, help="Fraction of n8n calls that fail")
+    p.add_argument('--n8n-error-status', type=int, default=500)
+    p.add_argument('--n8n-hang-rate', type=float, default=0.0, help="Fraction of n8n calls that hang")
+    p.add_argument('--db-latency', default='const:2', help="Stub PostgREST latency spec")
+    p.add_argument('--history-messages', type=int, default=200, help="Messages seeded per history session")
+    p.add_argument('--history-limit', type=int, default=50, help="Page size for history reads, 0 for full history")
+    p.add_argument('--ws-sessions', type=int, default=10)
+    p.add_argument('--ws-subscribers', type=int, default=10, help="Sockets per session")
+    p.add_argument('--ws-rate', type=float, default=20.0, help="Typing frames per second per session")
+    p.add_argument('--seed', type=int, default=1234)
+    p.add_argument('--env', action='append', default=[], metavar='KEY=VALUE', help="Extra backend setting")
+    p.add_argument('--output', help="Report path (default: benchmarks/results/<commit>.json)")
+    p.set_defaults(func=run)
+
+    p = commands.add_parser('compare', help="Compare two reports")
+    p.add_argument('base')
+    p.add_argument('head')
+    p.add_argument('--threshold', type=float, default=0.05, help="Relative change treated as noise")
+    p.add_argument('--fail-on-regression', action='store_true', help="Exit non-zero if any metric got worse")
+    p.set_defaults(func=compare)
+
+    args = parser.parse_args(argv)
+    if args.command == 'run' and (not args.scenarios or 'all' in args.scenarios):
+        args.scenarios = list(SCENARIOS)
+    args.func(args)
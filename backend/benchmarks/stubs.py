@@ -0,0 +1,375 @@
+"""
+Stand-in servers for benchmarks.
+Provides a fake n8n webhook and a minimal in-memory PostgREST for the tables the backend uses.
+"""
+
+import argparse
+import asyncio
+import itertools
+import json
+import random
+import re
+from typing import Any, Callable, Dict, List, Optional
+
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse, Response
+
+class LatencyModel:
+    """
+    Random latency distribution, configured from a spec string.
+
+    Specs (all values in milliseconds):
+        ``const:MS``                 fixed delay
+        ``uniform:LOW:HIGH``         uniform between LOW and HIGH
+        ``lognormal:MEDIAN:SIGMA``   log-normal with the given median and shape
+        ``exp:MEAN``                 exponential with the given mean
+    """
+
+    def __init__(self, spec: str = 'const:0', seed: Optional[int] = None):
+        """
+        Initialize the model.
+
+        Args:
+            spec (str): Distribution spec
+            seed (Optional[int]): Seed for reproducible samples
+
+        Raises:
+            ValueError: If the spec is not recognised
+        """
+        self.spec = spec
+        self.random = random.Random(seed)
+        kind, *args = spec.split(':')
+        try:
+            values = [float(a) for a in args]
+        except ValueError as e:
+            raise ValueError(f"Invalid latency spec: {spec}") from e
+        samplers: Dict[str, Callable[[], float]] = {
+            'const': lambda: values[0],
+            'uniform': lambda: self.random.uniform(values[0], values[1]),
+            'lognormal': lambda: values[0] * self.random.lognormvariate(0, values[1]),
+            'exp': lambda: self.random.expovariate(1 / values[0]) if values[0] else 0.0,
+        }
+        arity = {'const': 1, 'uniform': 2, 'lognormal': 2, 'exp': 1}
+        if kind not in samplers or len(values) != arity[kind]:
+            raise ValueError(f"Invalid latency spec: {spec}")
+        self._sample = samplers[kind]
+
+    def sample(self) -> float:
+        """
+        Draw one delay.
+
+        Returns:
+            float: Delay in seconds
+        """
+        return max(0.0, self._sample()) / 1000
+
+def create_n8n_stub(
+    latency: LatencyModel,
+    error_rate: float = 0.0,
+    error_status: int = 500,
+    hang_rate: float = 0.0,
+    hang_seconds: float = 60.0,
+    seed: Optional[int] = None
+) -> FastAPI:
+    """
+    Build a fake n8n webhook app.
+
+    Every POST path answers ``{"response": ...}`` after a sampled delay.
+    A fraction of calls fail with ``error_status`` and another fraction
+    hang for ``hang_seconds`` to exercise client timeouts.
+
+    Args:
+        latency (LatencyModel): Response delay distribution
+        error_rate (float): Fraction of calls answered with an error status
+        error_status (int): Status used for failed calls
+        hang_rate (float): Fraction of calls that hang
+        hang_seconds (float): How long hanging calls wait
+        seed (Optional[int]): Seed for reproducible error sampling
+
+    Returns:
+        FastAPI: Stub application
+    """
+    app = FastAPI()
+    rng = random.Random(seed)
+    app.state.calls = 0
+
+    @app.post('/{path:path}')
+    async def webhook(path: str, request: Request):
+        app.state.calls += 1
+        body = await request.json()
+        roll = rng.random()
+        if roll < hang_rate:
+            await asyncio.sleep(hang_seconds)
+        await asyncio.sleep(latency.sample())
+        if roll < hang_rate + error_rate:
+            return JSONResponse(status_code=error_status, content={"message": "Workflow error"})
+        return {"response": f"Echo: {body.get('message', '')}"}
+
+    @app.get('/health')
+    async def health():
+        return Response(status_code=204)
+
+    return app
+
+# PostgREST filter operators supported by the stub
+OPERATORS: Dict[str, Callable[[Any, Any], bool]] = {
+    'eq': lambda a, b: a is not None and str(a) == b,
+    'neq': lambda a, b: a is None or str(a) != b,
+    'gt': lambda a, b: a is not None and str(a) > b,
+    'gte': lambda a, b: a is not None and str(a) >= b,
+    'lt': lambda a, b: a is not None and str(a) < b,
+    'lte': lambda a, b: a is not None and str(a) <= b,
+    'is': lambda a, b: (a is None) if b == 'null' else str(a).lower() == b,
+}
+RESERVED_PARAMS = {'select', 'order', 'limit', 'offset', 'or', 'on_conflict', 'columns'}
+Predicate = Callable[[Dict[str, Any]], bool]
+
+def _split_top_level(text: str) -> List[str]:
+    """Split on commas outside parentheses and double quotes."""
+    parts, depth, quoted, current = [], 0, False, []
+    for ch in text:
+        if ch == '"':
+            quoted = not quoted
+        elif not quoted and ch == '(':
+            depth += 1
+        elif not quoted and ch == ')':
+            depth -= 1
+        elif not quoted and depth == 0 and ch == ',':
+            parts.append(''.join(current))
+            current = []
+            continue
+        current.append(ch)
+    parts.append(''.join(current))
+    return parts
+
+def _unquote(value: str) -> str:
+    if len(value) >= 2 and value[0] == value[-1] == '"':
+        return value[1:-1].replace('\\"', '"')
+    return value
+
+def parse_condition(column: str, expression: str) -> Predicate:
+    """
+    Parse a single ``op.value`` filter on a column.
+
+    Args:
+        column (str): Column name
+        expression (str): Operator and value, e.g. ``eq.abc``
+
+    Returns:
+        Predicate: Row predicate
+    """
+    op, _, value = expression.partition('.')
+    if op == 'not':
+        inner = parse_condition(column, value)
+        return lambda row: not inner(row)
+    if op == 'in':
+        members = {_unquote(v) for v in _split_top_level(value[1:-1])}
+        return lambda row: str(row.get(column)) in members
+    compare = OPERATORS[op]
+    value = _unquote(value)
+    return lambda row: compare(row.get(column), value)
+
+def parse_logic(expression: str, combine: Callable = any) -> Predicate:
+    """
+    Parse a parenthesised ``or``/``and`` filter list.
+
+    Args:
+        expression (str): Filter list, e.g. ``(a.lt.1,and(a.eq.1,b.lt.2))``
+        combine (Callable): ``any`` for ``or`` lists, ``all`` for ``and`` lists
+
+    Returns:
+        Predicate: Row predicate
+    """
+    terms = []
+    for term in _split_top_level(expression.strip()[1:-1]):
+        match = re.match(r'^(and|or)(\(.*\))$', term)
+        if match:
+            terms.append(parse_logic(match.group(2), all if match.group(1) == 'and' else any))
+        else:
+            column, _, rest = term.partition('.')
+            terms.append(parse_condition(column, rest))
+    return lambda row: combine(t(row) for t in terms)
+
+class TableStore:
+    """
+    In-memory rows for the stub PostgREST, keyed by table name.
+
+    Rows are also indexed by ``session_id`` so per-session reads do not
+    scan the whole table and stub overhead stays flat as tables grow.
+    """
+
+    AUTO_IDS = {'chat_messages': 'message_id'}
+    INDEX_COLUMN = 'session_id'
+    SUMMARY_VIEW = 'chat_session_summaries'
+
+    def __init__(self):
+        self.tables: Dict[str, List[Dict[str, Any]]] = {}
+        self.indexes: Dict[str, Dict[Any, List[Dict[str, Any]]]] = {}
+        self._ids = itertools.count(1)
+
+    def rows(self, table: str, session_id: Optional[str] = None) -> List[Dict[str, Any]]:
+        if table == self.SUMMARY_VIEW:
+            return self._summaries(session_id)
+        if session_id is not None:
+            return self.indexes.get(table, {}).get(session_id, [])
+        return self.tables.setdefault(table, [])
+
+    def _summaries(self, session_id: Optional[str]) -> List[Dict[str, Any]]:
+        """Compute sql/chat_session_summaries.sql rows on read."""
+        summaries = []
+        for session in self.rows('chat_sessions', session_id):
+            messages = self.rows('chat_messages', session['session_id'])
+            last = max(messages, key=lambda m: (str(m.get('timestamp')), str(m.get('message_id'))), default=None)
+            summaries.append({
+                **session,
+                'message_count': len(messages),
+                'last_message': last['message'][:200] if last else None,
+                'last_sender': last['sender'] if last else None,
+                'last_activity': last['timestamp'] if last else session.get('started_at'),
+            })
+        return summaries
+
+    def _add(self, table: str, row: Dict[str, Any]) -> None:
+        self.rows(table).append(row)
+        self.indexes.setdefault(table, {}).setdefault(row.get(self.INDEX_COLUMN), []).append(row)
+
+    def remove(self, table: str, doomed: List[Dict[str, Any]]) -> None:
+        ids = {id(r) for r in doomed}
+        self.tables[table] = [r for r in self.rows(table) if id(r) not in ids]
+        index = self.indexes[table] = {}
+        for row in self.tables[table]:
+            index.setdefault(row.get(self.INDEX_COLUMN), []).append(row)
+
+    def _find(self, table: str, column: str, value: Any) -> Optional[Dict[str, Any]]:
+        candidates = self.rows(table, value) if column == self.INDEX_COLUMN else self.rows(table)
+        return next((r for r in candidates if r.get(column) == value), None)
+
+    def insert(self, table: str, rows: List[Dict[str, Any]], on_conflict: Optional[str], ignore_duplicates: bool) -> List[Dict[str, Any]]:
+        """Insert rows, merging or skipping rows that clash on ``on_conflict``."""
+        written = []
+        id_column = self.AUTO_IDS.get(table)
+        for row in rows:
+            row = dict(row)
+            if id_column and not row.get(id_column):
+                row[id_column] = f"{next(self._ids):012d}"
+            current = self._find(table, on_conflict, row.get(on_conflict)) if on_conflict else None
+            if current is not None:
+                if not ignore_duplicates:
+                    current.update(row)
+                    written.append(current)
+                continue
+            self._add(table, row)
+            written.append(row)
+        return written
+
+def _filters(request: Request) -> List[Predicate]:
+    predicates = []
+    for key, value in request.query_params.multi_items():
+        if key == 'or':
+            predicates.append(parse_logic(value, any))
+        elif key not in RESERVED_PARAMS:
+            predicates.append(parse_condition(key, value))
+    return predicates
+
+def _order(rows: List[Dict[str, Any]], request: Request) -> List[Dict[str, Any]]:
+    terms = [t for value in request.query_params.getlist('order') for t in value.split(',')]
+    for term in reversed(terms):
+        column, *modifiers = term.split('.')
+        rows.sort(key=lambda r: (r.get(column) is None, str(r.get(column))), reverse='desc' in modifiers)
+    return rows
+
+def create_postgrest_stub(latency: Optional[LatencyModel] = None) -> FastAPI:
+    """
+    Build a minimal in-memory PostgREST app.
+
+    Supports what the Supabase client sends for the chat tables: column
+    filters, ``or``/``and`` lists, ``order``, ``limit``, inserts, upserts
+    with ``on_conflict`` and updates. Every call is delayed by a sample
+    from ``latency`` to model the database round trip.
+
+    Args:
+        latency (Optional[LatencyModel]): Per-request delay distribution
+
+    Returns:
+        FastAPI: Stub application
+    """
+    app = FastAPI()
+    store = TableStore()
+    app.state.store = store
+    latency = latency or LatencyModel('const:0')
+
+    def select(table: str, request: Request) -> List[Dict[str, Any]]:
+        predicates = _filters(request)
+        session_filter = request.query_params.get(TableStore.INDEX_COLUMN, '')
+        session_id = session_filter[3:] if session_filter.startswith('eq.') else None
+        return [r for r in store.rows(table, session_id) if all(p(r) for p in predicates)]
+
+    @app.get('/rest/v1/{table}')
+    async def read(table: str, request: Request):
+        await asyncio.sleep(latency.sample())
+        rows = _order(select(table, request), request)
+        offset = int(request.query_params.get('offset', 0))
+        limit = request.query_params.get('limit')
+        rows = rows[offset:offset + int(limit)] if limit is not None else rows[offset:]
+        return JSONResponse(content=rows)
+
+    @app.post('/rest/v1/{table}')
+    async def create(table: str, request: Request):
+        await asyncio.sleep(latency.sample())
+        body = json.loads(await request.body() or b'[]')
+        rows = body if isinstance(body, list) else [body]
+        prefer = request.headers.get('prefer', '')
+        written = store.insert(
+            table,
+            rows,
+            on_conflict=request.query_params.get('on_conflict') if 'resolution=' in prefer else None,
+            ignore_duplicates='resolution=ignore-duplicates' in prefer
+        )
+        return JSONResponse(status_code=201, content=written)
+
+    @app.patch('/rest/v1/{table}')
+    async def update(table: str, request: Request):
+        await asyncio.sleep(latency.sample())
+        changes = await request.json()
+        rows = select(table, request)
+        for row in rows:
+            row.update(changes)
+        return JSONResponse(content=rows)
+
+    @app.delete('/rest/v1/{table}')
+    async def delete(table: str, request: Request):
+        await asyncio.sleep(latency.sample())
+        doomed = select(table, request)
+        store.remove(table, doomed)
+        return JSONResponse(content=doomed)
+
+    @app.get('/health')
+    async def health():
+        return Response(status_code=204)
+
+    return app
+
+def main(argv: Optional[List[str]] = None) -> None:
+    """Serve one stub: ``python -m benchmarks.stubs n8n|postgrest --port N``."""
+    import uvicorn
+
+    parser = argparse.ArgumentParser(description=main.__doc__)
+    parser.add_argument('kind', choices=['n8n', 'postgrest'])
+    parser.add_argument('--port', type=int, required=True)
+    parser.add_argument('--latency', default='const:0', help="Latency spec, e.g. lognormal:200:0.5")
+    parser.add_argument('--error-rate', type=float, default=0.0)
+    parser.add_argument('--error-status', type=int, default=500)
+    parser.add_argument('--hang-rate', type=float, default=0.0)
+    parser.add_argument('--hang-seconds', type=float, default=60.0)
+    parser.add_argument('--seed', type=int, default=None)
+    args = parser.parse_args(argv)
+
+    latency = LatencyModel(args.latency, seed=args.seed)
+    if args.kind == 'n8n':
+        app = create_n8n_stub(latency, args.error_rate, args.error_status, args.hang_rate, args.hang_seconds, args.seed)
+    else:
+        app = create_postgrest_stub(latency)
+    uvicorn.run(app, host='127.0.0.1', port=args.port, log_level='warning')
+
+if __name__ == '__main__':
+    main()
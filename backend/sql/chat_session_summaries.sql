@@ -0,0 +1,37 @@
+-- Per-session aggregates for session lists (GET /chat/sessions?summary=true).
+-- Apply in the Supabase SQL editor. The view is read through PostgREST
+-- like a table, so the backend's filters and keyset pagination apply
+-- unchanged and a whole page of summaries is one query.
+
+-- Serves both lateral lookups below with an index-only range scan per session
+create index if not exists chat_messages_session_timestamp_idx
+    on chat_messages (session_id, "timestamp" desc, message_id desc);
+
+-- Serves the user filter and (started_at, session_id) keyset pagination
+create index if not exists chat_sessions_user_started_idx
+    on chat_sessions (user_id, started_at, session_id);
+
+create or replace view chat_session_summaries
+with (security_invoker = on) as
+select
+    s.session_id,
+    s.user_id,
+    s.started_at,
+    s.ended_at,
+    coalesce(c.message_count, 0) as message_count,
+    left(l.message, 200) as last_message,
+    l.sender as last_sender,
+    coalesce(l."timestamp", s.started_at) as last_activity
+from chat_sessions s
+left join lateral (
+    select count(*) as message_count
+    from chat_messages m
+    where m.session_id = s.session_id
+) c on true
+left join lateral (
+    select m.message, m.sender, m."timestamp"
+    from chat_messages m
+    where m.session_id = s.session_id
+    order by m."timestamp" desc, m.message_id desc
+    limit 1
+) l on true;
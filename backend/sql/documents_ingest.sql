@@ -0,0 +1,20 @@
+-- Columns used by incremental ingestion (python -m app.services.ingest).
+-- Apply in the Supabase SQL editor. The documents table itself, with its
+-- content, metadata and embedding columns and the match_documents
+-- function, is the one the n8n Supabase Vector Store nodes already use.
+
+alter table documents add column if not exists source text;
+alter table documents add column if not exists content_hash text;
+
+-- Chunks are content-addressed: a hash is stored at most once, which
+-- lets repeated or concurrent runs insert with "on conflict do nothing"
+create unique index if not exists documents_content_hash_key
+    on documents (content_hash);
+
+-- Serves reading one source's hashes in keyset pages and deleting stale ones
+create index if not exists documents_source_hash_idx
+    on documents (source, content_hash);
+
+-- Rows inserted by the old n8n ingestion workflow have no hash and would
+-- be duplicated by the first run. Once that run has finished, remove them:
+-- delete from documents where content_hash is null;
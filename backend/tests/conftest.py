@@ -28,6 +28,17 @@ def test_client() -> Generator:
     with TestClient(app) as client:
         yield client
 
+@pytest.fixture
+def admin_headers() -> Generator:
+    """
+    Configure an admin token for the duration of a test.
+    
+    Yields:
+        dict: Headers carrying the token
+    """
+    with patch.dict('os.environ', {'ADMIN_TOKEN': 'test-admin-token'}):
+        yield {'X-Admin-Token': 'test-admin-token'}
+
 @pytest.fixture
 def mock_db_service():
     """
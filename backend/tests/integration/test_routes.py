@@ -3,16 +3,20 @@ Integration tests for API routes.
 Tests the complete request/response cycle with mocked external services.
 """
 
+import asyncio
 import pytest
 from unittest.mock import patch
 from fastapi.testclient import TestClient
+from starlette.websockets import WebSocketDisconnect
 from datetime import datetime, timezone
 
-<<<<<<< HEAD
+from app.models.chat import ChatMessage, ChatSession, ChatSessionSummary
+from app.services.pagination import decode_cursor, encode_cursor
+from app.services.admission import AdmissionRejected
+from app.services.embeddings import HashingEmbedder
+from app.services.faq import FAQService
+
 from ..conftest import (
-=======
-from conftest import (
->>>>>>> c1f9070ccb7a29111fee9de0911e64545c5cae06
     TEST_SESSION_ID,
     TEST_USER_ID,
     TEST_MESSAGE,
@@ -69,12 +73,192 @@ class TestChatEndpoints:
             assert_json_response(response, 500)
             assert "something went wrong" in response.json()["detail"]
 
+    def test_chat_message_busy(self, test_client, mock_db_service, mock_n8n_service):
+        """Test a saturated n8n is rejected fast with Retry-After"""
+        mock_n8n_service.check_admission.side_effect = AdmissionRejected('queue_full', 503, 3)
+
+        with patch('app.routes.db_service', mock_db_service), \
+             patch('app.routes.n8n_service', mock_n8n_service):
+
+            response = test_client.post(
+                "/chat/message",
+                json={
+                    "sessionId": TEST_SESSION_ID,
+                    "message": TEST_MESSAGE
+                }
+            )
+
+            assert_json_response(response, 503)
+            assert response.headers["Retry-After"] == "3"
+            mock_db_service.save_message.assert_not_called()
+            mock_n8n_service.send_message.assert_not_called()
+
+    def test_chat_message_busy_after_storing(self, test_client, mock_db_service, mock_n8n_service):
+        """Test a late busy rejection stores no apology next to the user message"""
+        mock_n8n_service.send_message.side_effect = AdmissionRejected('queue_timeout', 503, 3)
+
+        with patch('app.routes.db_service', mock_db_service), \
+             patch('app.routes.n8n_service', mock_n8n_service):
+
+            response = test_client.post("/chat/message", json={"sessionId": TEST_SESSION_ID, "message": TEST_MESSAGE})
+
+            assert_json_response(response, 503)
+            mock_db_service.save_message.assert_awaited_once_with(TEST_SESSION_ID, 'user', TEST_MESSAGE)
+
+    def test_chat_message_apology_save_fails(self, test_client, mock_db_service, mock_n8n_service):
+        """Test a failing apology write still answers with the turn error"""
+        mock_n8n_service.send_message.side_effect = Exception("N8N Error")
+        mock_db_service.save_message.side_effect = [None, Exception("DB Error")]
+
+        with patch('app.routes.db_service', mock_db_service), \
+             patch('app.routes.n8n_service', mock_n8n_service):
+
+            response = test_client.post("/chat/message", json={"sessionId": TEST_SESSION_ID, "message": TEST_MESSAGE})
+
+            assert_json_response(response, 500)
+            assert "something went wrong" in response.json()["detail"]
+
+    def test_chat_message_faq_answer(self, test_client, mock_db_service, mock_n8n_service):
+        """Test a confident FAQ match is answered without calling n8n"""
+        faq = FAQService(HashingEmbedder(), threshold=0.5)
+        asyncio.run(faq.load([{'questions': [TEST_MESSAGE], 'answer': 'Hello from the FAQ'}]))
+
+        with patch('app.routes.db_service', mock_db_service), \
+             patch('app.routes.n8n_service', mock_n8n_service), \
+             patch('app.services.chat.faq_service', faq):
+
+            response = test_client.post(
+                "/chat/message",
+                json={
+                    "sessionId": TEST_SESSION_ID,
+                    "message": TEST_MESSAGE
+                }
+            )
+
+            assert_json_response(response, 200)
+            assert response.json()["response"] == "Hello from the FAQ"
+            assert response.json()["source"] == "faq"
+            mock_db_service.save_message.assert_called_with(TEST_SESSION_ID, 'bot', 'Hello from the FAQ')
+            mock_n8n_service.send_message.assert_not_called()
+            mock_n8n_service.check_admission.assert_not_called()
+
+    def test_chat_message_stream(self, test_client, mock_db_service, mock_n8n_service):
+        """Test streamed reply is relayed as SSE and persisted once assembled"""
+        async def fake_stream(session_id, message):
+            for piece in ("Hello", " there"):
+                yield piece
+        mock_n8n_service.stream_message = fake_stream
+        
+        with patch('app.routes.db_service', mock_db_service), \
+             patch('app.routes.n8n_service', mock_n8n_service):
+            
+            response = test_client.post(
+                "/chat/message/stream",
+                json={
+                    "sessionId": TEST_SESSION_ID,
+                    "message": TEST_MESSAGE
+                }
+            )
+
+            assert response.status_code == 200
+            assert response.headers["content-type"].startswith("text/event-stream")
+            assert response.text.count("event: token") == 2
+            assert '"response": "Hello there"' in response.text
+            mock_db_service.save_message.assert_called_with(TEST_SESSION_ID, 'bot', 'Hello there')
+
+    def test_chat_message_stream_faq_skips_admission(self, test_client, mock_db_service, mock_n8n_service):
+        """Test FAQ hits stream while n8n is saturated and misses get a busy event before anything is stored"""
+        faq = FAQService(HashingEmbedder(), threshold=0.5)
+        asyncio.run(faq.load([{'questions': [TEST_MESSAGE], 'answer': 'Hello from the FAQ'}]))
+        mock_n8n_service.check_admission.side_effect = AdmissionRejected('queue_full', 503, 7)
+
+        with patch('app.routes.db_service', mock_db_service), \
+             patch('app.routes.n8n_service', mock_n8n_service), \
+             patch('app.services.streaming.faq_service', faq):
+
+            hit = test_client.post("/chat/message/stream", json={"sessionId": TEST_SESSION_ID, "message": TEST_MESSAGE})
+
+            assert hit.status_code == 200
+            assert '"response": "Hello from the FAQ"' in hit.text
+            mock_n8n_service.check_admission.assert_not_called()
+
+            mock_db_service.save_message.reset_mock()
+            miss = test_client.post("/chat/message/stream", json={"sessionId": TEST_SESSION_ID, "message": "Something else"})
+
+            assert "event: error" in miss.text
+            assert '"retryAfter": 7' in miss.text
+            mock_db_service.save_message.assert_not_called()
+
+class TestChatJobs:
+    """Test suite for chat turns run as background jobs."""
+
+    def test_async_message_returns_job_and_long_polls(self, test_client, mock_db_service, mock_n8n_service):
+        """Test job mode answers 202 at once and the result can be long-polled"""
+        with patch('app.services.jobs.db_service', mock_db_service), \
+             patch('app.services.jobs.n8n_service', mock_n8n_service):
+
+            response = test_client.post(
+                "/chat/message?async=true",
+                json={"sessionId": TEST_SESSION_ID, "message": TEST_MESSAGE}
+            )
+            assert_json_response(response, 202)
+            job = response.json()
+            assert response.headers["Location"] == f"/chat/jobs/{job['id']}"
+
+            result = test_client.get(f"/chat/jobs/{job['id']}?wait=5")
+
+        assert_json_response(result, 200)
+        assert result.json()["status"] == "done"
+        assert result.json()["result"]["response"] == "Test response"
+        mock_n8n_service.send_message.assert_called_once()
+
+    def test_idempotency_key_resumes_job(self, test_client, mock_db_service, mock_n8n_service):
+        """Test resending a keyed request returns the same job without a second turn"""
+        with patch('app.services.jobs.db_service', mock_db_service), \
+             patch('app.services.jobs.n8n_service', mock_n8n_service):
+            request = dict(
+                json={"sessionId": TEST_SESSION_ID, "message": TEST_MESSAGE},
+                headers={"Prefer": "respond-async", "Idempotency-Key": "turn-1"}
+            )
+            first = test_client.post("/chat/message", **request).json()
+            test_client.get(f"/chat/jobs/{first['id']}?wait=5")
+            second = test_client.post("/chat/message", **request).json()
+
+        assert second["id"] == first["id"]
+        assert second["status"] == "done"
+        mock_n8n_service.send_message.assert_called_once()
+
+    def test_unknown_job(self, test_client):
+        """Test polling an unknown job answers 404"""
+        response = test_client.get("/chat/jobs/missing")
+        assert_json_response(response, 404)
+
+    def test_job_result_pushed_to_socket(self, test_client, mock_db_service, mock_n8n_service):
+        """Test a finished job is delivered to the session's WebSockets"""
+        with patch('app.services.jobs.db_service', mock_db_service), \
+             patch('app.services.jobs.n8n_service', mock_n8n_service):
+            with test_client.websocket_connect("/ws/chat") as websocket:
+                websocket.send_json({"type": "join", "sessionId": TEST_SESSION_ID})
+                websocket.send_json({"type": "pong"})
+                job = test_client.post(
+                    "/chat/message?async=true",
+                    json={"sessionId": TEST_SESSION_ID, "message": TEST_MESSAGE}
+                ).json()
+                pushed = websocket.receive_json()
+                websocket.send_json({"type": "job", "jobId": job["id"]})
+                resumed = websocket.receive_json()
+
+        assert pushed["type"] == "job"
+        assert pushed["jobId"] == job["id"]
+        assert pushed["result"]["response"] == "Test response"
+        assert resumed["status"] == "done"
+
 class TestSessionEndpoints:
     """Test suite for session-related endpoints."""
 
     def test_get_chat_sessions(self, test_client, mock_db_service):
         """Test retrieving chat sessions"""
-        mock_db_service.client.table().select().eq().order().execute.return_value.data = [SAMPLE_CHAT_SESSION]
+        mock_db_service.get_user_sessions.return_value = [ChatSession(**SAMPLE_CHAT_SESSION)]
         
         with patch('app.routes.db_service', mock_db_service):
             response = test_client.get(f"/chat/sessions?user_id={TEST_USER_ID}")
@@ -84,6 +268,24 @@ class TestSessionEndpoints:
             assert len(sessions) == 1
             assert sessions[0]["session_id"] == TEST_SESSION_ID
 
+    def test_get_chat_sessions_summary(self, test_client, mock_db_service):
+        """Test summaries come from the aggregate query in one call"""
+        mock_db_service.get_user_session_summaries.return_value = [ChatSessionSummary(
+            **SAMPLE_CHAT_SESSION, message_count=4, last_message="Bye", last_sender="bot",
+            last_activity="2024-01-01T00:05:00+00:00"
+        )]
+
+        with patch('app.routes.db_service', mock_db_service):
+            response = test_client.get(f"/chat/sessions?user_id={TEST_USER_ID}&summary=true")
+
+            assert_json_response(response, 200)
+            session = response.json()["sessions"][0]
+            assert session["message_count"] == 4
+            assert session["last_message"] == "Bye"
+            assert session["last_activity"].startswith("2024-01-01T00:05:00")
+            mock_db_service.get_user_sessions.assert_not_called()
+            mock_db_service.get_session_messages.assert_not_called()
+
     def test_get_chat_sessions_missing_user(self, test_client):
         """Test sessions request without user_id"""
         response = test_client.get("/chat/sessions")
@@ -91,7 +293,7 @@ class TestSessionEndpoints:
 
     def test_get_chat_messages(self, test_client, mock_db_service):
         """Test retrieving chat messages"""
-        mock_db_service.get_session_messages.return_value = [SAMPLE_CHAT_MESSAGE]
+        mock_db_service.get_session_messages.return_value = [ChatMessage(**SAMPLE_CHAT_MESSAGE)]
         
         with patch('app.routes.db_service', mock_db_service):
             response = test_client.get(f"/chat/messages/{TEST_SESSION_ID}")
@@ -101,6 +303,78 @@ class TestSessionEndpoints:
             assert len(messages) == 1
             assert messages[0]["message"] == TEST_MESSAGE
 
+    def test_get_chat_messages_paginated(self, test_client, mock_db_service):
+        """Test a limited page reports more history and cursors"""
+        rows = [ChatMessage(message_id=str(i), sender='user', message=f"m{i}", timestamp=f"2024-01-01T00:00:0{i}+00:00") for i in range(3)]
+        mock_db_service.get_session_messages.return_value = rows
+        
+        with patch('app.routes.db_service', mock_db_service):
+            response = test_client.get(f"/chat/messages/{TEST_SESSION_ID}?limit=2")
+            
+            assert_json_response(response, 200)
+            body = response.json()
+            assert [m["message"] for m in body["messages"]] == ["m1", "m2"]
+            assert body["has_more"] is True
+            assert mock_db_service.get_session_messages.call_args[1]["limit"] == 3
+            assert decode_cursor(body["cursors"]["before"]) == ("2024-01-01T00:00:01+00:00", "1")
+
+    def test_get_chat_messages_rejects_crafted_cursor(self, test_client, mock_db_service):
+        """Test a cursor whose tiebreak is not a plain ID is refused"""
+        cursor = encode_cursor("2024-01-01T00:00:00+00:00", {"or": "(sender.eq.bot)"})
+        
+        with patch('app.routes.db_service', mock_db_service):
+            response = test_client.get(f"/chat/messages/{TEST_SESSION_ID}?before={cursor}")
+            
+            assert_json_response(response, 400)
+            mock_db_service.get_session_messages.assert_not_called()
+
+    def test_get_chat_messages_since(self, test_client, mock_db_service):
+        """Test incremental fetch passes the since bound through"""
+        mock_db_service.get_session_messages.return_value = []
+        
+        with patch('app.routes.db_service', mock_db_service):
+            response = test_client.get(f"/chat/messages/{TEST_SESSION_ID}?since=2024-01-01T00:00:00Z")
+            
+            assert_json_response(response, 200)
+            assert response.json()["messages"] == []
+            assert mock_db_service.get_session_messages.call_args[1]["since"] == "2024-01-01T00:00:00Z"
+
+    def test_get_chat_messages_trusted_rows(self, test_client, mock_db_service):
+        """Test trusted rows are returned without building models"""
+        mock_db_service.get_session_message_rows.return_value = [
+            {"message_id": "1", "sender": "user", "message": TEST_MESSAGE, "timestamp": "2024-01-01T00:00:00+00:00"}
+        ]
+
+        with patch('app.routes.db_service', mock_db_service), \
+             patch('app.routes.HISTORY_TRUSTED_ROWS', True):
+            response = test_client.get(f"/chat/messages/{TEST_SESSION_ID}")
+
+            assert_json_response(response, 200)
+            assert response.json()["messages"][0]["timestamp"] == "2024-01-01T00:00:00+00:00"
+            mock_db_service.get_session_messages.assert_not_called()
+
+    def test_get_chat_messages_streamed(self, test_client, mock_db_service):
+        """Test large histories are streamed as one JSON document"""
+        rows = [ChatMessage(message_id=str(i), sender='user', message=f"m{i}", timestamp="2024-01-01T00:00:00+00:00") for i in range(5)]
+        mock_db_service.get_session_messages.return_value = rows
+
+        with patch('app.routes.db_service', mock_db_service), \
+             patch('app.routes.HISTORY_STREAM_THRESHOLD', 2), \
+             patch('app.routes.HISTORY_STREAM_CHUNK', 2):
+            response = test_client.get(f"/chat/messages/{TEST_SESSION_ID}")
+
+            assert_json_response(response, 200)
+            body = response.json()
+            assert [m["message"] for m in body["messages"]] == [f"m{i}" for i in range(5)]
+            assert body["has_more"] is False
+
+    def test_get_chat_messages_invalid_cursor(self, test_client, mock_db_service):
+        """Test malformed cursors are rejected"""
+        with patch('app.routes.db_service', mock_db_service):
+            response = test_client.get(f"/chat/messages/{TEST_SESSION_ID}?before=not-a-cursor")
+            
+            assert_json_response(response, 400)
+
     def test_end_chat_session_success(self, test_client, mock_db_service):
         """Test successfully ending a chat session"""
         mock_db_service.end_session.return_value = True
@@ -121,6 +395,200 @@ class TestSessionEndpoints:
             assert_json_response(response, 404)
             assert "Session not found" in response.json()["detail"]
 
+class TestWebSocketEndpoint:
+    """Test suite for chat turns over the WebSocket."""
+
+    def test_message_frame_replies_on_socket(self, test_client, mock_db_service, mock_n8n_service):
+        """Test a message frame runs a full turn and echoes the request ID"""
+        with patch('app.socket_events.db_service', mock_db_service), \
+             patch('app.socket_events.n8n_service', mock_n8n_service):
+            with test_client.websocket_connect("/ws/chat") as websocket:
+                websocket.send_json({"type": "join", "sessionId": TEST_SESSION_ID})
+                websocket.send_json({"type": "message", "message": TEST_MESSAGE, "requestId": "req-1"})
+                reply = websocket.receive_json()
+
+        assert reply["type"] == "message"
+        assert reply["sender"] == "bot"
+        assert reply["message"] == "Test response"
+        assert reply["requestId"] == "req-1"
+        mock_db_service.get_or_create_session.assert_called_once_with(TEST_SESSION_ID)
+        assert mock_db_service.save_message.call_count == 2
+
+    def test_message_frame_error(self, test_client, mock_db_service, mock_n8n_service):
+        """Test n8n failures are reported on the socket"""
+        mock_n8n_service.send_message.side_effect = Exception("N8N Error")
+        with patch('app.socket_events.db_service', mock_db_service), \
+             patch('app.socket_events.n8n_service', mock_n8n_service):
+            with test_client.websocket_connect("/ws/chat") as websocket:
+                websocket.send_json({"type": "join", "sessionId": TEST_SESSION_ID})
+                websocket.send_json({"type": "message", "message": TEST_MESSAGE, "requestId": "req-2"})
+                reply = websocket.receive_json()
+
+        assert reply["type"] == "error"
+        assert reply["requestId"] == "req-2"
+        assert "something went wrong" in reply["detail"]
+
+    def test_message_frame_busy(self, test_client, mock_db_service, mock_n8n_service):
+        """Test a saturated n8n answers the socket with a retry hint"""
+        mock_n8n_service.check_admission.side_effect = AdmissionRejected('queue_full', 503, 3)
+        with patch('app.socket_events.db_service', mock_db_service), \
+             patch('app.socket_events.n8n_service', mock_n8n_service):
+            with test_client.websocket_connect("/ws/chat") as websocket:
+                websocket.send_json({"type": "join", "sessionId": TEST_SESSION_ID})
+                websocket.send_json({"type": "message", "message": TEST_MESSAGE, "requestId": "req-3"})
+                reply = websocket.receive_json()
+
+        assert reply["type"] == "error"
+        assert reply["retryAfter"] == 3
+        mock_n8n_service.send_message.assert_not_called()
+
+    def test_socket_without_join_frame_is_closed(self, test_client):
+        """Test a client that never joins is closed after the idle timeout"""
+        from app.socket_events import manager
+
+        with patch.object(manager, 'idle_timeout', 0.05):
+            with test_client.websocket_connect("/ws/chat") as websocket:
+                with pytest.raises(WebSocketDisconnect) as exc_info:
+                    websocket.receive_json()
+
+        assert exc_info.value.code == 1008
+
+class TestAdminEndpoints:
+    """Test suite for admin endpoints."""
+
+    def test_flush_response_cache(self, test_client, admin_headers):
+        """Test flushing the answer cache"""
+        from app.services.n8n import n8n_service
+        n8n_service.response_cache.set("hours", '{"response": "9-5"}')
+        
+        response = test_client.delete("/admin/cache", headers=admin_headers)
+        
+        assert_json_response(response, 200)
+        assert response.json()["removed"] == 1
+        assert len(n8n_service.response_cache) == 0
+
+    def test_export_ndjson(self, test_client, mock_db_service, admin_headers):
+        """Test the export streams sessions and messages as NDJSON"""
+        async def sessions(*args):
+            yield SAMPLE_CHAT_SESSION
+
+        async def messages(*args):
+            yield SAMPLE_CHAT_MESSAGE
+
+        mock_db_service.iter_sessions.side_effect = sessions
+        mock_db_service.iter_session_messages.side_effect = messages
+
+        with patch('app.routes.db_service', mock_db_service):
+            response = test_client.get(f"/admin/export?user_id={TEST_USER_ID}&state=ended&from=2024-01-01",
+                                       headers=admin_headers)
+
+        assert response.status_code == 200
+        assert response.headers["content-type"].startswith("application/x-ndjson")
+        lines = response.text.splitlines()
+        assert [line.split('"type":"')[1].split('"')[0] for line in lines] == ["session", "message"]
+        assert mock_db_service.iter_sessions.call_args[0][:4] == (TEST_USER_ID, "2024-01-01T00:00:00", None, "ended")
+
+    def test_export_rejects_bad_filters(self, test_client, admin_headers):
+        """Test invalid dates and states are rejected before streaming"""
+        assert test_client.get("/admin/export?from=yesterday", headers=admin_headers).status_code == 400
+        assert test_client.get("/admin/export?state=archived", headers=admin_headers).status_code == 422
+
+    def test_service_stats(self, test_client, admin_headers):
+        """Test the stats endpoint reports admission metrics"""
+        response = test_client.get("/admin/stats", headers=admin_headers)
+
+        assert_json_response(response, 200)
+        assert "queue_depth" in response.json()["n8n_admission"]
+        assert "hits" in response.json()["response_cache"]
+
+    def test_admin_token_required_when_configured(self, test_client):
+        """Test admin endpoints reject a wrong token"""
+        with patch.dict('os.environ', {'ADMIN_TOKEN': 'secret'}):
+            response = test_client.delete("/admin/cache", headers={"X-Admin-Token": "wrong"})
+            assert_json_response(response, 403)
+            response = test_client.get("/admin/cache", headers={"X-Admin-Token": "secret"})
+            assert_json_response(response, 200)
+
+    def test_admin_endpoints_closed_without_token(self, test_client):
+        """Test admin endpoints refuse every request while no token is configured"""
+        with patch.dict('os.environ', {'ADMIN_TOKEN': ''}):
+            for path in ("/admin/export", "/admin/stats", "/admin/cache", "/admin/profiles"):
+                assert_json_response(test_client.get(path, headers={"X-Admin-Token": ""}), 403)
+
+class TestMetricsEndpoint:
+    """Test suite for the metrics endpoint."""
+
+    def test_metrics_after_chat_turn(self, test_client, mock_db_service, mock_n8n_service):
+        """Test stage latencies and gauges are exposed in Prometheus format"""
+        with patch('app.routes.db_service', mock_db_service), \
+             patch('app.routes.n8n_service', mock_n8n_service):
+            test_client.post("/chat/message", json={"sessionId": TEST_SESSION_ID, "message": TEST_MESSAGE})
+
+        response = test_client.get("/metrics")
+
+        assert response.status_code == 200
+        assert response.headers["content-type"].startswith("text/plain")
+        assert 'chat_stage_duration_seconds_count{stage="n8n"}' in response.text
+        assert 'chat_stage_duration_seconds_count{stage="serialize"}' in response.text
+        assert "ws_active_connections" in response.text
+        assert "n8n_in_flight_calls" in response.text
+
+    def test_server_timing_on_chat_message(self, test_client, mock_db_service, mock_n8n_service):
+        """Test chat replies break down db, n8n and app time"""
+        with patch('app.routes.db_service', mock_db_service), \
+             patch('app.routes.n8n_service', mock_n8n_service):
+            response = test_client.post("/chat/message", json={"sessionId": TEST_SESSION_ID, "message": TEST_MESSAGE})
+
+        timing = response.headers["server-timing"]
+        for name in ("db;dur=", "n8n;dur=", "app;dur=", "total;dur="):
+            assert name in timing
+
+    def test_server_timing_on_history(self, test_client, mock_db_service):
+        """Test history reads carry a Server-Timing header"""
+        mock_db_service.get_session_messages.return_value = [ChatMessage(**SAMPLE_CHAT_MESSAGE)]
+
+        with patch('app.routes.db_service', mock_db_service):
+            response = test_client.get(f"/chat/messages/{TEST_SESSION_ID}")
+
+        assert "db;dur=" in response.headers["server-timing"]
+
+    def test_profile_on_request(self, test_client, mock_db_service, admin_headers):
+        """Test X-Profile requests return a downloadable profile"""
+        mock_db_service.get_session_messages.return_value = []
+
+        with patch('app.routes.db_service', mock_db_service):
+            response = test_client.get(f"/chat/messages/{TEST_SESSION_ID}", headers={"X-Profile": "1", **admin_headers})
+
+        profile_id = response.headers["x-profile-id"]
+        listing = test_client.get("/admin/profiles", headers=admin_headers).json()["profiles"]
+        assert listing[0]["id"] == profile_id
+        assert listing[0]["path"] == f"/chat/messages/{TEST_SESSION_ID}"
+        assert test_client.get(f"/admin/profiles/{profile_id}", headers=admin_headers).status_code == 200
+        assert test_client.get("/admin/profiles/unknown", headers=admin_headers).status_code == 404
+
+    def test_profile_header_ignored_without_token(self, test_client, mock_db_service):
+        """Test clients cannot trigger profiling while no admin token is configured"""
+        mock_db_service.get_session_messages.return_value = []
+
+        with patch('app.routes.db_service', mock_db_service), patch.dict('os.environ', {'ADMIN_TOKEN': ''}):
+            response = test_client.get(f"/chat/messages/{TEST_SESSION_ID}", headers={"X-Profile": "1"})
+
+        assert response.status_code == 200
+        assert "x-profile-id" not in response.headers
+
+class TestRequestIds:
+    """Test suite for request correlation IDs."""
+
+    def test_request_id_generated(self, test_client):
+        """Test every response carries a request ID"""
+        response = test_client.get("/health")
+        assert len(response.headers["x-request-id"]) == 32
+
+    def test_request_id_propagated(self, test_client):
+        """Test a client request ID is echoed back"""
+        response = test_client.get("/health", headers={"X-Request-ID": "client-abc-123"})
+        assert response.headers["x-request-id"] == "client-abc-123"
+
 class TestHealthEndpoint:
     """Test suite for health check endpoint."""
 
@@ -0,0 +1,74 @@
+"""
+Unit tests for admission control.
+Tests slot limits, queueing, rejection and statistics in isolation.
+"""
+
+import asyncio
+import pytest
+
+from app.services.admission import AdmissionController, AdmissionRejected
+
+class TestAdmissionController:
+    """Test suite for AdmissionController."""
+
+    @pytest.mark.asyncio
+    async def test_admits_up_to_limit(self):
+        """Test callers within max_in_flight are admitted immediately"""
+        admission = AdmissionController(max_in_flight=2, max_queue=0)
+
+        await admission.acquire()
+        await admission.acquire()
+
+        assert admission.in_flight == 2
+        assert admission.saturated()
+
+    @pytest.mark.asyncio
+    async def test_rejects_when_queue_full(self):
+        """Test callers beyond the queue are rejected straight away"""
+        admission = AdmissionController(max_in_flight=1, max_queue=0, retry_after=7, status_code=429)
+        await admission.acquire()
+
+        with pytest.raises(AdmissionRejected) as exc_info:
+            await admission.acquire()
+
+        assert exc_info.value.reason == 'queue_full'
+        assert exc_info.value.status_code == 429
+        assert exc_info.value.retry_after == 7
+        assert admission.stats()['rejected_queue_full'] == 1
+
+    @pytest.mark.asyncio
+    async def test_rejects_after_queue_timeout(self):
+        """Test queued callers give up after queue_timeout"""
+        admission = AdmissionController(max_in_flight=1, max_queue=1, queue_timeout=0.01)
+        await admission.acquire()
+
+        with pytest.raises(AdmissionRejected) as exc_info:
+            await admission.acquire()
+
+        assert exc_info.value.reason == 'queue_timeout'
+        assert admission.queue_depth == 0
+        assert admission.stats()['rejected_timeout'] == 1
+
+    @pytest.mark.asyncio
+    async def test_release_hands_slot_to_oldest_waiter(self):
+        """Test a released slot goes to queued callers in FIFO order"""
+        admission = AdmissionController(max_in_flight=1, max_queue=2)
+        await admission.acquire()
+        order = []
+
+        async def waiter(name):
+            async with admission.slot():
+                order.append(name)
+
+        tasks = [asyncio.create_task(waiter("first")), asyncio.create_task(waiter("second"))]
+        await asyncio.sleep(0)
+        assert admission.queue_depth == 2
+
+        admission.release()
+        await asyncio.gather(*tasks)
+
+        assert order == ["first", "second"]
+        assert admission.in_flight == 0
+        stats = admission.stats()
+        assert stats['admitted'] == 3
+        assert stats['max_wait_ms'] > 0
@@ -0,0 +1,85 @@
+"""
+Unit tests for the benchmark suite.
+Tests the stub servers and latency summaries the benchmarks rely on.
+"""
+
+from fastapi.testclient import TestClient
+
+from app.services.pagination import keyset_filter
+from benchmarks.load import LatencyRecorder, percentile
+from benchmarks.stubs import LatencyModel, create_n8n_stub, create_postgrest_stub
+
+class TestBenchmarkStubs:
+    """Test suite for the benchmark stand-ins."""
+
+    def test_postgrest_stub_keyset_page(self):
+        """Test the PostgREST stub honours the filters the backend sends"""
+        client = TestClient(create_postgrest_stub())
+        client.post('/rest/v1/chat_messages', json=[
+            {'session_id': 's1', 'sender': 'user', 'message': str(i), 'timestamp': f"2024-01-01T00:00:0{i}+00:00"}
+            for i in range(5)
+        ] + [{'session_id': 's2', 'sender': 'user', 'message': 'other', 'timestamp': '2024-01-01T00:00:09+00:00'}])
+
+        cursor = ('2024-01-01T00:00:03+00:00', '000000000004')
+        response = client.get('/rest/v1/chat_messages', params=[
+            ('select', '*'),
+            ('session_id', 'eq.s1'),
+            ('or', keyset_filter('timestamp', 'message_id', cursor, 'lt')),
+            ('order', 'timestamp.desc'),
+            ('order', 'message_id.desc'),
+            ('limit', '2'),
+        ])
+
+        assert [r['message'] for r in response.json()] == ['2', '1']
+
+    def test_postgrest_stub_upsert_ignores_duplicates(self):
+        """Test upserts with ignore-duplicates keep the first row"""
+        client = TestClient(create_postgrest_stub())
+        headers = {'Prefer': 'return=representation,resolution=ignore-duplicates'}
+        for user in ('first', 'second'):
+            client.post('/rest/v1/chat_sessions', params={'on_conflict': 'session_id'}, headers=headers,
+                        json={'session_id': 's1', 'user_id': user})
+
+        rows = client.get('/rest/v1/chat_sessions', params={'session_id': 'eq.s1'}).json()
+        assert [r['user_id'] for r in rows] == ['first']
+
+    def test_postgrest_stub_session_summaries(self):
+        """Test the summary view aggregates messages per session"""
+        client = TestClient(create_postgrest_stub())
+        client.post('/rest/v1/chat_sessions', json=[
+            {'session_id': 's1', 'user_id': 'u', 'started_at': '2024-01-01T00:00:00+00:00'},
+            {'session_id': 's2', 'user_id': 'u', 'started_at': '2024-01-02T00:00:00+00:00'},
+        ])
+        client.post('/rest/v1/chat_messages', json=[
+            {'session_id': 's1', 'sender': 'user', 'message': 'hi', 'timestamp': '2024-01-01T00:00:01+00:00'},
+            {'session_id': 's1', 'sender': 'bot', 'message': 'hello', 'timestamp': '2024-01-01T00:00:02+00:00'},
+        ])
+
+        rows = client.get('/rest/v1/chat_session_summaries', params={'user_id': 'eq.u', 'order': 'started_at'}).json()
+
+        assert [(r['message_count'], r['last_message']) for r in rows] == [(2, 'hello'), (0, None)]
+        assert rows[1]['last_activity'] == '2024-01-02T00:00:00+00:00'
+
+    def test_n8n_stub_error_rate(self):
+        """Test the n8n stub fails the configured fraction of calls"""
+        client = TestClient(create_n8n_stub(LatencyModel('const:0'), error_rate=1.0, error_status=502))
+
+        response = client.post('/webhook/bench', json={'sessionId': 's1', 'message': 'hi'})
+
+        assert response.status_code == 502
+
+    def test_latency_summary(self):
+        """Test percentiles and throughput in the recorder summary"""
+        recorder = LatencyRecorder('test')
+        for ms in range(1, 101):
+            recorder.record(ms / 1000)
+        recorder.record_error('RuntimeError')
+        recorder.stop()
+
+        summary = recorder.summary()
+
+        assert percentile([], 50) == 0.0
+        assert summary['p50_ms'] == 50.0
+        assert summary['p99_ms'] == 99.0
+        assert summary['errors'] == 1
+        assert summary['ok'] == 100
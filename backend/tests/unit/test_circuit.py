@@ -0,0 +1,77 @@
+"""
+Unit tests for the circuit breaker.
+Tests state transitions and probing in isolation.
+"""
+
+import time
+import pytest
+
+from app.services.circuit import CircuitBreaker, CircuitOpen
+
+class TestCircuitBreaker:
+    """Test suite for CircuitBreaker."""
+
+    def test_opens_after_consecutive_failures(self):
+        """Test the circuit opens once the failure threshold is reached"""
+        breaker = CircuitBreaker(failure_threshold=3, recovery_timeout=30)
+
+        breaker.record_failure()
+        breaker.record_failure()
+        breaker.record_success()
+        breaker.record_failure()
+        breaker.record_failure()
+        assert breaker.state == 'closed'
+
+        breaker.record_failure()
+        assert breaker.state == 'open'
+
+    def test_open_circuit_fails_fast(self):
+        """Test calls are rejected with a retry hint while open"""
+        breaker = CircuitBreaker(failure_threshold=1, recovery_timeout=30, status_code=503)
+        breaker.record_failure()
+
+        with pytest.raises(CircuitOpen) as exc_info:
+            breaker.before_call()
+
+        assert exc_info.value.status_code == 503
+        assert 1 <= exc_info.value.retry_after <= 30
+        assert breaker.stats()['short_circuited'] == 1
+
+    def test_half_open_probe_closes_circuit(self):
+        """Test a successful probe after the cool-down closes the circuit"""
+        breaker = CircuitBreaker(failure_threshold=1, recovery_timeout=0.01, half_open_max_calls=1)
+        breaker.record_failure()
+        time.sleep(0.02)
+
+        assert breaker.state == 'half_open'
+        breaker.before_call()
+        with pytest.raises(CircuitOpen):
+            breaker.before_call()
+
+        breaker.record_success()
+        assert breaker.state == 'closed'
+        breaker.before_call()
+
+    def test_failed_probe_reopens_circuit(self):
+        """Test a failed probe starts a new cool-down"""
+        breaker = CircuitBreaker(failure_threshold=5, recovery_timeout=0.01)
+        for _ in range(5):
+            breaker.record_failure()
+        time.sleep(0.02)
+
+        breaker.before_call()
+        breaker.record_failure()
+
+        assert breaker.state == 'open'
+        assert breaker.stats()['times_opened'] == 2
+
+    def test_released_probe_frees_slot(self):
+        """Test a probe that ended without a verdict can be retried"""
+        breaker = CircuitBreaker(failure_threshold=1, recovery_timeout=0.01)
+        breaker.record_failure()
+        time.sleep(0.02)
+
+        breaker.before_call()
+        breaker.release_probe()
+
+        assert breaker.allows_calls()
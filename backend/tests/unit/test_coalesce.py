@@ -0,0 +1,83 @@
+"""
+Unit tests for single-flight request coalescing.
+Tests result sharing, error propagation and cancellation in isolation.
+"""
+
+import asyncio
+import pytest
+
+from app.services.coalesce import SingleFlight
+
+class TestSingleFlight:
+    """Test suite for SingleFlight."""
+
+    @pytest.mark.asyncio
+    async def test_concurrent_callers_share_one_call(self):
+        """Test identical concurrent calls run once and get independent copies"""
+        flight = SingleFlight()
+        calls = 0
+
+        async def upstream():
+            nonlocal calls
+            calls += 1
+            await asyncio.sleep(0.01)
+            return {"response": "shared"}
+
+        results = await asyncio.gather(*(flight.do("key", upstream) for _ in range(5)))
+
+        assert calls == 1
+        assert all(r == {"response": "shared"} for r in results)
+        assert results[0] is not results[1]
+        assert flight.coalesced == 4
+        assert flight.in_flight == 0
+
+    @pytest.mark.asyncio
+    async def test_error_propagates_to_every_caller(self):
+        """Test all waiters see the upstream exception"""
+        flight = SingleFlight()
+
+        async def upstream():
+            await asyncio.sleep(0.01)
+            raise RuntimeError("upstream down")
+
+        results = await asyncio.gather(*(flight.do("key", upstream) for _ in range(3)), return_exceptions=True)
+
+        assert all(isinstance(r, RuntimeError) for r in results)
+        assert flight.in_flight == 0
+
+    @pytest.mark.asyncio
+    async def test_cancelled_caller_does_not_cancel_others(self):
+        """Test one cancelled waiter leaves the shared call running"""
+        flight = SingleFlight()
+
+        async def upstream():
+            await asyncio.sleep(0.02)
+            return "done"
+
+        first = asyncio.create_task(flight.do("key", upstream))
+        second = asyncio.create_task(flight.do("key", upstream))
+        await asyncio.sleep(0)
+        first.cancel()
+
+        assert await second == "done"
+        with pytest.raises(asyncio.CancelledError):
+            await first
+
+    @pytest.mark.asyncio
+    async def test_last_cancelled_caller_cancels_call(self):
+        """Test the upstream call is cancelled when nobody is waiting"""
+        flight = SingleFlight()
+        started = asyncio.Event()
+
+        async def upstream():
+            started.set()
+            await asyncio.sleep(10)
+
+        caller = asyncio.create_task(flight.do("key", upstream))
+        await started.wait()
+        caller.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await caller
+        await asyncio.sleep(0)
+
+        assert flight.in_flight == 0
@@ -0,0 +1,293 @@
+"""
+Unit tests for the WebSocket connection manager.
+Tests fan-out, slow-consumer policies, heartbeats and broken socket cleanup in isolation.
+"""
+
+import asyncio
+import pytest
+from unittest.mock import AsyncMock, Mock
+from starlette.websockets import WebSocketState
+
+from app.socket_events import Connection, ConnectionManager
+from app.services.broadcast import InMemoryBroadcastBus, RedisBroadcastBus
+from ..conftest import TEST_SESSION_ID
+
+def make_socket(send_json=None) -> Mock:
+    """Create a mock WebSocket that is already accepted."""
+    websocket = Mock()
+    websocket.client_state = WebSocketState.CONNECTED
+    websocket.send_json = send_json or AsyncMock()
+    websocket.close = AsyncMock()
+    return websocket
+
+class TestConnectionManager:
+    """Test suite for ConnectionManager."""
+
+    @pytest.mark.asyncio
+    async def test_slow_socket_does_not_block_others(self):
+        """Test a stalled connection does not delay delivery to the rest"""
+        manager = ConnectionManager()
+        stalled = asyncio.Event()
+
+        async def never_finishes(message):
+            await stalled.wait()
+        slow, fast = make_socket(never_finishes), make_socket()
+        await manager.connect(slow, TEST_SESSION_ID)
+        await manager.connect(fast, TEST_SESSION_ID)
+
+        await manager.broadcast_to_session({'type': 'typing'}, TEST_SESSION_ID)
+        await asyncio.sleep(0.01)
+
+        fast.send_json.assert_awaited_once_with({'type': 'typing'})
+        manager.disconnect(slow, TEST_SESSION_ID)
+        manager.disconnect(fast, TEST_SESSION_ID)
+        await asyncio.sleep(0.01)
+
+    @pytest.mark.asyncio
+    async def test_broken_socket_is_removed(self):
+        """Test a failing send removes and closes the connection"""
+        manager = ConnectionManager()
+        broken = make_socket(AsyncMock(side_effect=RuntimeError("gone")))
+        await manager.connect(broken, TEST_SESSION_ID)
+
+        await manager.broadcast_to_session({'type': 'typing'}, TEST_SESSION_ID)
+        await asyncio.sleep(0.01)
+
+        assert TEST_SESSION_ID not in manager.sessions
+        assert broken not in manager.connections
+        broken.close.assert_awaited_once()
+
+    @pytest.mark.asyncio
+    async def test_coalesce_policy_replaces_queued_typing(self):
+        """Test a full queue keeps only the latest typing event"""
+        manager = ConnectionManager(send_queue_size=2, slow_consumer_policy='coalesce')
+        connection = Connection(make_socket(), TEST_SESSION_ID, manager)
+        connection.enqueue({'type': 'typing', 'sender': 'a'})
+        connection.enqueue({'type': 'token', 'delta': 'x'})
+        connection.enqueue({'type': 'typing', 'sender': 'b'})
+
+        assert list(connection.queue) == [{'type': 'typing', 'sender': 'b'}, {'type': 'token', 'delta': 'x'}]
+        assert connection.dropped == 1
+        connection.close()
+
+    @pytest.mark.asyncio
+    async def test_drop_policy_discards_oldest(self):
+        """Test a full queue drops its oldest message"""
+        manager = ConnectionManager(send_queue_size=2, slow_consumer_policy='drop')
+        connection = Connection(make_socket(), TEST_SESSION_ID, manager)
+        for i in range(3):
+            connection.enqueue({'type': 'token', 'delta': str(i)})
+
+        assert [m['delta'] for m in connection.queue] == ['1', '2']
+        connection.close()
+
+    @pytest.mark.asyncio
+    async def test_disconnect_policy_reports_broken(self):
+        """Test a full queue hands the socket back under the disconnect policy"""
+        manager = ConnectionManager(send_queue_size=1, slow_consumer_policy='disconnect')
+        manager.drop = Mock()
+        connection = Connection(make_socket(), TEST_SESSION_ID, manager)
+        connection.enqueue({'type': 'token'})
+
+        assert connection.enqueue({'type': 'token'}) is False
+        manager.drop.assert_called_once_with(connection, code=1011)
+        connection.task.cancel()
+
+    @pytest.mark.asyncio
+    async def test_heartbeat_pings_and_closes_silent_connections(self):
+        """Test the heartbeat closes silent sockets and pings the others"""
+        manager = ConnectionManager(idle_timeout=60)
+        quiet, chatty = make_socket(), make_socket()
+        await manager.connect(quiet, TEST_SESSION_ID)
+        await manager.connect(chatty, TEST_SESSION_ID)
+        manager.connections[quiet].last_seen -= 120
+
+        assert manager.heartbeat() == 1
+        await asyncio.sleep(0.01)
+
+        quiet.close.assert_awaited_once_with(code=1001)
+        chatty.send_json.assert_awaited_once_with({'type': 'ping'})
+        assert manager.idle_closed == 1
+
+    @pytest.mark.asyncio
+    async def test_touch_keeps_connection_alive(self):
+        """Test a frame from the client resets the idle clock"""
+        manager = ConnectionManager(idle_timeout=60)
+        websocket = make_socket()
+        await manager.connect(websocket, TEST_SESSION_ID)
+        manager.connections[websocket].last_seen -= 120
+
+        manager.touch(websocket)
+
+        assert manager.heartbeat() == 0
+        await asyncio.sleep(0.01)
+        assert websocket in manager.connections
+        websocket.send_json.assert_awaited_once_with({'type': 'ping'})
+
+    @pytest.mark.asyncio
+    async def test_session_cap_evicts_oldest(self):
+        """Test connecting past the per-session cap closes the oldest socket"""
+        manager = ConnectionManager(max_per_session=2)
+        sockets = [make_socket() for _ in range(3)]
+        for websocket in sockets:
+            await manager.connect(websocket, TEST_SESSION_ID)
+        await asyncio.sleep(0.01)
+
+        sockets[0].close.assert_awaited_once_with(code=1001)
+        assert [c.websocket for c in manager.sessions[TEST_SESSION_ID]] == sockets[1:]
+        assert manager.evicted == 1
+
+class FakeRedis:
+    """Minimal in-process stand-in for a redis.asyncio client with pub/sub."""
+
+    def __init__(self, server: list, failures: int = 0):
+        self.server = server
+        self.failures = failures
+
+    def pubsub(self):
+        pubsub = FakePubSub(broken=self.failures > 0)
+        self.failures -= 1
+        self.server.append(pubsub)
+        return pubsub
+
+    async def publish(self, channel, data):
+        for pubsub in self.server:
+            if channel in pubsub.channels:
+                pubsub.queue.put_nowait({'type': 'message', 'channel': channel, 'data': data})
+
+    async def close(self):
+        pass
+
+class FakePubSub:
+    """Subscription side of FakeRedis."""
+
+    def __init__(self, broken: bool = False):
+        self.channels = set()
+        self.queue = asyncio.Queue()
+        self.broken = broken
+
+    async def subscribe(self, channel):
+        self.channels.add(channel)
+
+    async def unsubscribe(self, channel):
+        self.channels.discard(channel)
+
+    async def listen(self):
+        if self.broken:
+            raise ConnectionError("Connection closed by server")
+        while True:
+            yield await self.queue.get()
+
+    async def close(self):
+        pass
+
+class TestBroadcastBus:
+    """Test suite for cross-process broadcast delivery."""
+
+    @pytest.mark.asyncio
+    async def test_in_memory_bus_reaches_other_managers(self):
+        """Test a broadcast on one node reaches sockets on another"""
+        hub = []
+        node_a = ConnectionManager(InMemoryBroadcastBus(hub))
+        node_b = ConnectionManager(InMemoryBroadcastBus(hub))
+        await node_a.start()
+        await node_b.start()
+        local, remote = make_socket(), make_socket()
+        await node_a.connect(local, TEST_SESSION_ID)
+        await node_b.connect(remote, TEST_SESSION_ID)
+
+        await node_a.broadcast_to_session({'type': 'typing'}, TEST_SESSION_ID)
+        await asyncio.sleep(0.01)
+
+        local.send_json.assert_awaited_once_with({'type': 'typing'})
+        remote.send_json.assert_awaited_once_with({'type': 'typing'})
+        await node_a.stop()
+        await node_b.stop()
+
+    @pytest.mark.asyncio
+    async def test_redis_bus_publishes_once_and_skips_own_messages(self):
+        """Test Redis pub/sub delivery across nodes without echo"""
+        server = []
+        bus_a = RedisBroadcastBus('redis://fake', client=FakeRedis(server))
+        bus_b = RedisBroadcastBus('redis://fake', client=FakeRedis(server))
+        received_a, received_b = AsyncMock(), AsyncMock()
+        await bus_a.start(received_a)
+        await bus_b.start(received_b)
+
+        await bus_a.publish(TEST_SESSION_ID, {'type': 'typing'})
+        await asyncio.sleep(0.01)
+
+        received_b.assert_awaited_once_with(TEST_SESSION_ID, {'type': 'typing'})
+        received_a.assert_not_awaited()
+        assert bus_a.published == 1
+        await bus_a.stop()
+        await bus_b.stop()
+
+    @pytest.mark.asyncio
+    async def test_redis_bus_resubscribes_after_connection_loss(self):
+        """Test the listener reconnects instead of dying with the connection"""
+        server = []
+        bus_a = RedisBroadcastBus('redis://fake', client=FakeRedis(server))
+        bus_b = RedisBroadcastBus('redis://fake', client=FakeRedis(server, failures=2), retry_backoff=0.001)
+        received = AsyncMock()
+        await bus_a.start(AsyncMock())
+        await bus_b.start(received)
+        await asyncio.sleep(0.02)
+
+        await bus_a.publish(TEST_SESSION_ID, {'type': 'typing'})
+        await asyncio.sleep(0.01)
+
+        received.assert_awaited_once_with(TEST_SESSION_ID, {'type': 'typing'})
+        assert bus_b.reconnects == 2
+        await bus_a.stop()
+        await bus_b.stop()
+
+    @pytest.mark.asyncio
+    async def test_close_idle_connections(self):
+        """Test only silent connections are closed"""
+        manager = ConnectionManager()
+        quiet, chatty = make_socket(), make_socket()
+        await manager.connect(quiet, TEST_SESSION_ID)
+        await manager.connect(chatty, TEST_SESSION_ID)
+        manager.connections[quiet].last_seen -= 120
+
+        assert manager.close_idle(60) == 1
+        await asyncio.sleep(0.01)
+
+        quiet.close.assert_awaited_once_with(code=1001)
+        assert manager.active_session_ids() == {TEST_SESSION_ID}
+        assert chatty in manager.connections
+
+    @pytest.mark.asyncio
+    async def test_close_sessions_notifies_and_closes(self):
+        """Test sockets of ended sessions get a notice and are closed"""
+        manager = ConnectionManager()
+        websocket = make_socket()
+        await manager.connect(websocket, TEST_SESSION_ID)
+
+        assert manager.close_sessions([TEST_SESSION_ID, 'other']) == 1
+        await asyncio.sleep(0.01)
+
+        assert websocket.send_json.call_args[0][0]['status'] == 'ended'
+        websocket.close.assert_awaited_once_with(code=1000)
+        assert manager.active_session_ids() == set()
+
+    @pytest.mark.asyncio
+    async def test_end_sessions_closes_sockets_on_other_nodes(self):
+        """Test ending a session reaches sockets held by another node"""
+        hub = []
+        node_a = ConnectionManager(InMemoryBroadcastBus(hub))
+        node_b = ConnectionManager(InMemoryBroadcastBus(hub))
+        await node_a.start()
+        await node_b.start()
+        remote = make_socket()
+        await node_b.connect(remote, TEST_SESSION_ID)
+
+        assert await node_a.end_sessions([TEST_SESSION_ID]) == 0
+        await asyncio.sleep(0.01)
+
+        assert remote.send_json.call_args[0][0]['status'] == 'ended'
+        remote.close.assert_awaited_once_with(code=1000)
+        assert node_b.active_session_ids() == set()
+        await node_a.stop()
+        await node_b.stop()
@@ -3,11 +3,16 @@ Unit tests for database service.
 Tests database operations in isolation.
 """
 
+import asyncio
+import threading
+import httpx
 import pytest
 from unittest.mock import Mock, patch
 from datetime import datetime, timezone
 
 from app.services.database import DatabaseService
+from app.services.executor import BoundedExecutor
+from app.services.pagination import keyset_filter
 from ..conftest import (
     TEST_SESSION_ID,
     TEST_USER_ID,
@@ -30,29 +35,52 @@ class TestDatabaseService:
         with patch('app.services.database.create_client', return_value=mock_supabase):
             return DatabaseService('test_url', 'test_key')
 
-    def test_get_or_create_session_existing(self, db_service, mock_supabase):
-        """Test retrieving existing session"""
-        mock_supabase.table().select().eq().execute.return_value.data = [SAMPLE_CHAT_SESSION]
+    @pytest.mark.asyncio
+    async def test_get_or_create_session_existing(self, db_service, mock_supabase):
+        """Test that a known session costs no database round trip"""
+        await db_service.get_or_create_session(TEST_SESSION_ID)
+        mock_supabase.table.reset_mock()
         
-        db_service.get_or_create_session(TEST_SESSION_ID)
+        await db_service.get_or_create_session(TEST_SESSION_ID)
         
-        mock_supabase.table.assert_called_with('chat_sessions')
+        mock_supabase.table.assert_not_called()
         mock_supabase.table().insert.assert_not_called()
 
-    def test_get_or_create_session_new(self, db_service, mock_supabase):
-        """Test creating new session"""
-        mock_supabase.table().select().eq().execute.return_value.data = []
+    @pytest.mark.asyncio
+    async def test_get_or_create_session_new(self, db_service, mock_supabase):
+        """Test creating new session with an idempotent upsert"""
+        await db_service.get_or_create_session(TEST_SESSION_ID)
         
-        db_service.get_or_create_session(TEST_SESSION_ID)
+        mock_supabase.table.assert_called_with('chat_sessions')
+        mock_supabase.table().select.assert_not_called()
+        mock_supabase.table().upsert.assert_called_once()
+        upsert_data = mock_supabase.table().upsert.call_args[0][0]
+        assert upsert_data['session_id'] == TEST_SESSION_ID
+        assert upsert_data['user_id'].startswith('user_')
+        assert mock_supabase.table().upsert.call_args[1]['ignore_duplicates'] is True
+
+    @pytest.mark.asyncio
+    async def test_end_session_invalidates_known_session(self, db_service, mock_supabase):
+        """Test that ending a session evicts it from the known-session cache"""
+        await db_service.get_or_create_session(TEST_SESSION_ID)
+        await db_service.end_session(TEST_SESSION_ID)
         
-        mock_supabase.table().insert.assert_called_once()
-        insert_data = mock_supabase.table().insert.call_args[0][0]
-        assert insert_data['session_id'] == TEST_SESSION_ID
-        assert insert_data['user_id'].startswith('user_')
+        assert TEST_SESSION_ID not in db_service.known_sessions
 
-    def test_save_message(self, db_service, mock_supabase):
+    @pytest.mark.asyncio
+    async def test_known_sessions_bounded(self, db_service, mock_supabase):
+        """Test that the known-session cache evicts the least recently used ID"""
+        db_service.known_sessions.maxsize = 2
+        for session_id in ('a', 'b', 'c'):
+            await db_service.get_or_create_session(session_id)
+        
+        assert 'a' not in db_service.known_sessions
+        assert len(db_service.known_sessions) == 2
+
+    @pytest.mark.asyncio
+    async def test_save_message(self, db_service, mock_supabase):
         """Test saving chat message"""
-        db_service.save_message(TEST_SESSION_ID, 'user', TEST_MESSAGE)
+        await db_service.save_message(TEST_SESSION_ID, 'user', TEST_MESSAGE)
         
         mock_supabase.table.assert_called_with('chat_messages')
         mock_supabase.table().insert.assert_called_once()
@@ -61,21 +89,180 @@ class TestDatabaseService:
         assert insert_data['sender'] == 'user'
         assert insert_data['message'] == TEST_MESSAGE
 
-    def test_get_session_messages(self, db_service, mock_supabase):
+    @pytest.mark.asyncio
+    async def test_get_session_messages(self, db_service, mock_supabase):
         """Test retrieving session messages"""
         mock_supabase.table().select().eq().order().execute.return_value.data = [SAMPLE_CHAT_MESSAGE]
         
-        messages = db_service.get_session_messages(TEST_SESSION_ID)
+        messages = await db_service.get_session_messages(TEST_SESSION_ID)
         
         assert len(messages) == 1
         assert messages[0].message == TEST_MESSAGE
         assert messages[0].sender == 'user'
 
-    def test_end_session(self, db_service, mock_supabase):
+    @pytest.mark.asyncio
+    async def test_get_session_message_rows(self, db_service, mock_supabase):
+        """Test raw rows are projected to the message fields"""
+        row = {**SAMPLE_CHAT_MESSAGE, 'session_id': TEST_SESSION_ID}
+        mock_supabase.table().select().eq().order().execute.return_value.data = [row]
+
+        rows = await db_service.get_session_message_rows(TEST_SESSION_ID)
+
+        assert rows == [{k: SAMPLE_CHAT_MESSAGE.get(k) for k in ('message_id', 'sender', 'message', 'timestamp')}]
+
+    @pytest.mark.asyncio
+    async def test_get_user_session_summaries(self, db_service, mock_supabase):
+        """Test summaries are read from the aggregate view in one query"""
+        row = {**SAMPLE_CHAT_SESSION, 'message_count': 2, 'last_message': 'Bye', 'last_sender': 'bot',
+               'last_activity': '2024-01-01T00:05:00+00:00'}
+        mock_supabase.table().select().eq().order().execute.return_value.data = [row]
+        mock_supabase.table.reset_mock()
+
+        summaries = await db_service.get_user_session_summaries(TEST_USER_ID)
+
+        mock_supabase.table.assert_called_once_with('chat_session_summaries')
+        assert summaries[0].message_count == 2
+        assert summaries[0].last_message == 'Bye'
+
+    @pytest.mark.asyncio
+    async def test_end_sessions_batched(self, db_service, mock_supabase):
+        """Test several sessions are ended with one update and leave the cache"""
+        await db_service.get_or_create_session('a')
+        update = mock_supabase.table().update().in_().is_()
+        update.execute.return_value.data = [{'session_id': 'a'}]
+        mock_supabase.table.reset_mock()
+
+        ended = await db_service.end_sessions(['a', 'b'])
+
+        assert ended == ['a']
+        mock_supabase.table.assert_called_once_with('chat_sessions')
+        mock_supabase.table().update().in_.assert_called_with('session_id', ['a', 'b'])
+        assert 'a' not in db_service.known_sessions
+
+    @pytest.mark.asyncio
+    async def test_iter_sessions_pages_by_keyset(self, db_service, mock_supabase):
+        """Test session iteration follows the last row of each full page"""
+        pages = [
+            [{'session_id': 'a', 'started_at': '2024-01-01T00:00:00+00:00'},
+             {'session_id': 'b', 'started_at': '2024-01-02T00:00:00+00:00'}],
+            [{'session_id': 'c', 'started_at': '2024-01-03T00:00:00+00:00'}],
+        ]
+        query = mock_supabase.table().select().eq().order().order().limit()
+        query.execute.side_effect = [Mock(data=page) for page in pages]
+
+        rows = [row async for row in db_service.iter_sessions(user_id=TEST_USER_ID, page_size=2)]
+
+        assert [r['session_id'] for r in rows] == ['a', 'b', 'c']
+        assert query.execute.call_count == 2
+
+    @pytest.mark.asyncio
+    async def test_end_session(self, db_service, mock_supabase):
         """Test ending chat session"""
-        mock_supabase.table().update().eq().execute.return_value.data = [SAMPLE_CHAT_SESSION]
+        mock_supabase.table.return_value.update.return_value.eq.return_value.execute.return_value.data = [SAMPLE_CHAT_SESSION]
         
-        result = db_service.end_session(TEST_SESSION_ID)
+        result = await db_service.end_session(TEST_SESSION_ID)
         
         assert result is True
         mock_supabase.table().update.assert_called_once()
+
+    @pytest.mark.asyncio
+    async def test_calls_run_on_executor(self, db_service, mock_supabase):
+        """Test that queries are dispatched through the bounded executor"""
+        mock_supabase.table().select().eq().order().execute.return_value.data = []
+        await db_service.save_message(TEST_SESSION_ID, 'user', TEST_MESSAGE)
+        await db_service.get_session_messages(TEST_SESSION_ID)
+
+        stats = db_service.stats()
+        assert stats['submitted'] == 2
+        assert stats['completed'] == 2
+        assert stats['in_flight'] == 0
+
+    @pytest.mark.asyncio
+    async def test_executor_failure_is_counted(self, db_service, mock_supabase):
+        """Test that failing queries propagate and are counted"""
+        mock_supabase.table.side_effect = RuntimeError("boom")
+
+        with pytest.raises(RuntimeError):
+            await db_service.end_session(TEST_SESSION_ID)
+
+        assert db_service.stats()['failed'] == 1
+
+    @pytest.mark.asyncio
+    async def test_cancelled_waiter_is_not_counted(self):
+        """Test a caller cancelled while queued for the executor leaves no waiting count behind"""
+        executor = BoundedExecutor(max_workers=1)
+        release = threading.Event()
+        running = asyncio.ensure_future(executor.run(release.wait))
+        await asyncio.sleep(0.01)
+        queued = asyncio.ensure_future(executor.run(lambda: None))
+        await asyncio.sleep(0.01)
+        assert executor.stats()['waiting'] == 1
+
+        queued.cancel()
+        await asyncio.gather(queued, return_exceptions=True)
+        release.set()
+        await running
+
+        assert executor.stats()['waiting'] == 0
+        assert executor.stats()['in_flight'] == 0
+        await executor.run(lambda: None)
+        executor.shutdown()
+
+    @pytest.mark.asyncio
+    async def test_write_behind_overlay(self, mock_supabase):
+        """Test that unflushed messages are returned with stored ones"""
+        with patch.dict('os.environ', {'DB_WRITE_BEHIND': 'true', 'DB_WRITE_BEHIND_INTERVAL': '60'}), \
+             patch('app.services.database.create_client', return_value=mock_supabase):
+            service = DatabaseService('test_url', 'test_key')
+        mock_supabase.table().select().eq().order().execute.return_value.data = [SAMPLE_CHAT_MESSAGE]
+        
+        await service.save_message(TEST_SESSION_ID, 'bot', 'Queued reply')
+        messages = await service.get_session_messages(TEST_SESSION_ID)
+        
+        assert [m.message for m in messages] == [TEST_MESSAGE, 'Queued reply']
+        mock_supabase.table().insert.assert_not_called()
+        
+        await service.shutdown()
+        mock_supabase.table().insert.assert_called_once()
+
+    @pytest.mark.asyncio
+    async def test_get_session_messages_before_cursor(self, db_service, mock_supabase):
+        """Test a backward page is queried newest-first and returned oldest-first"""
+        query = mock_supabase.table.return_value.select.return_value.eq.return_value
+        query.params = httpx.QueryParams()
+        newer = dict(SAMPLE_CHAT_MESSAGE, message_id='2', message='newer')
+        older = dict(SAMPLE_CHAT_MESSAGE, message_id='1', message='older')
+        query.order.return_value.order.return_value.limit.return_value.execute.return_value.data = [newer, older]
+        
+        messages = await db_service.get_session_messages(TEST_SESSION_ID, limit=2, before=('2024-01-01T00:00:00+00:00', '3'))
+        
+        assert [m.message for m in messages] == ['older', 'newer']
+        query.order.assert_called_with('timestamp', desc=True)
+        assert keyset_filter('timestamp', 'message_id', ('t', '1),or(sender.eq.bot'), 'lt') == \
+            '(timestamp.lt."t",and(timestamp.eq."t",message_id.lt."1),or(sender.eq.bot"))'
+        assert query.params['or'] == '(timestamp.lt."2024-01-01T00:00:00+00:00",and(timestamp.eq."2024-01-01T00:00:00+00:00",message_id.lt."3"))'
+
+    @pytest.mark.asyncio
+    async def test_iter_document_hashes_pages_by_hash(self, db_service, mock_supabase):
+        """Test stored hashes are read in keyset pages without content or embeddings"""
+        query = mock_supabase.table.return_value.select.return_value.eq.return_value
+        query.order.return_value.limit.return_value.execute.return_value.data = [{'content_hash': 'a'}, {'content_hash': 'b'}]
+        query.gt.return_value.order.return_value.limit.return_value.execute.return_value.data = [{'content_hash': 'c'}]
+        
+        hashes = [h async for h in db_service.iter_document_hashes('kb', page_size=2)]
+        
+        assert hashes == ['a', 'b', 'c']
+        mock_supabase.table.return_value.select.assert_called_with('content_hash')
+        query.gt.assert_called_once_with('content_hash', 'b')
+
+    @pytest.mark.asyncio
+    async def test_document_writes_are_single_requests(self, db_service, mock_supabase):
+        """Test chunks are inserted ignoring known hashes and deleted by hash"""
+        await db_service.upsert_documents([{'content': 'x', 'content_hash': 'h1'}])
+        await db_service.delete_documents('kb', ['h2', 'h3'])
+        await db_service.delete_documents('kb', [])
+        
+        assert mock_supabase.table().upsert.call_args[1]['on_conflict'] == 'content_hash'
+        assert mock_supabase.table().upsert.call_args[1]['ignore_duplicates'] is True
+        mock_supabase.table().delete().eq.assert_called_once_with('source', 'kb')
+        mock_supabase.table().delete().eq().in_.assert_called_once_with('content_hash', ['h2', 'h3'])
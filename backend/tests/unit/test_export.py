@@ -0,0 +1,74 @@
+"""
+Unit tests for the export service.
+Tests record order, NDJSON encoding and gzip output.
+"""
+
+import gzip
+import json
+
+import pytest
+
+from app.services.export import export_records, gzip_chunks, ndjson_chunks, parse_timestamp
+
+class FakeDatabase:
+    """Serves fixed sessions and messages through the iterator interface."""
+
+    def __init__(self, sessions, messages):
+        self.sessions = sessions
+        self.messages = messages
+        self.calls = []
+
+    async def iter_sessions(self, user_id, started_from, started_to, state, page_size):
+        self.calls.append((user_id, started_from, started_to, state, page_size))
+        for session in self.sessions:
+            yield session
+
+    async def iter_session_messages(self, session_id, page_size):
+        for message in self.messages.get(session_id, []):
+            yield message
+
+async def collect(chunks):
+    return b''.join([chunk async for chunk in chunks])
+
+class TestExport:
+    """Test suite for the export helpers."""
+
+    @pytest.fixture
+    def db(self):
+        return FakeDatabase(
+            [{'session_id': 's1', 'user_id': 'u'}, {'session_id': 's2', 'user_id': 'u'}],
+            {'s1': [{'message_id': '1', 'message': 'hi'}, {'message_id': '2', 'message': 'hello'}]}
+        )
+
+    @pytest.mark.asyncio
+    async def test_sessions_followed_by_messages(self, db):
+        """Test each session is followed by its own messages"""
+        data = await collect(ndjson_chunks(export_records(db, user_id='u', state='ended'), chunk_bytes=10))
+
+        records = [json.loads(line) for line in data.splitlines()]
+        assert [(r['type'], r.get('message_id') or r['session_id']) for r in records] == [
+            ('session', 's1'), ('message', '1'), ('message', '2'), ('session', 's2')
+        ]
+        assert db.calls == [('u', None, None, 'ended', 500)]
+
+    @pytest.mark.asyncio
+    async def test_sessions_only(self, db):
+        """Test messages can be left out"""
+        data = await collect(ndjson_chunks(export_records(db, include_messages=False)))
+        assert len(data.splitlines()) == 2
+
+    @pytest.mark.asyncio
+    async def test_gzip_round_trip(self, db):
+        """Test gzipped output decompresses to the plain export"""
+        plain = await collect(ndjson_chunks(export_records(db)))
+        compressed = await collect(gzip_chunks(ndjson_chunks(export_records(db))))
+
+        assert gzip.decompress(compressed) == plain
+
+    def test_parse_timestamp(self):
+        """Test dates are normalized and invalid values rejected"""
+        assert parse_timestamp('2024-01-01') == '2024-01-01T00:00:00'
+        assert parse_timestamp('2024-01-01T10:00:00Z') == '2024-01-01T10:00:00+00:00'
+        assert parse_timestamp(None) is None
+        with pytest.raises(ValueError):
+            parse_timestamp('yesterday')
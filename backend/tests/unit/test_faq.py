@@ -0,0 +1,148 @@
+"""
+Unit tests for the FAQ fast path.
+Tests the local embedder, top-k search, the confidence threshold and atomic reloads in isolation.
+"""
+
+import json
+import threading
+import numpy as np
+import pytest
+from unittest.mock import AsyncMock
+
+from app.services.embeddings import HashingEmbedder, normalize_rows
+from app.services.faq import FAQIndex, FAQService, load_faq_entries
+
+ENTRIES = [
+    {'questions': ['How much does shipping cost?', 'What are your shipping costs?'], 'answer': 'Shipping is free over $50.'},
+    {'questions': ['Do you offer wholesale pricing?'], 'answer': 'Yes, wholesale accounts get tiered pricing.'},
+    {'questions': ['What is your return policy?'], 'answer': 'Unworn items can be returned within 30 days.'},
+]
+
+class TestHashingEmbedder:
+    """Test suite for HashingEmbedder."""
+
+    @pytest.mark.asyncio
+    async def test_deterministic_unit_vectors(self):
+        """Test the same text always embeds to the same unit vector"""
+        embedder = HashingEmbedder(dimension=64)
+        first = await embedder.embed(['Titanium labret studs', ''])
+        second = await HashingEmbedder(dimension=64).embed(['Titanium labret studs'])
+
+        assert first.shape == (2, 64)
+        assert first.dtype == np.float32
+        np.testing.assert_allclose(first[0], second[0])
+        assert np.linalg.norm(first[0]) == pytest.approx(1.0)
+        assert not first[1].any()
+
+    def test_normalize_rows_keeps_zero_rows(self):
+        """Test normalization scales rows to unit length without dividing by zero"""
+        rows = normalize_rows(np.array([[3.0, 4.0], [0.0, 0.0]]))
+        np.testing.assert_allclose(rows, [[0.6, 0.8], [0.0, 0.0]])
+
+class TestFAQIndex:
+    """Test suite for FAQIndex."""
+
+    def test_top_k_best_first_one_per_answer(self):
+        """Test search ranks by cosine and collapses paraphrases of one answer"""
+        matrix = normalize_rows(np.array([[1, 0, 0], [0.9, 0.1, 0], [0, 1, 0], [0, 0, 1]]))
+        index = FAQIndex(['a1', 'a2', 'b', 'c'], [0, 0, 1, 2], ['A', 'B', 'C'], matrix)
+
+        matches = index.search(normalize_rows(np.array([[1, 0.5, 0]]))[0], k=2)
+
+        assert [m['answer'] for m in matches] == ['A', 'B']
+        assert matches[0]['question'] == 'a2'
+        assert matches[0]['score'] > matches[1]['score']
+
+    def test_empty_index(self):
+        """Test an empty index finds nothing"""
+        assert FAQIndex.empty().search(np.ones(3, dtype=np.float32)) == []
+
+class TestFAQService:
+    """Test suite for FAQService."""
+
+    @pytest.mark.asyncio
+    async def test_confident_match_is_answered(self):
+        """Test a reworded known question is answered and an unrelated one is not"""
+        faq = FAQService(HashingEmbedder(), threshold=0.5)
+        await faq.load(ENTRIES)
+
+        hit = await faq.answer('how much does shipping cost??')
+        miss = await faq.answer('Do you sell nose rings in gold?')
+
+        assert hit['response'] == 'Shipping is free over $50.'
+        assert hit['source'] == 'faq'
+        assert miss is None
+        assert (faq.hits, faq.misses) == (1, 1)
+
+    @pytest.mark.asyncio
+    async def test_query_vectors_are_cached(self):
+        """Test a repeated question is not embedded again"""
+        embedder = HashingEmbedder()
+        faq = FAQService(embedder, threshold=0.5)
+        await faq.load(ENTRIES)
+        embedder.embed = AsyncMock(wraps=embedder.embed)
+
+        await faq.answer('What is your return policy?')
+        await faq.answer('what is your RETURN policy? ')
+
+        assert embedder.embed.await_count == 1
+
+    @pytest.mark.asyncio
+    async def test_queries_embed_their_cache_key(self):
+        """Test the vector cached under a normalized question is that question's embedding"""
+        embedder = HashingEmbedder()
+        faq = FAQService(embedder, threshold=0.5)
+        await faq.load(ENTRIES)
+        embedder.embed = AsyncMock(wraps=embedder.embed)
+
+        await faq.answer('  What is your RETURN   policy?? ')
+
+        embedder.embed.assert_awaited_once_with(['what is your return policy'])
+
+    @pytest.mark.asyncio
+    async def test_local_index_is_built_off_the_event_loop(self):
+        """Test a reload embeds the FAQ on an executor thread"""
+        embedder = HashingEmbedder()
+        embed_sync = embedder.embed_sync
+        threads = []
+        embedder.embed_sync = lambda texts: threads.append(threading.current_thread()) or embed_sync(texts)
+
+        await FAQService(embedder).load(ENTRIES)
+
+        assert threads and threads[0] is not threading.current_thread()
+
+    @pytest.mark.asyncio
+    async def test_empty_service_never_embeds(self):
+        """Test the fast path costs nothing when no FAQ is loaded"""
+        embedder = HashingEmbedder()
+        embedder.embed = AsyncMock()
+        faq = FAQService(embedder)
+
+        assert await faq.answer('How much does shipping cost?') is None
+        embedder.embed.assert_not_awaited()
+
+    @pytest.mark.asyncio
+    async def test_reload_swaps_index_and_keeps_it_on_failure(self, tmp_path):
+        """Test a reload replaces the index whole and a bad file leaves it serving"""
+        path = tmp_path / 'faq.json'
+        path.write_text(json.dumps([{'question': 'Where are you based?', 'answer': 'Bangkok.'}]))
+        faq = FAQService(HashingEmbedder(), path=str(path), threshold=0.5)
+        await faq.startup()
+        before = faq.index
+
+        (tmp_path / 'faq.csv').write_text('question,answer\nDo you ship abroad?,Yes.\n')
+        assert await faq.reload(str(tmp_path / 'faq.csv')) == 1
+        assert faq.index is not before
+        assert faq.version == 2
+
+        path.write_text(json.dumps([{'question': 'No answer'}]))
+        with pytest.raises(ValueError):
+            await faq.reload()
+        assert (await faq.answer('Do you ship abroad?'))['response'] == 'Yes.'
+        assert faq.reload_failures == 1
+
+    def test_load_entries_accepts_phrasings(self, tmp_path):
+        """Test JSON entries may list several phrasings of one question"""
+        path = tmp_path / 'faq.json'
+        path.write_text(json.dumps(ENTRIES[:1]))
+        assert load_faq_entries(str(path)) == ENTRIES[:1]
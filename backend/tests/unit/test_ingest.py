@@ -0,0 +1,143 @@
+"""
+Unit tests for knowledge-base ingestion.
+Tests text splitting, streaming readers and incremental diffing against the vector store in isolation.
+"""
+
+import pytest
+from unittest.mock import AsyncMock, Mock
+
+from app.services.embeddings import HashingEmbedder
+from app.services.ingest import IngestPipeline, csv_records, main, split_text, text_records
+
+def make_db(stored=()):
+    """Create a mock DatabaseService holding the given content hashes."""
+    db = Mock()
+
+    async def hashes(source):
+        for digest in stored:
+            yield digest
+    db.iter_document_hashes = hashes
+    db.upsert_documents = AsyncMock()
+    db.delete_documents = AsyncMock()
+    return db
+
+def records(*texts):
+    return [{'text': text, 'metadata': {}} for text in texts]
+
+class TestSplitText:
+    """Test suite for split_text."""
+
+    def test_short_text_is_one_chunk(self):
+        """Test text within the chunk size is kept whole"""
+        assert split_text('  Titanium labret stud  ', 100) == ['Titanium labret stud']
+        assert split_text('   ', 100) == []
+
+    def test_splits_on_words_with_overlap(self):
+        """Test long text is split on the coarsest separator with overlapping chunks"""
+        chunks = split_text('a b c d e f g h', chunk_size=5, chunk_overlap=2)
+
+        assert chunks == ['a b c', 'c d e', 'e f g', 'g h']
+
+    def test_prefers_paragraph_boundaries(self):
+        """Test paragraphs that fit are never cut"""
+        first, second = 'x' * 40, 'y' * 40
+        assert split_text(f"{first}\n\n{second}", chunk_size=50, chunk_overlap=0) == [first, second]
+
+class TestReaders:
+    """Test suite for the streaming readers."""
+
+    def test_csv_rows_become_labelled_lines(self, tmp_path):
+        """Test each CSV row is one record in the n8n loader's column: value format"""
+        path = tmp_path / 'products.csv'
+        path.write_text('sku,name\nL1,Labret\n,\nR2,Ring\n')
+
+        rows = list(csv_records(str(path), id_column='sku'))
+
+        assert rows[0] == {'text': 'sku: L1\nname: Labret', 'metadata': {'id': 'L1'}}
+        assert len(rows) == 2
+
+    def test_text_paragraphs(self, tmp_path):
+        """Test text files are read one paragraph at a time"""
+        path = tmp_path / 'policies.txt'
+        path.write_text('Returns\nwithin 30 days.\n\n\nShipping is free.\n')
+
+        assert [r['text'] for r in text_records(str(path))] == ['Returns\nwithin 30 days.\n', 'Shipping is free.\n']
+
+class TestIngestPipeline:
+    """Test suite for IngestPipeline."""
+
+    @pytest.mark.asyncio
+    async def test_first_run_embeds_in_batches(self):
+        """Test new chunks are embedded and inserted batch by batch"""
+        db = make_db()
+        embedder = HashingEmbedder(dimension=16)
+        embedder.embed = AsyncMock(wraps=embedder.embed)
+        pipeline = IngestPipeline(db, embedder, batch_size=2)
+
+        stats = await pipeline.ingest('kb', records('one', 'two', 'three', 'two'))
+
+        assert stats['embedded'] == 3
+        assert stats['duplicates'] == 1
+        assert embedder.embed.await_count == 2
+        assert db.upsert_documents.await_count == 2
+        row = db.upsert_documents.call_args_list[0][0][0][0]
+        assert row['content'] == 'one'
+        assert row['source'] == 'kb'
+        assert len(row['embedding']) == 16
+        assert row['metadata']['content_hash'] == row['content_hash']
+        db.delete_documents.assert_not_awaited()
+
+    @pytest.mark.asyncio
+    async def test_rerun_only_writes_the_diff(self):
+        """Test unchanged chunks are skipped and vanished ones deleted"""
+        pipeline = IngestPipeline(make_db(), HashingEmbedder(dimension=16))
+        kept, removed = pipeline.content_hash('kb', 'one'), pipeline.content_hash('kb', 'two')
+        db = make_db([kept, removed])
+        pipeline.db = db
+
+        stats = await pipeline.ingest('kb', records('one', 'changed'))
+
+        assert (stats['unchanged'], stats['embedded'], stats['deleted']) == (1, 1, 1)
+        assert [r['content'] for r in db.upsert_documents.call_args[0][0]] == ['changed']
+        db.delete_documents.assert_awaited_once_with('kb', [removed])
+
+    @pytest.mark.asyncio
+    async def test_dry_run_and_no_delete_write_nothing(self):
+        """Test a dry run reports the diff without embedding or writing"""
+        pipeline = IngestPipeline(make_db(), HashingEmbedder(dimension=16))
+        db = make_db([pipeline.content_hash('kb', 'gone')])
+        pipeline.db = db
+
+        stats = await pipeline.ingest('kb', records('new'), dry_run=True)
+        kept = await pipeline.ingest('kb', records(), delete=False)
+
+        assert (stats['embedded'], stats['deleted']) == (1, 1)
+        assert kept['deleted'] == 0
+        db.upsert_documents.assert_not_awaited()
+        db.delete_documents.assert_not_awaited()
+
+    def test_hash_depends_on_embedder(self):
+        """Test switching embedders makes every chunk new"""
+        small = IngestPipeline(make_db(), HashingEmbedder(dimension=16))
+        large = IngestPipeline(make_db(), HashingEmbedder(dimension=32))
+
+        assert small.content_hash('kb', 'one') != large.content_hash('kb', 'one')
+
+class TestMain:
+    """Test suite for the command line guards."""
+
+    @pytest.mark.parametrize('argv, env', [
+        (['kb.txt'], {}),
+        (['kb.txt', '--embedder', 'hashing'], {}),
+        (['kb.txt', '--embedder', 'openai'], {'OPENAI_API_KEY': 'sk-test', 'EMBEDDING_DIMENSION': '512'}),
+    ])
+    def test_refuses_unusable_embedders(self, monkeypatch, argv, env):
+        """Test a missing, hashing or wrongly sized embedder never reaches the documents store"""
+        monkeypatch.delenv('EMBEDDING_BACKEND', raising=False)
+        for name, value in env.items():
+            monkeypatch.setenv(name, value)
+
+        with pytest.raises(SystemExit) as exc:
+            main(argv)
+
+        assert exc.value.code == 2
@@ -0,0 +1,213 @@
+"""
+Unit tests for chat jobs.
+Tests the worker pool, idempotent resubmission, result delivery and the job stores in isolation.
+"""
+
+import asyncio
+import pytest
+from unittest.mock import AsyncMock
+
+from app.services.admission import AdmissionRejected
+from app.services.chat import ChatTurnError, TurnRejected, ERROR_MESSAGE
+from app.services.jobs import ChatJobQueue, InMemoryJobStore, RedisJobStore, DONE, FAILED, QUEUED
+from ..conftest import TEST_SESSION_ID, TEST_MESSAGE
+
+class TestChatJobQueue:
+    """Test suite for ChatJobQueue."""
+
+    @pytest.mark.asyncio
+    async def test_job_runs_and_notifies(self):
+        """Test a submitted turn runs in the background and listeners get the result"""
+        run_turn = AsyncMock(return_value={'response': 'Hi'})
+        listener = AsyncMock()
+        jobs = ChatJobQueue(InMemoryJobStore(), run_turn, workers=2)
+        jobs.add_listener(listener)
+        jobs.start()
+
+        job, created = await jobs.submit(TEST_SESSION_ID, TEST_MESSAGE)
+        finished = await jobs.wait(job['id'], 1)
+
+        assert created is True
+        assert finished['status'] == DONE
+        assert finished['result'] == {'response': 'Hi'}
+        run_turn.assert_awaited_once_with(TEST_SESSION_ID, TEST_MESSAGE)
+        await asyncio.sleep(0)
+        assert listener.call_args[0][0]['id'] == job['id']
+        assert 'key' not in listener.call_args[0][0]
+        await jobs.stop()
+
+    @pytest.mark.asyncio
+    async def test_resubmission_with_key_reuses_job(self):
+        """Test a retried submission returns the first job instead of running the turn again"""
+        run_turn = AsyncMock(return_value={'response': 'Hi'})
+        jobs = ChatJobQueue(InMemoryJobStore(), run_turn)
+        jobs.start()
+
+        first, _ = await jobs.submit(TEST_SESSION_ID, TEST_MESSAGE, key='k1')
+        second, created = await jobs.submit(TEST_SESSION_ID, TEST_MESSAGE, key='k1')
+        other, _ = await jobs.submit('other_session', TEST_MESSAGE, key='k1')
+        await jobs.wait(other['id'], 1)
+
+        assert created is False
+        assert second['id'] == first['id']
+        assert other['id'] != first['id']
+        assert run_turn.await_count == 2
+        await jobs.stop()
+
+    @pytest.mark.asyncio
+    async def test_full_queue_rejects(self):
+        """Test submissions beyond the queue bound are rejected with a retry hint"""
+        jobs = ChatJobQueue(InMemoryJobStore(), AsyncMock(), workers=0, max_queue=1, retry_after=7)
+        jobs.start()
+        await jobs.submit(TEST_SESSION_ID, TEST_MESSAGE)
+
+        with pytest.raises(AdmissionRejected) as excinfo:
+            await jobs.submit(TEST_SESSION_ID, TEST_MESSAGE)
+
+        assert excinfo.value.retry_after == 7
+        assert jobs.rejected == 1
+        await jobs.stop()
+
+    @pytest.mark.asyncio
+    async def test_failed_turn_marks_job_failed(self):
+        """Test a failing turn ends the job with the apology"""
+        jobs = ChatJobQueue(InMemoryJobStore(), AsyncMock(side_effect=ChatTurnError(ERROR_MESSAGE)))
+        jobs.start()
+
+        job, _ = await jobs.submit(TEST_SESSION_ID, TEST_MESSAGE)
+        finished = await jobs.wait(job['id'], 1)
+
+        assert finished['status'] == FAILED
+        assert finished['error'] == ERROR_MESSAGE
+        assert jobs.failed == 1
+        await jobs.stop()
+
+    @pytest.mark.asyncio
+    async def test_busy_upstream_is_retried(self):
+        """Test a turn rejected by n8n admission is retried after the hint"""
+        run_turn = AsyncMock(side_effect=[TurnRejected('queue_full', 503, 0), {'response': 'Hi'}])
+        jobs = ChatJobQueue(InMemoryJobStore(), run_turn)
+        jobs.start()
+
+        job, _ = await jobs.submit(TEST_SESSION_ID, TEST_MESSAGE)
+        finished = await jobs.wait(job['id'], 1)
+
+        assert finished['status'] == DONE
+        assert run_turn.await_count == 2
+        await jobs.stop()
+
+    @pytest.mark.asyncio
+    async def test_late_rejection_is_not_retried(self):
+        """Test a rejection after the user message was stored fails the job instead of storing it again"""
+        run_turn = AsyncMock(side_effect=AdmissionRejected('queue_timeout', 503, 0))
+        jobs = ChatJobQueue(InMemoryJobStore(), run_turn)
+        jobs.start()
+
+        job, _ = await jobs.submit(TEST_SESSION_ID, TEST_MESSAGE)
+        finished = await jobs.wait(job['id'], 1)
+
+        assert finished['status'] == FAILED
+        assert finished['error'] == 'Service is busy, please retry shortly.'
+        run_turn.assert_awaited_once()
+        await jobs.stop()
+
+    @pytest.mark.asyncio
+    async def test_stop_fails_queued_jobs(self):
+        """Test jobs still queued at shutdown are marked failed"""
+        store = InMemoryJobStore()
+        jobs = ChatJobQueue(store, AsyncMock(), workers=0)
+        jobs.start()
+        job, _ = await jobs.submit(TEST_SESSION_ID, TEST_MESSAGE)
+
+        await jobs.stop()
+
+        assert (await store.get(job['id']))['status'] == FAILED
+
+class TestInMemoryJobStore:
+    """Test suite for InMemoryJobStore."""
+
+    @pytest.mark.asyncio
+    async def test_wait_times_out_then_wakes(self):
+        """Test a long poll returns the pending job on timeout and wakes on completion"""
+        store = InMemoryJobStore()
+        job, _ = await store.create({'id': 'j1', 'session_id': TEST_SESSION_ID, 'status': QUEUED})
+
+        assert (await store.wait('j1', 0.01))['status'] == QUEUED
+        waiter = asyncio.ensure_future(store.wait('j1', 1))
+        await asyncio.sleep(0)
+        await store.update('j1', status=DONE, result={'response': 'Hi'})
+
+        assert (await waiter)['result'] == {'response': 'Hi'}
+        assert await store.wait('missing', 1) is None
+
+    @pytest.mark.asyncio
+    async def test_oldest_finished_jobs_are_dropped(self):
+        """Test the store stays within max_jobs by dropping finished jobs first"""
+        store = InMemoryJobStore(max_jobs=2)
+        await store.create({'id': 'a', 'session_id': TEST_SESSION_ID, 'status': QUEUED}, key='ka')
+        await store.create({'id': 'b', 'session_id': TEST_SESSION_ID, 'status': QUEUED})
+        await store.update('a', status=DONE)
+
+        await store.create({'id': 'c', 'session_id': TEST_SESSION_ID, 'status': QUEUED})
+
+        assert list(store.jobs) == ['b', 'c']
+        assert await store.find('ka') is None
+
+class FakeRedis:
+    """Minimal in-process stand-in for the redis.asyncio string commands."""
+
+    def __init__(self):
+        self.data = {}
+
+    async def set(self, name, value, nx=False, ex=None):
+        if nx and name in self.data:
+            return None
+        self.data[name] = value.encode() if isinstance(value, str) else value
+        return True
+
+    async def get(self, name):
+        return self.data.get(name)
+
+    async def delete(self, name):
+        self.data.pop(name, None)
+
+    async def close(self):
+        pass
+
+class TestRedisJobStore:
+    """Test suite for RedisJobStore."""
+
+    @pytest.mark.asyncio
+    async def test_keys_and_updates_round_trip(self):
+        """Test jobs, client keys and final states are shared through Redis"""
+        store = RedisJobStore('redis://fake', ttl=60, poll_interval=0.01, client=FakeRedis())
+        job, created = await store.create({'id': 'j1', 'session_id': TEST_SESSION_ID, 'status': QUEUED}, key='k1')
+        again, created_again = await store.create({'id': 'j2', 'session_id': TEST_SESSION_ID, 'status': QUEUED}, key='k1')
+
+        assert created is True and created_again is False
+        assert again['id'] == 'j1'
+        assert (await store.find('k1'))['id'] == 'j1'
+
+        waiter = asyncio.ensure_future(store.wait('j1', 1))
+        await store.update('j1', status=DONE, result={'response': 'Hi'})
+
+        assert (await waiter)['result'] == {'response': 'Hi'}
+
+    @pytest.mark.asyncio
+    async def test_losing_a_key_claim_never_overwrites_it(self):
+        """Test a duplicate returns the winner's job and a dangling key answers 409 instead of being taken over"""
+        redis = FakeRedis()
+        store = RedisJobStore('redis://fake', ttl=60, poll_interval=0.01, client=redis)
+        await store.create({'id': 'j1', 'session_id': TEST_SESSION_ID, 'status': QUEUED}, key='k1')
+
+        # The winner's body is stored before its key, so a loser always finds it
+        again, created = await store.create({'id': 'j2', 'session_id': TEST_SESSION_ID, 'status': QUEUED}, key='k1')
+        assert (again['id'], created) == ('j1', False)
+        assert await store.get('j2') is None
+
+        await redis.set('chat:job:key:k2', 'gone')
+        with pytest.raises(AdmissionRejected) as exc:
+            await store.create({'id': 'j3', 'session_id': TEST_SESSION_ID, 'status': QUEUED}, key='k2')
+        assert exc.value.status_code == 409
+        assert await redis.get('chat:job:key:k2') == b'gone'
+        assert await store.get('j3') is None
@@ -0,0 +1,92 @@
+"""
+Unit tests for the logging pipeline.
+Tests field truncation, correlation context, sampling and the non-blocking queue.
+"""
+
+import json
+import logging
+import queue
+
+from app.services.log import (
+    EventLogger,
+    LogPipeline,
+    StructuredFormatter,
+    _DroppingQueueHandler,
+    log_context,
+    log_pipeline,
+    parse_sample_rates,
+    truncate,
+)
+
+def make_record(event, fields=None, context=None):
+    record = logging.LogRecord('app.test', logging.INFO, __file__, 1, event, None, None)
+    record.fields = fields or {}
+    record.context = context or {}
+    return record
+
+class TestFormatting:
+    """Test suite for field truncation and formatting."""
+
+    def test_truncate_bounds_large_values(self):
+        """Test long strings and big collections are cut down"""
+        assert truncate('short', 10) == 'short'
+        assert truncate('x' * 50, 10) == 'x' * 10 + '...(+40 chars)'
+        assert truncate(42, 10) == 42
+        assert len(truncate(list(range(100000)), 50)) < 100
+
+    def test_json_output_includes_context(self):
+        """Test records render as one JSON object with correlation fields"""
+        formatter = StructuredFormatter(max_length=5)
+        line = formatter.format(make_record('history_fetched', {'rows': 3, 'note': 'abcdefgh'}, {'request_id': 'r1'}))
+
+        entry = json.loads(line)
+        assert entry['event'] == 'history_fetched'
+        assert entry['request_id'] == 'r1'
+        assert entry['rows'] == 3
+        assert entry['note'] == 'abcde...(+3 chars)'
+
+    def test_text_output(self):
+        """Test the text format lists fields as key=value"""
+        formatter = StructuredFormatter(json_output=False)
+        line = formatter.format(make_record('chat_turn_failed', {'stage': 'n8n'}))
+
+        assert 'INFO' in line
+        assert 'chat_turn_failed stage=n8n' in line
+
+class TestPipeline:
+    """Test suite for sampling, context and the queue handler."""
+
+    def test_parse_sample_rates(self):
+        """Test rates are parsed and clamped"""
+        assert parse_sample_rates('a=0.5, b=2,,c=') == {'a': 0.5, 'b': 1.0}
+
+    def test_sampling_and_context(self):
+        """Test sampled-out events never reach the queue and context is captured"""
+        handler = _DroppingQueueHandler(queue.Queue(), LogPipeline())
+        logger = EventLogger('app.tests.sampling')
+        logger.logger.addHandler(handler)
+        saved = log_pipeline.sample_rates
+        log_pipeline.sample_rates = {'noisy': 0.0}
+        try:
+            with log_context(session_id='s1'):
+                logger.info('noisy')
+                logger.info('kept', rows=1)
+                logger.warning('noisy')
+        finally:
+            log_pipeline.sample_rates = saved
+            logger.logger.removeHandler(handler)
+
+        records = [handler.queue.get_nowait() for _ in range(handler.queue.qsize())]
+        assert [(r.msg, r.levelno) for r in records] == [('kept', logging.INFO), ('noisy', logging.WARNING)]
+        assert records[0].context == {'session_id': 's1'}
+
+    def test_full_queue_drops_instead_of_blocking(self):
+        """Test a full queue counts drops rather than waiting"""
+        pipeline = LogPipeline()
+        handler = _DroppingQueueHandler(queue.Queue(maxsize=1), pipeline)
+
+        handler.emit(make_record('first'))
+        handler.emit(make_record('second'))
+
+        assert handler.queue.qsize() == 1
+        assert pipeline.dropped == 1
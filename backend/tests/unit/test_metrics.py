@@ -0,0 +1,82 @@
+"""
+Unit tests for the metrics registry.
+Tests metric types, stage timing and the text exposition format.
+"""
+
+from app.services.metrics import MetricsRegistry, StageTimer
+
+class TestMetricsRegistry:
+    """Test suite for MetricsRegistry."""
+
+    def test_counter_and_gauge_render(self):
+        """Test counters and gauges render with labels"""
+        registry = MetricsRegistry()
+        errors = registry.counter('errors_total', 'Errors', ('stage',))
+        connections = registry.gauge('connections', 'Open connections')
+
+        errors.labels('n8n').inc()
+        errors.labels('n8n').inc()
+        connections.set(3)
+
+        text = registry.render()
+        assert '# TYPE errors_total counter' in text
+        assert 'errors_total{stage="n8n"} 2' in text
+        assert 'connections 3' in text
+
+    def test_histogram_buckets_are_cumulative(self):
+        """Test histogram buckets, sum and count"""
+        registry = MetricsRegistry()
+        latency = registry.histogram('latency_seconds', 'Latency', buckets=(0.1, 1.0))
+
+        latency.observe(0.05)
+        latency.observe(0.5)
+        latency.observe(5)
+
+        text = registry.render()
+        assert 'latency_seconds_bucket{le="0.1"} 1' in text
+        assert 'latency_seconds_bucket{le="1"} 2' in text
+        assert 'latency_seconds_bucket{le="+Inf"} 3' in text
+        assert 'latency_seconds_count 3' in text
+
+    def test_callback_read_at_scrape_time(self):
+        """Test callback metrics read current state and skip failing sources"""
+        registry = MetricsRegistry()
+        state = {'in_flight': 1}
+        registry.callback('gauge', 'in_flight', 'In flight', lambda: state['in_flight'])
+        registry.callback('gauge', 'broken', 'Broken', lambda: 1 / 0)
+
+        state['in_flight'] = 4
+
+        text = registry.render()
+        assert 'in_flight 4' in text
+        assert 'broken' not in text
+
+    def test_stage_timer(self):
+        """Test consecutive stages are each observed once"""
+        registry = MetricsRegistry()
+        stages_histogram = registry.histogram('stage_seconds', 'Stages', ('stage',))
+        stages = StageTimer(stages_histogram)
+
+        stages.enter('db')
+        stages.enter('n8n')
+        stages.finish()
+
+        assert set(stages.durations) == {'db', 'n8n'}
+        assert stages.current is None
+        assert stages_histogram.labels('db').count == 1
+        assert stages_histogram.labels('n8n').count == 1
+
+    def test_server_timing_groups_stages(self):
+        """Test Server-Timing reports db, n8n, app and total time"""
+        registry = MetricsRegistry()
+        stages = StageTimer(registry.histogram('stage_seconds', 'Stages', ('stage',)))
+
+        stages.enter('session_lookup')
+        stages.enter('n8n')
+        stages.enter('save_bot')
+        stages.finish()
+
+        header = stages.server_timing()
+        names = [part.split(';')[0] for part in header.split(', ')]
+        assert names == ['db', 'n8n', 'app', 'total']
+        assert all(';dur=' in part for part in header.split(', '))
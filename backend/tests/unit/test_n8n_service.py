@@ -3,11 +3,15 @@ Unit tests for n8n service.
 Tests n8n webhook integration in isolation.
 """
 
+import asyncio
+import time
 import pytest
-from unittest.mock import Mock, patch
-import requests
+from unittest.mock import Mock, AsyncMock, patch
+import httpx
 
 from app.services.n8n import N8NService
+from app.services.circuit import CircuitOpen
+from app.services.admission import AdmissionRejected
 from ..conftest import TEST_SESSION_ID, TEST_MESSAGE
 
 class TestN8NService:
@@ -19,7 +23,8 @@ class TestN8NService:
         with patch.dict('os.environ', {
             'N8N_WEBHOOK_MODE': 'test',
             'N8N_WEBHOOK_URL_TEST': 'http://test-n8n:5678/webhook-test',
-            'N8N_WEBHOOK_URL_PRODUCTION': 'http://prod-n8n:5678/webhook'
+            'N8N_WEBHOOK_URL_PRODUCTION': 'http://prod-n8n:5678/webhook',
+            'N8N_RETRY_BASE_DELAY': '0'
         }):
             return N8NService()
 
@@ -50,27 +55,203 @@ class TestN8NService:
             service = N8NService()
             assert 'prod-url' in service.webhook_url
 
-    def test_send_message_success(self, n8n_service):
+    @pytest.mark.asyncio
+    async def test_send_message_success(self, n8n_service):
         """Test successful message sending"""
         mock_response = Mock()
         mock_response.json.return_value = {"response": "Test response"}
         
-        with patch('requests.post', return_value=mock_response):
-            response = n8n_service.send_message(TEST_SESSION_ID, TEST_MESSAGE)
+        with patch('httpx.AsyncClient.post', new=AsyncMock(return_value=mock_response)):
+            response = await n8n_service.send_message(TEST_SESSION_ID, TEST_MESSAGE)
             
             assert response == {"response": "Test response"}
 
-    def test_send_message_network_error(self, n8n_service):
+    @pytest.mark.asyncio
+    async def test_send_message_network_error(self, n8n_service):
         """Test handling of network error"""
-        with patch('requests.post', side_effect=requests.RequestException):
-            with pytest.raises(requests.RequestException):
-                n8n_service.send_message(TEST_SESSION_ID, TEST_MESSAGE)
+        with patch('httpx.AsyncClient.post', new=AsyncMock(side_effect=httpx.ConnectError("refused"))):
+            with pytest.raises(httpx.ConnectError):
+                await n8n_service.send_message(TEST_SESSION_ID, TEST_MESSAGE)
 
-    def test_send_message_timeout(self, n8n_service):
+    @pytest.mark.asyncio
+    async def test_send_message_timeout(self, n8n_service):
         """Test handling of timeout"""
-        with patch('requests.post', side_effect=requests.Timeout):
-            with pytest.raises(requests.Timeout):
-                n8n_service.send_message(TEST_SESSION_ID, TEST_MESSAGE)
+        with patch('httpx.AsyncClient.post', new=AsyncMock(side_effect=httpx.ReadTimeout("timeout"))):
+            with pytest.raises(httpx.ReadTimeout):
+                await n8n_service.send_message(TEST_SESSION_ID, TEST_MESSAGE)
+
+    @pytest.mark.asyncio
+    async def test_connect_error_retried(self, n8n_service):
+        """Test calls that never reached n8n are retried"""
+        mock_response = Mock()
+        mock_response.json.return_value = {"response": "Test response"}
+        post = AsyncMock(side_effect=[httpx.ConnectError("refused"), mock_response])
+
+        with patch('httpx.AsyncClient.post', new=post):
+            response = await n8n_service.send_message(TEST_SESSION_ID, TEST_MESSAGE)
+
+        assert response == {"response": "Test response"}
+        assert post.await_count == 2
+        assert n8n_service.retry_policy.retries == 1
+
+    @pytest.mark.asyncio
+    async def test_read_timeout_not_retried(self, n8n_service):
+        """Test calls n8n may still be processing are not sent twice"""
+        post = AsyncMock(side_effect=httpx.ReadTimeout("timeout"))
+
+        with patch('httpx.AsyncClient.post', new=post):
+            with pytest.raises(httpx.ReadTimeout):
+                await n8n_service.send_message(TEST_SESSION_ID, TEST_MESSAGE)
+
+        post.assert_awaited_once()
+
+    @pytest.mark.asyncio
+    async def test_circuit_opens_and_fails_fast(self, n8n_service):
+        """Test repeated failures open the circuit and later calls skip n8n"""
+        n8n_service.circuit.failure_threshold = 2
+        post = AsyncMock(side_effect=httpx.ReadTimeout("timeout"))
+
+        with patch('httpx.AsyncClient.post', new=post):
+            for _ in range(2):
+                with pytest.raises(httpx.ReadTimeout):
+                    await n8n_service.send_message(TEST_SESSION_ID, TEST_MESSAGE)
+            with pytest.raises(CircuitOpen):
+                await n8n_service.send_message(TEST_SESSION_ID, TEST_MESSAGE)
+            with pytest.raises(CircuitOpen):
+                n8n_service.check_admission(TEST_MESSAGE)
+
+        assert post.await_count == 2
+        assert n8n_service.circuit.stats()['state'] == 'open'
+
+    @pytest.mark.asyncio
+    async def test_client_is_shared_between_calls(self, n8n_service):
+        """Test that one pooled client serves every request"""
+        await n8n_service.startup()
+        client = n8n_service.client
+        assert n8n_service.client is client
+        await n8n_service.shutdown()
+        assert client.is_closed
+
+    def test_client_pool_configuration(self):
+        """Test pool limits are read from the environment"""
+        with patch.dict('os.environ', {
+            'N8N_HTTP_MAX_CONNECTIONS': '7',
+            'N8N_HTTP_MAX_KEEPALIVE': '3',
+            'N8N_HTTP_KEEPALIVE_EXPIRY': '12.5'
+        }):
+            service = N8NService()
+        assert service.max_connections == 7
+        assert service.max_keepalive_connections == 3
+        assert service.keepalive_expiry == 12.5
+
+    @pytest.mark.asyncio
+    async def test_stream_message_ndjson_chunks(self, n8n_service):
+        """Test streamed chunks are yielded as they arrive"""
+        body = "\n".join([
+            '{"type": "begin"}',
+            '{"type": "item", "content": "Hel"}',
+            '{"type": "item", "content": "lo"}',
+            '{"type": "end"}'
+        ])
+        n8n_service._client = httpx.AsyncClient(transport=httpx.MockTransport(lambda request: httpx.Response(200, text=body)))
+        
+        pieces = [piece async for piece in n8n_service.stream_message(TEST_SESSION_ID, TEST_MESSAGE)]
+        
+        assert pieces == ["Hel", "lo"]
+        await n8n_service.shutdown()
+
+    @pytest.mark.asyncio
+    async def test_stream_message_single_json_body(self, n8n_service):
+        """Test a non-streaming webhook response is yielded once"""
+        n8n_service._client = httpx.AsyncClient(transport=httpx.MockTransport(
+            lambda request: httpx.Response(200, json={"type": "answer", "data": {"response": "Whole reply"}})
+        ))
+        
+        pieces = [piece async for piece in n8n_service.stream_message(TEST_SESSION_ID, TEST_MESSAGE)]
+        
+        assert pieces == ["Whole reply"]
+        await n8n_service.shutdown()
+
+    @pytest.mark.asyncio
+    async def test_cache_hit_skips_webhook(self, n8n_service):
+        """Test repeated questions are answered from the cache"""
+        n8n_service.cache_enabled = True
+        mock_response = Mock()
+        mock_response.json.return_value = {"response": "Cached answer"}
+        post = AsyncMock(return_value=mock_response)
+        
+        with patch('httpx.AsyncClient.post', new=post):
+            first = await n8n_service.send_message(TEST_SESSION_ID, "What are your hours?")
+            second = await n8n_service.send_message("other_session", "  what are   your HOURS ")
+        
+        assert first == second == {"response": "Cached answer"}
+        post.assert_awaited_once()
+        assert n8n_service.response_cache.hits == 1
+
+    @pytest.mark.asyncio
+    async def test_cache_disabled_by_default(self, n8n_service):
+        """Test the cache is opt-in"""
+        mock_response = Mock()
+        mock_response.json.return_value = {"response": "Answer"}
+        post = AsyncMock(return_value=mock_response)
+        
+        with patch('httpx.AsyncClient.post', new=post):
+            await n8n_service.send_message(TEST_SESSION_ID, TEST_MESSAGE)
+            await n8n_service.send_message(TEST_SESSION_ID, TEST_MESSAGE)
+        
+        assert post.await_count == 2
+
+    def test_cache_invalidation_and_budget(self, n8n_service):
+        """Test per-entry invalidation and memory budget eviction"""
+        n8n_service.cache_enabled = True
+        n8n_service.response_cache.max_bytes = 100
+        n8n_service.cache_response("first?", {"response": "a" * 40})
+        n8n_service.cache_response("second?", {"response": "b" * 40})
+        
+        assert n8n_service.get_cached_response("first") is None
+        assert n8n_service.invalidate_cached_response("Second") is True
+        assert len(n8n_service.response_cache) == 0
+
+    def test_expired_cache_entry_does_not_bypass_admission(self, n8n_service):
+        """Test an expired cached answer no longer lets a message skip admission"""
+        n8n_service.cache_enabled = True
+        n8n_service.cache_response("What are your hours?", {"response": "9 to 5"})
+        n8n_service.admission.saturated = Mock(return_value=True)
+        
+        n8n_service.check_admission("what are your hours")
+        with patch('app.services.cache.time.monotonic', return_value=time.monotonic() + 10 ** 9):
+            with pytest.raises(AdmissionRejected):
+                n8n_service.check_admission("what are your hours")
+        
+        assert len(n8n_service.response_cache) == 0
+
+    @pytest.mark.asyncio
+    async def test_identical_concurrent_messages_coalesced(self, n8n_service):
+        """Test identical in-flight messages share one webhook call"""
+        n8n_service.coalesce_scope = 'global'
+        mock_response = Mock()
+        mock_response.json.return_value = {"response": "Promo answer"}
+
+        async def slow_post(*args, **kwargs):
+            await asyncio.sleep(0.01)
+            return mock_response
+        post = AsyncMock(side_effect=slow_post)
+        
+        with patch('httpx.AsyncClient.post', new=post):
+            results = await asyncio.gather(
+                n8n_service.send_message("session_a", "Promo?"),
+                n8n_service.send_message("session_b", "promo")
+            )
+        
+        assert results == [{"response": "Promo answer"}] * 2
+        post.assert_awaited_once()
+
+    def test_coalesce_key_scope(self, n8n_service):
+        """Test coalescing keys honour the configured scope"""
+        n8n_service.coalesce_scope = 'session'
+        assert n8n_service._coalesce_key("a", "Hi") != n8n_service._coalesce_key("b", "Hi")
+        n8n_service.coalesce_scope = 'off'
+        assert n8n_service._coalesce_key("a", "Hi") is None
 
     def test_extract_bot_message_direct_response(self):
         """Test message extraction from direct response"""
@@ -0,0 +1,54 @@
+"""
+Unit tests for the request profiler.
+Tests stack sampling and the profile store.
+"""
+
+import time
+
+from app.services.profiling import ProfileStore, SamplingProfiler
+
+def busy_loop(seconds):
+    end = time.perf_counter() + seconds
+    while time.perf_counter() < end:
+        pass
+
+class TestSamplingProfiler:
+    """Test suite for SamplingProfiler."""
+
+    def test_captures_running_function(self):
+        """Test samples include the function the caller was running"""
+        profiler = SamplingProfiler(interval=0.001)
+        profiler.start()
+        busy_loop(0.05)
+        profiler.stop()
+
+        assert profiler.samples > 0
+        assert 'busy_loop' in profiler.folded()
+        assert profiler.duration >= 0.05
+
+class TestProfileStore:
+    """Test suite for ProfileStore."""
+
+    def make_profiler(self):
+        profiler = SamplingProfiler()
+        profiler.stacks['MainThread;handler (routes.py:1)'] = 3
+        return profiler
+
+    def test_keeps_newest_profiles(self):
+        """Test old profiles are dropped and listing is newest first"""
+        store = ProfileStore(max_profiles=2)
+        ids = [store.save(self.make_profiler(), 'GET', f"/path/{i}", 200) for i in range(3)]
+
+        assert store.get(ids[0]) is None
+        assert store.get(ids[2]) == 'MainThread;handler (routes.py:1) 3\n'
+        assert [p['id'] for p in store.list()] == [ids[2], ids[1]]
+        assert 'folded' not in store.list()[0]
+
+    def test_reads_profiles_from_directory(self, tmp_path):
+        """Test profiles written to disk outlive the memory limit"""
+        store = ProfileStore(max_profiles=1, directory=str(tmp_path))
+        first = store.save(self.make_profiler(), 'GET', '/a', 200)
+        store.save(self.make_profiler(), 'GET', '/b', 200)
+
+        assert store.get(first) == 'MainThread;handler (routes.py:1) 3\n'
+        assert store.get('../etc') is None
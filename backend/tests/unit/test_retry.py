@@ -0,0 +1,69 @@
+"""
+Unit tests for the retry policy.
+Tests retry classification and backoff in isolation.
+"""
+
+import pytest
+from unittest.mock import AsyncMock, patch
+import httpx
+
+from app.services.retry import RetryPolicy, is_retryable, is_upstream_failure
+
+def status_error(status_code: int) -> httpx.HTTPStatusError:
+    request = httpx.Request('POST', 'http://n8n/webhook')
+    response = httpx.Response(status_code, request=request)
+    return httpx.HTTPStatusError('error', request=request, response=response)
+
+class TestRetryPolicy:
+    """Test suite for RetryPolicy."""
+
+    def test_retryable_classification(self):
+        """Test only failures that never reached n8n are retryable"""
+        assert is_retryable(httpx.ConnectError("refused"))
+        assert is_retryable(httpx.PoolTimeout("pool"))
+        assert not is_retryable(status_error(502))
+        assert not is_retryable(status_error(503))
+        assert not is_retryable(status_error(504))
+        assert not is_retryable(httpx.ReadTimeout("timeout"))
+        assert not is_retryable(status_error(500))
+        assert not is_retryable(status_error(400))
+
+    def test_upstream_failure_classification(self):
+        """Test transport errors and 5xx count against the upstream"""
+        assert is_upstream_failure(httpx.ReadTimeout("timeout"))
+        assert is_upstream_failure(status_error(500))
+        assert not is_upstream_failure(status_error(404))
+        assert not is_upstream_failure(ValueError("bad json"))
+
+    def test_backoff_is_bounded(self):
+        """Test jittered backoff never exceeds its exponential ceiling"""
+        policy = RetryPolicy(base_delay=0.1, max_delay=0.3)
+
+        for attempt in range(6):
+            delay = policy.backoff(attempt)
+            assert 0 <= delay <= min(0.3, 0.1 * 2 ** attempt)
+
+    @pytest.mark.asyncio
+    async def test_gives_up_after_max_attempts(self):
+        """Test retries stop once attempts run out"""
+        policy = RetryPolicy(max_attempts=3, base_delay=0)
+        fn = AsyncMock(side_effect=httpx.ConnectError("refused"))
+
+        with patch('app.services.retry.asyncio.sleep', new=AsyncMock()) as sleep:
+            with pytest.raises(httpx.ConnectError):
+                await policy.run(fn)
+
+        assert fn.await_count == 3
+        assert sleep.await_count == 2
+        assert policy.stats()['exhausted'] == 1
+
+    @pytest.mark.asyncio
+    async def test_non_retryable_error_raised_immediately(self):
+        """Test permanent errors are not retried"""
+        policy = RetryPolicy(max_attempts=3)
+        fn = AsyncMock(side_effect=ValueError("bad json"))
+
+        with pytest.raises(ValueError):
+            await policy.run(fn)
+
+        fn.assert_awaited_once()
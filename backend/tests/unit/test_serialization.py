@@ -0,0 +1,44 @@
+"""
+Unit tests for the serialization helpers.
+Tests the fast encoder, streamed arrays and row projection.
+"""
+
+import json
+from datetime import datetime, timezone
+
+import pytest
+from fastapi.encoders import jsonable_encoder
+
+from app.models.chat import ChatMessage
+from app.services.serialization import dumps, project, stream_json_object
+
+class TestSerialization:
+    """Test suite for the serialization helpers."""
+
+    def test_dumps_matches_jsonable_encoder(self):
+        """Test datetimes and text encode the same as the FastAPI encoder"""
+        message = ChatMessage(
+            message_id='1', sender='bot', message='héllo',
+            timestamp=datetime(2024, 1, 1, 12, 0, 0, 123456, tzinfo=timezone.utc)
+        )
+        assert json.loads(dumps({'messages': [message.dict()]})) == jsonable_encoder({'messages': [message.dict()]})
+
+    @pytest.mark.asyncio
+    @pytest.mark.parametrize('count', [0, 1, 7])
+    async def test_stream_json_object(self, count):
+        """Test streamed chunks join into the same document"""
+        items = [{'message_id': str(i), 'message': f"m{i}"} for i in range(count)]
+        head = {'has_more': False, 'cursors': {}}
+
+        chunks = [chunk async for chunk in stream_json_object(head, 'messages', items, chunk_size=3)]
+
+        assert json.loads(b''.join(chunks)) == {**head, 'messages': items}
+
+    def test_project_keeps_model_fields(self):
+        """Test projection drops extra columns and fills missing ones"""
+        rows = [{'message_id': '1', 'session_id': 's', 'sender': 'user', 'message': 'hi', 'timestamp': 't'}]
+
+        assert project(rows, ChatMessage.__fields__) == [
+            {'message_id': '1', 'sender': 'user', 'message': 'hi', 'timestamp': 't'}
+        ]
+        assert project([{'sender': 'bot'}], ('message_id', 'sender')) == [{'message_id': None, 'sender': 'bot'}]
@@ -0,0 +1,70 @@
+"""
+Unit tests for the session sweeper.
+Tests batching and closing sockets of ended sessions.
+"""
+
+import asyncio
+
+import pytest
+from unittest.mock import AsyncMock, Mock
+
+from app.services.sweeper import SessionSweeper
+
+def idle_rows(*ids):
+    return [{'session_id': i, 'last_activity': f"2024-01-01T00:00:0{n}+00:00"} for n, i in enumerate(ids)]
+
+class TestSessionSweeper:
+    """Test suite for SessionSweeper."""
+
+    @pytest.fixture
+    def connections(self):
+        connections = Mock()
+        connections.end_sessions = AsyncMock(return_value=1)
+        return connections
+
+    @pytest.mark.asyncio
+    async def test_ends_idle_sessions_in_batches(self, connections):
+        """Test each page of idle sessions is ended with one update, connected or not"""
+        db = Mock()
+        db.find_idle_sessions = AsyncMock(side_effect=[idle_rows('a', 'connected'), idle_rows('b')])
+        db.end_sessions = AsyncMock(side_effect=lambda ids: ids)
+        sweeper = SessionSweeper(db, connections, batch_size=2)
+
+        result = await sweeper.run_once()
+
+        assert result == {'sessions_ended': 3, 'sockets_closed': 2}
+        assert [call.args[0] for call in db.end_sessions.call_args_list] == [['a', 'connected'], ['b']]
+        assert db.find_idle_sessions.call_args_list[1].args[2] == ('2024-01-01T00:00:01+00:00', 'connected')
+        assert connections.end_sessions.call_args_list[0].args[0] == ['a', 'connected']
+        assert sweeper.sessions_ended == 3
+        assert sweeper.backlog is False
+
+    @pytest.mark.asyncio
+    async def test_batch_limit_leaves_backlog(self, connections):
+        """Test a run stops after max_batches and reports the backlog"""
+        db = Mock()
+        db.find_idle_sessions = AsyncMock(return_value=idle_rows('a', 'b'))
+        db.end_sessions = AsyncMock(side_effect=lambda ids: ids)
+        sweeper = SessionSweeper(db, connections, batch_size=2, max_batches=3)
+
+        await sweeper.run_once()
+
+        assert db.end_sessions.await_count == 3
+        assert sweeper.backlog is True
+
+    @pytest.mark.asyncio
+    async def test_loop_stops_when_view_is_missing(self, connections):
+        """Test the loop gives up after one run when the summary view does not exist"""
+        error = Exception('relation "public.chat_session_summaries" does not exist')
+        error.code = '42P01'
+        db = Mock()
+        db.find_idle_sessions = AsyncMock(side_effect=error)
+        sweeper = SessionSweeper(db, connections, interval=0.01)
+
+        sweeper.start()
+        await asyncio.sleep(0.1)
+
+        assert sweeper._task.done()
+        assert db.find_idle_sessions.await_count == 1
+        assert sweeper.failures == 1
+        await sweeper.stop()
@@ -0,0 +1,103 @@
+"""
+Unit tests for the write-behind buffer.
+Tests batching, read-your-writes and shutdown flushing in isolation.
+"""
+
+import asyncio
+import pytest
+from unittest.mock import AsyncMock
+
+from app.services.write_behind import WriteBehindBuffer
+from ..conftest import TEST_SESSION_ID, TEST_MESSAGE
+
+def make_row(i: int, session_id: str = TEST_SESSION_ID) -> dict:
+    """Build a message row for the buffer."""
+    return {'session_id': session_id, 'sender': 'user', 'message': f"{TEST_MESSAGE} {i}", 'timestamp': str(i)}
+
+class TestWriteBehindBuffer:
+    """Test suite for WriteBehindBuffer."""
+
+    @pytest.mark.asyncio
+    async def test_flushes_full_batch(self):
+        """Test that a full batch is written without waiting for the interval"""
+        flush = AsyncMock()
+        buffer = WriteBehindBuffer(flush, batch_size=3, flush_interval=60)
+        
+        for i in range(3):
+            await buffer.put(make_row(i))
+        await asyncio.sleep(0.01)
+        
+        flush.assert_awaited_once()
+        assert len(flush.call_args[0][0]) == 3
+        assert buffer.pending_for(TEST_SESSION_ID) == []
+        await buffer.stop()
+
+    @pytest.mark.asyncio
+    async def test_flushes_after_interval(self):
+        """Test that a partial batch is written once the interval passes"""
+        flush = AsyncMock()
+        buffer = WriteBehindBuffer(flush, batch_size=100, flush_interval=0.01)
+        
+        await buffer.put(make_row(1))
+        await asyncio.sleep(0.05)
+        
+        flush.assert_awaited_once()
+        await buffer.stop()
+
+    @pytest.mark.asyncio
+    async def test_pending_rows_visible_until_written(self):
+        """Test read-your-writes overlay before a flush"""
+        buffer = WriteBehindBuffer(AsyncMock(), batch_size=100, flush_interval=60)
+        
+        await buffer.put(make_row(1))
+        await buffer.put(make_row(2, session_id='other'))
+        
+        assert [r['message'] for r in buffer.pending_for(TEST_SESSION_ID)] == [f"{TEST_MESSAGE} 1"]
+        assert buffer.pending_count == 2
+        await buffer.stop()
+
+    @pytest.mark.asyncio
+    async def test_stop_flushes_everything(self):
+        """Test that shutdown drains every queued row"""
+        flush = AsyncMock()
+        buffer = WriteBehindBuffer(flush, batch_size=2, flush_interval=60)
+        
+        buffer.start()
+        for i in range(5):
+            buffer._queue.put_nowait(make_row(i))
+            buffer._pending[TEST_SESSION_ID].append(make_row(i))
+        await buffer.stop()
+        
+        assert sum(len(call[0][0]) for call in flush.call_args_list) == 5
+        assert buffer.pending_count == 0
+
+    @pytest.mark.asyncio
+    async def test_failed_batch_is_retried_then_dropped(self):
+        """Test retry and drop accounting for a failing writer"""
+        flush = AsyncMock(side_effect=RuntimeError("db down"))
+        buffer = WriteBehindBuffer(flush, batch_size=1, flush_interval=0.01, max_retries=2,
+                                   retry_backoff=0.001, max_requeues=1)
+        
+        await buffer.put(make_row(1))
+        await buffer.stop()
+        
+        assert flush.await_count == 4
+        assert buffer.stats()['requeued_batches'] == 1
+        assert buffer.stats()['dropped_rows'] == 1
+        assert buffer.pending_count == 0
+
+    @pytest.mark.asyncio
+    async def test_failed_batch_is_held_until_database_recovers(self):
+        """Test a batch outliving its retries is kept and written on a later flush"""
+        flush = AsyncMock(side_effect=[RuntimeError("db down")] * 3 + [None])
+        buffer = WriteBehindBuffer(flush, batch_size=1, flush_interval=0.2, max_retries=2, retry_backoff=0.001)
+        
+        await buffer.put(make_row(1))
+        await asyncio.sleep(0.02)
+        assert len(buffer.pending_for(TEST_SESSION_ID)) == 1
+        await buffer.stop()
+        
+        assert flush.await_count == 4
+        assert buffer.stats()['dropped_rows'] == 0
+        assert buffer.stats()['flushed_rows'] == 1
+        assert buffer.pending_count == 0
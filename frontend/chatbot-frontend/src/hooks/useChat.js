@@ -1,4 +1,3 @@
-<<<<<<< HEAD
 
 /**
  * @fileoverview Custom React Hook for managing chat functionality
@@ -9,7 +8,7 @@
 
 import { useState, useEffect, useRef } from 'react';
 import { config } from '../utils/config';
-import { createRequestHeaders } from '../utils/security';
+import { createRequestHeaders, generateUUID } from '../utils/security';
 import { getOrCreateSessionId, getOrCreateUserId } from '../utils/session';
 import { parseWebSocketMessage, formatBotResponse } from '../utils/messageHandling';
 
@@ -18,43 +17,19 @@ import { parseWebSocketMessage, formatBotResponse } from '../utils/messageHandli
  * @returns {Object} Chat interface methods and state
  * @property {Array} messages - Array of chat messages
  * @property {Array} sessions - Array of chat sessions
-=======
-
-/**
- * @fileoverview Custom React Hook for managing chat functionality
- * This hook handles WebSocket connections, message history, and chat interactions
- * with the backend server. It implements real-time messaging and handles both
- * WebSocket and REST API communications.
- */
-
-import { useState, useEffect, useRef } from 'react';
-import { config } from '../utils/config';
-import { createRequestHeaders } from '../utils/security';
-import { getOrCreateSessionId } from '../utils/session';
-import { parseWebSocketMessage, formatBotResponse } from '../utils/messageHandling';
-
-/**
- * Custom hook for chat functionality
- * @returns {Object} Chat interface methods and state
- * @property {Array} messages - Array of chat messages
->>>>>>> c1f9070ccb7a29111fee9de0911e64545c5cae06
  * @property {Function} sendMessage - Function to send a new message
  * @property {Function} handleTyping - Function to handle typing events
  * @property {boolean} connected - WebSocket connection status
  */
 export default function useChat() {
-<<<<<<< HEAD
   // State for storing chat messages, sessions and connection status
-=======
-  // State for storing chat messages and connection status
->>>>>>> c1f9070ccb7a29111fee9de0911e64545c5cae06
   const [messages, setMessages] = useState([]);
   const [sessions, setSessions] = useState([]);
   const [connected, setConnected] = useState(false);
   
   // Refs for persistent values across renders
   const wsRef = useRef(null);  // WebSocket reference
-<<<<<<< HEAD
+  const pendingRequests = useRef({});  // requestId -> reply timeout for turns sent over the socket
   const userId = useRef(getOrCreateUserId());  // Persistent user identifier
   const sessionId = useRef(getOrCreateSessionId());  // Session-based chat ID
 
@@ -63,16 +38,6 @@ export default function useChat() {
    */
   useEffect(() => {
     loadChatSessions();
-=======
-  const sessionId = useRef(getOrCreateSessionId());  // Unique session identifier
-
-  /**
-   * Effect hook to load chat history when component mounts
-   * Retrieves previous messages from the backend server
-   */
-  useEffect(() => {
-    loadChatHistory();
->>>>>>> c1f9070ccb7a29111fee9de0911e64545c5cae06
   }, []);
 
   /**
@@ -99,8 +64,13 @@ export default function useChat() {
       console.error('WebSocket error:', err);
     };
 
-    // Handle incoming messages
-    ws.onmessage = (event) => parseWebSocketMessage(event, addMessage);
+    // Handle incoming messages: heartbeats, then replies to our own turns, then everything else
+    ws.onmessage = (event) => {
+      if (answerPing(ws, event)) return;
+      if (!resolveSocketReply(event)) {
+        parseWebSocketMessage(event, addMessage);
+      }
+    };
 
     return () => ws.close();
     // eslint-disable-next-line
@@ -147,7 +117,6 @@ export default function useChat() {
    * Loads previous chat messages from the backend API
    * Retrieves and formats the chat history for the current session
    */
-<<<<<<< HEAD
   /**
    * Load available chat sessions for the current user
    */
@@ -174,11 +143,6 @@ export default function useChat() {
     try {
       const sid = targetSessionId || sessionId.current;
       const res = await fetch(`${config.API_BASE}/chat/messages/${sid}`);
-=======
-  async function loadChatHistory() {
-    try {
-      const res = await fetch(`${config.API_BASE}/chat/messages/${sessionId.current}`);
->>>>>>> c1f9070ccb7a29111fee9de0911e64545c5cae06
       const data = await res.json();
       if (data.messages) {
         setMessages(data.messages.map(msg => ({ 
@@ -194,30 +158,92 @@ export default function useChat() {
 
 
   /**
-   * Sends a user message to the backend through both WebSocket and REST API
-   * Handles message delivery, typing indicators, and response processing
+   * Replaces the "Thinking..." placeholder of a pending request
+   * @param {string} requestId - Identifier of the request being answered
+   * @param {string} text - Text to show in place of the placeholder
+   */
+  function replacePlaceholder(requestId, text) {
+    setMessages(prev => prev.map(msg => (
+      msg.requestId === requestId
+        ? { sender: 'bot', text, timestamp: Date.now() }
+        : msg
+    )));
+  }
+
+  /**
+   * Answers a server heartbeat so the connection is not closed as idle
+   * @param {WebSocket} ws - The socket the ping arrived on
+   * @param {MessageEvent} event - The WebSocket message event
+   * @returns {boolean} True if the frame was a ping
+   */
+  function answerPing(ws, event) {
+    if (typeof event.data !== 'string' || !event.data.includes('"ping"')) return false;
+    try {
+      if (JSON.parse(event.data).type !== 'ping') return false;
+    } catch (e) {
+      return false;
+    }
+    if (ws.readyState === WebSocket.OPEN) {
+      ws.send(JSON.stringify({ type: 'pong' }));
+    }
+    return true;
+  }
+
+  /**
+   * Handles a WebSocket frame answering one of our own chat turns
+   * @param {MessageEvent} event - The WebSocket message event
+   * @returns {boolean} True if the frame was a reply to a pending request
+   */
+  function resolveSocketReply(event) {
+    let data;
+    try {
+      data = JSON.parse(event.data);
+    } catch (e) {
+      return false;
+    }
+    const timeoutId = data && pendingRequests.current[data.requestId];
+    if (!timeoutId) return false;
+    clearTimeout(timeoutId);
+    delete pendingRequests.current[data.requestId];
+    replacePlaceholder(data.requestId, data.type === 'error' ? 'Error occurred.' : formatBotResponse(data));
+    return true;
+  }
+
+  /**
+   * Sends a user message to the backend
+   * Uses the WebSocket when it is open, so a turn costs no extra HTTP request,
+   * and falls back to the REST API otherwise
    * @param {string} message - The message to send
    */
   function sendMessage(message) {
     // Validate message
     if (!message.trim()) return;
 
-    // Add user message to local state
+    // Add user message and a typing indicator tied to this request
+    const requestId = generateUUID();
     addMessage('user', message);
+    setMessages(prev => [...prev, {
+      sender: 'system',
+      text: 'Thinking...',
+      timestamp: Date.now(),
+      requestId
+    }]);
 
     // Send message via WebSocket if connection is active
     if (wsRef.current && wsRef.current.readyState === 1) {
+      pendingRequests.current[requestId] = setTimeout(() => {
+        delete pendingRequests.current[requestId];
+        replacePlaceholder(requestId, 'Error occurred.');
+      }, config.API_TIMEOUT);
       wsRef.current.send(JSON.stringify({
+        type: 'message',
         sessionId: sessionId.current,
         message,
-        sender: 'user',
-        type: 'message'
+        requestId
       }));
+      return;
     }
 
-    // Show typing indicator while waiting for response
-    addMessage('system', 'Thinking...');
-    
     // Setup request timeout handling
     const controller = new AbortController();
     const timeoutId = setTimeout(() => controller.abort(), config.API_TIMEOUT);
@@ -233,25 +259,11 @@ export default function useChat() {
       .then(res => res.json())
       .then(data => {
         // Replace typing indicator with formatted bot response
-        setMessages(prev => [
-          ...prev.slice(0, -1),
-          { 
-            sender: 'bot', 
-            text: formatBotResponse(data), 
-            timestamp: Date.now() 
-          }
-        ]);
+        replacePlaceholder(requestId, formatBotResponse(data));
       })
       .catch(err => {
         // Handle errors by showing error message
-        setMessages(prev => [
-          ...prev.slice(0, -1),
-          { 
-            sender: 'bot', 
-            text: 'Error occurred.', 
-            timestamp: Date.now() 
-          }
-        ]);
+        replacePlaceholder(requestId, 'Error occurred.');
         console.error('Chat message error:', err);
       })
       .finally(() => {
@@ -4,19 +4,11 @@
  */
 
 /**
-<<<<<<< HEAD
  * Generates a cryptographically secure random ID
  * @private
  * @returns {string} A 20-character alphanumeric string
  */
 function generateId() {
-=======
- * Generates a cryptographically secure random session ID
- * @private
- * @returns {string} A 20-character alphanumeric string
- */
-function generateSessionId() {
->>>>>>> c1f9070ccb7a29111fee9de0911e64545c5cae06
   const chars = 'ABCDEFGHIJKLMNOPQRSTUVWXYZabcdefghijklmnopqrstuvwxyz0123456789';
   return Array.from(
     { length: 20 }, 
@@ -25,7 +17,6 @@ function generateSessionId() {
 }
 
 /**
-<<<<<<< HEAD
  * Get or create a persistent user ID for the browser
  * @returns {string} Valid user ID
  */
@@ -39,8 +30,6 @@ export function getOrCreateUserId() {
 }
 
 /**
-=======
->>>>>>> c1f9070ccb7a29111fee9de0911e64545c5cae06
  * Retrieves existing session ID from storage or creates a new one
  * @public
  * @returns {string} Valid session ID, either existing or newly generated
@@ -53,11 +42,7 @@ export function getOrCreateUserId() {
 export function getOrCreateSessionId() {
   let id = sessionStorage.getItem('sessionId');
   if (!id || !/^[A-Za-z0-9]{20}$/.test(id)) {
-<<<<<<< HEAD
     id = generateId();
-=======
-    id = generateSessionId();
->>>>>>> c1f9070ccb7a29111fee9de0911e64545c5cae06
     sessionStorage.setItem('sessionId', id);
   }
   return id;